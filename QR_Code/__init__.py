@@ -0,0 +1,71 @@
+"""
+QR Code generator
+
+importing the package does no work, every public name below is only imported from its module the first time it is used:
+
+    import QR_Code
+    qr = QR_Code.make('https://www.qrcode.com/', QR_Code.ECCode.M)
+    QR_Code.plan_symbol('https://www.qrcode.com/').headroom_bits  # version and EC level without building the symbol
+"""
+from __future__ import annotations
+from importlib import import_module
+
+TYPE_CHECKING = False  # not taken from typing, which on its own costs more to import than the rest of the package
+if TYPE_CHECKING:
+    from typing import Any
+    from QR_Code.builder.QRCodeBuilder import QRCodeBuilder
+    from QR_Code.utils.Classes import ECCode
+    from QR_Code.utils.Instrumentation import BuildStats
+
+# public name -> module it lives in
+_LAZY_ATTRIBUTES: dict[str, str] = {
+    'QRCodeBuilder': 'QR_Code.builder.QRCodeBuilder',
+    'build_many': 'QR_Code.builder.Batch',
+    'BatchBuilder': 'QR_Code.builder.Batch',
+    'BuildResult': 'QR_Code.builder.Batch',
+    'generate': 'QR_Code.builder.Async_Builder',
+    'generate_many': 'QR_Code.builder.Async_Builder',
+    'AsyncGenerator': 'QR_Code.builder.Async_Builder',
+    'SymbolCache': 'QR_Code.builder.Symbol_Cache',
+    'get_symbol': 'QR_Code.builder.Symbol_Cache',
+    'render': 'QR_Code.display.Writers',
+    'decode': 'QR_Code.builder.Decoder',
+    'decode_symbol': 'QR_Code.builder.Decoder',
+    'plan_symbol': 'QR_Code.processing.Segmentation',
+    'SymbolPlan': 'QR_Code.processing.Segmentation',
+    'BuildStats': 'QR_Code.utils.Instrumentation',
+    'enable_stats': 'QR_Code.utils.Instrumentation',
+    'disable_stats': 'QR_Code.utils.Instrumentation',
+    'ECCode': 'QR_Code.utils.Classes',
+    'EncodingMode': 'QR_Code.utils.Classes',
+    'DataLimitExceededError': 'QR_Code.utils.Exceptions',
+    'ModeNotImplementedError': 'QR_Code.utils.Exceptions',
+    'OutOfFieldError': 'QR_Code.utils.Exceptions',
+    'CannotDrawPatternError': 'QR_Code.utils.Exceptions',
+    'QueueFullError': 'QR_Code.utils.Exceptions',
+    'CodewordVerificationError': 'QR_Code.utils.Exceptions',
+    'DecodingError': 'QR_Code.utils.Exceptions',
+    'enable_verification': 'QR_Code.builder.QRCodeBuilder',
+}
+
+__all__ = ['make', *_LAZY_ATTRIBUTES]
+
+
+def __getattr__(name: str) -> Any:
+    module: str | None = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(module), name)
+    globals()[name] = value  # later lookups no longer go through __getattr__
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+def make(message: str, ec_level: ECCode | None = None, engine: str = 'list', stats: BuildStats | None = None,
+         verify: bool | None = None) -> QRCodeBuilder:
+    """builds the symbol for message, picking the smallest version (and the best EC level if ec_level is not given)"""
+    from QR_Code.builder.QRCodeBuilder import QRCodeBuilder
+    return QRCodeBuilder(message, ec_level, engine, stats, verify)
@@ -0,0 +1,95 @@
+"""
+Command line entry point
+
+    python -m QR_Code serve --port 8080 --workers 4     HTTP generation service, see QR_Code.utils.Server
+    python -m QR_Code batch labels.csv labels.tar       resumable bulk export, see QR_Code.utils.Bulk_Export
+"""
+from __future__ import annotations
+import argparse
+from typing import Callable
+
+
+def _int_at_least(minimum: int) -> Callable[[str], int]:
+    """an argparse type for integers of at least minimum"""
+    def parse(text: str) -> int:
+        value: int = int(text)  # argparse reports the ValueError as an invalid int
+        if value < minimum:
+            raise argparse.ArgumentTypeError(f'must be at least {minimum}, got {value}')
+        return value
+    parse.__name__ = 'int'
+    return parse
+
+
+def _enable_verification(args: argparse.Namespace) -> None:
+    if args.verify:  # before any worker process is started, they read it from the environment
+        from QR_Code.builder.QRCodeBuilder import enable_verification
+        enable_verification()
+
+
+def _serve(args: argparse.Namespace) -> None:
+    import asyncio
+    from QR_Code.utils.Server import serve
+    _enable_verification(args)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_queued, args.cache_mb << 20, args.cache_dir,
+                          args.timeout or None))
+    except KeyboardInterrupt:
+        pass
+
+
+def _batch(args: argparse.Namespace) -> None:
+    import sys
+    from QR_Code.utils.Bulk_Export import ExportOptions, export, get_output_kind
+    from QR_Code.utils.Classes import ECCode
+    options = ExportOptions(args.input, args.output, get_output_kind(args.output), args.column, args.name_column,
+                            None if args.ec is None else ECCode[args.ec], args.format, args.scale, args.quiet_zone,
+                            args.shard_size)
+    _enable_verification(args)
+    try:
+        summary = export(options, args.workers, args.chunk_size, args.checkpoint_seconds, args.restart)
+    except KeyboardInterrupt:
+        sys.exit('interrupted, run the same command again to resume')
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f'{summary.rows} rows ({summary.rows - summary.resumed_at} in this run, {summary.errors} errors) '
+          f'in {summary.seconds:.1f}s', file=sys.stderr)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m QR_Code', description='QR Code generator')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='run the HTTP generation service')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--workers', type=_int_at_least(1), default=4, help='worker processes building symbols')
+    serve_parser.add_argument('--max-queued', type=_int_at_least(0), default=256, help='requests waiting for a worker before 503s')
+    serve_parser.add_argument('--cache-mb', type=int, default=64, help='memory for finished symbols')
+    serve_parser.add_argument('--cache-dir', help='also keep finished symbols in this directory')
+    serve_parser.add_argument('--timeout', type=float, default=30.0, help='seconds one symbol may take, 0 for no limit')
+    serve_parser.add_argument('--verify', action='store_true', help='check the RS syndromes of every symbol before it is sent')
+    serve_parser.set_defaults(run=_serve)
+
+    batch_parser = commands.add_parser('batch', help='export every message of a CSV or JSONL file as an image')
+    batch_parser.add_argument('input', help='.csv with a header row, or .jsonl')
+    batch_parser.add_argument('output', help='.tar or .zip (one archive per shard), or a directory')
+    batch_parser.add_argument('--column', help='column or field holding the message (default: message)')
+    batch_parser.add_argument('--name-column', help='column or field naming the image (default: the row number)')
+    batch_parser.add_argument('--ec', choices=['L', 'M', 'Q', 'H'], help='EC level (default: the best that fits)')
+    batch_parser.add_argument('--format', choices=['png', 'pbm', 'pgm'], default='png')
+    batch_parser.add_argument('--scale', type=_int_at_least(1), default=4, help='pixels per module')
+    batch_parser.add_argument('--quiet-zone', type=_int_at_least(0), default=4, help='light modules around the symbol')
+    batch_parser.add_argument('--workers', type=_int_at_least(1), help='worker processes (default: every core)')
+    batch_parser.add_argument('--chunk-size', type=_int_at_least(1), default=256, help='rows per task sent to a worker')
+    batch_parser.add_argument('--shard-size', type=_int_at_least(1), default=100000, help='rows per archive or subdirectory')
+    batch_parser.add_argument('--checkpoint-seconds', type=float, default=5.0)
+    batch_parser.add_argument('--restart', action='store_true', help='ignore the checkpoint of an earlier run')
+    batch_parser.add_argument('--verify', action='store_true', help='check the RS syndromes of every symbol before it is written')
+    batch_parser.set_defaults(run=_batch)
+
+    args = parser.parse_args(argv)
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
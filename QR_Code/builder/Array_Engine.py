@@ -0,0 +1,168 @@
+"""
+NumPy backed module matrix, used by QRCodeBuilder when it is constructed with engine='array'
+
+the symbol is kept as a uint8 array (1 = dark) together with a boolean mask of the function modules. both are indexed
+[x][y] like QRCodeBuilder.matrix, so a flat offset of x * size + y addresses the same module in either form
+"""
+from __future__ import annotations
+from array import array
+from typing import Sequence
+import numpy as np
+from QR_Code.builder import Format_Info
+from QR_Code.processing.Sequencing import get_size_info
+from QR_Code.utils.Constants import ALIGNMENT_PATTERN_POSITION_TABLE
+from QR_Code.utils.Exceptions import CannotDrawPatternError
+
+FINDER_PATTERN = np.array([
+    [1, 1, 1, 1, 1, 1, 1],
+    [1, 0, 0, 0, 0, 0, 1],
+    [1, 0, 1, 1, 1, 0, 1],
+    [1, 0, 1, 1, 1, 0, 1],
+    [1, 0, 1, 1, 1, 0, 1],
+    [1, 0, 0, 0, 0, 0, 1],
+    [1, 1, 1, 1, 1, 1, 1]
+], dtype=np.uint8)
+
+ALIGNMENT_PATTERN = np.array([
+    [1, 1, 1, 1, 1],
+    [1, 0, 0, 0, 1],
+    [1, 0, 1, 0, 1],
+    [1, 0, 0, 0, 1],
+    [1, 1, 1, 1, 1]
+], dtype=np.uint8)
+
+
+# version -> the 8 mask patterns restricted to the data modules of that version, shape (8, size, size)
+_MASK_ARRAY_CACHE: dict[int, np.ndarray] = {}
+
+
+def get_mask_arrays(version: int, size: int, module_order: Sequence[tuple[int, int]]) -> np.ndarray:
+    """built on the first call for a version, module_order is only read on that call"""
+    masks: np.ndarray | None = _MASK_ARRAY_CACHE.get(version)
+    if masks is None:
+        from QR_Code.builder.Masking import MASK_DICT
+        data_modules: np.ndarray = np.zeros((size, size), dtype=np.bool_)
+        data_modules[tuple(np.array(module_order, dtype=np.intp).T)] = True
+        x, y = np.indices((size, size))
+        masks = _MASK_ARRAY_CACHE[version] = np.stack([MASK_DICT[mask_id](x, y) & data_modules for mask_id in range(8)]) \
+            .astype(np.uint8)
+    return masks
+
+
+def get_format_positions(size: int) -> tuple[np.ndarray, np.ndarray]:
+    """returns the x and y coordinates of both copies of the 15 format bits, most significant bit first"""
+    positions: np.ndarray = np.array(Format_Info.get_format_positions(size), dtype=np.intp)
+    return positions[:, 0], positions[:, 1]
+
+
+def get_version_positions(size: int) -> tuple[np.ndarray, np.ndarray]:
+    """returns the x and y coordinates of both copies of the 18 version bits, most significant bit first"""
+    positions: np.ndarray = np.array(Format_Info.get_version_positions(size), dtype=np.intp)
+    return positions[:, 0], positions[:, 1]
+
+
+def get_zigzag_offsets(size: int) -> np.ndarray:
+    """flat offsets of every module in placement order, function modules included"""
+    right_columns: list[int] = list(range(size - 1, 7, -2)) + [5, 3, 1]
+    rows_up: np.ndarray = np.arange(size - 1, -1, -1)
+    pairs: list[np.ndarray] = []
+    for pair_idx, right in enumerate(right_columns):
+        rows: np.ndarray = rows_up if pair_idx % 2 == 0 else rows_up[::-1]
+        pair = np.empty((size, 2), dtype=np.intp)
+        pair[:, 0] = right * size + rows
+        pair[:, 1] = (right - 1) * size + rows
+        pairs.append(pair.ravel())
+    return np.concatenate(pairs)
+
+
+class ModuleArray:
+    def __init__(self, version: int) -> None:
+        self.version = version
+        self.size: int = get_size_info(version)
+        self.modules: np.ndarray = np.zeros((self.size, self.size), dtype=np.uint8)
+        self.function_mask: np.ndarray = np.zeros((self.size, self.size), dtype=np.bool_)
+        self.draw_finder_patterns()
+        self.draw_timing_patterns()
+        self.draw_dark_module()
+        self.draw_alignment_patterns()
+        self.reserve_format_areas()
+        self.draw_version_info()
+
+    def draw_finder_patterns(self) -> None:
+        # the separators are the 8x8 corner squares around each finder pattern, which are light
+        for x, y in ((0, 0), (0, self.size - 8), (self.size - 8, 0)):
+            self.function_mask[x: x + 8, y: y + 8] = True
+        self._draw_finder_pattern(0, 0)
+        self._draw_finder_pattern(0, self.size - 7)
+        self._draw_finder_pattern(self.size - 7, 0)
+
+    def _draw_finder_pattern(self, x: int, y: int) -> None:
+        if x > self.size - 7 or y > self.size - 7:
+            raise CannotDrawPatternError(f'trying to draw a finder pattern at <{x}, {y}> in a QR Code of size {self.size}')
+        self.modules[x: x + 7, y: y + 7] = FINDER_PATTERN
+
+    def draw_timing_patterns(self) -> None:
+        track: np.ndarray = (np.arange(7, self.size - 7) % 2 == 0).astype(np.uint8)
+        self.modules[6, 7: self.size - 7] = track
+        self.modules[7: self.size - 7, 6] = track
+        self.function_mask[6, 7: self.size - 7] = True
+        self.function_mask[7: self.size - 7, 6] = True
+
+    def draw_dark_module(self) -> None:
+        self.modules[8, self.size - 8] = 1
+        self.function_mask[8, self.size - 8] = True
+
+    def draw_alignment_patterns(self) -> None:
+        alignment_tracks: list[int] = ALIGNMENT_PATTERN_POSITION_TABLE[self.version - 1]
+        for row in alignment_tracks:
+            for col in alignment_tracks:
+                if ((row - 2 <= 7 and col - 2 <= 7) or (row - 2 <= 7 and col + 2 >= self.size - 7)
+                        or (row + 2 >= self.size - 7 and col - 2 <= 7)):
+                    continue
+                self.modules[row - 2: row + 3, col - 2: col + 3] = ALIGNMENT_PATTERN
+                self.function_mask[row - 2: row + 3, col - 2: col + 3] = True
+
+    def reserve_format_areas(self) -> None:
+        self.function_mask[get_format_positions(self.size)] = True
+
+    def draw_format_info(self, format_bits: Sequence[bool]) -> None:
+        self.modules[get_format_positions(self.size)] = np.tile(np.asarray(format_bits, dtype=np.uint8), 2)
+
+    def draw_version_info(self) -> None:
+        if self.version < Format_Info.FIRST_VERSION_WITH_VERSION_INFO:
+            return
+        positions: tuple[np.ndarray, np.ndarray] = get_version_positions(self.size)
+        self.modules[positions] = np.tile(np.asarray(Format_Info.get_version_bits(self.version), dtype=np.uint8), 2)
+        self.function_mask[positions] = True
+
+    def get_fixed_mask(self) -> np.ndarray:
+        """function modules whose value is the same for every mask i.e. everything but the format info"""
+        fixed: np.ndarray = self.function_mask.copy()
+        fixed[get_format_positions(self.size)] = False
+        return fixed
+
+    def get_module_offsets(self) -> np.ndarray:
+        """flat offsets of the data modules in placement order"""
+        offsets: np.ndarray = get_zigzag_offsets(self.size)
+        return offsets[~self.function_mask.ravel()[offsets]]
+
+    def get_module_sequence(self) -> list[tuple[int, int]]:
+        return [divmod(offset, self.size) for offset in self.get_module_offsets().tolist()]
+
+    def place_codewords(self, codewords: bytes | bytearray, index: array) -> None:
+        """scatters the bits of the block ordered codewords to the offsets given by a placement index"""
+        bits: np.ndarray = np.unpackbits(np.frombuffer(codewords, dtype=np.uint8))
+        offsets: np.ndarray = np.frombuffer(index, dtype=np.uint16)
+        self.modules.ravel()[offsets[len(bits):]] = 0  # remainder bits
+        self.modules.ravel()[offsets[:len(bits)]] = bits
+
+    def copy(self) -> ModuleArray:
+        duplicate: ModuleArray = ModuleArray.__new__(ModuleArray)
+        duplicate.version = self.version
+        duplicate.size = self.size
+        duplicate.modules = self.modules.copy()
+        duplicate.function_mask = self.function_mask  # never changes once drawn so it is shared
+        return duplicate
+
+    def to_list(self) -> list[list[bool]]:
+        return self.modules.astype(np.bool_).tolist()
@@ -0,0 +1,214 @@
+"""
+asyncio API that builds and renders symbols on an executor, so coroutines never block the event loop on the CPU work
+
+    png = await QR_Code.generate('https://www.qrcode.com/', ECCode.M)
+    images = await QR_Code.generate_many(messages, image_format='pbm')
+
+at most max_concurrency jobs run on the executor at once and at most max_queued more wait for a slot, generate raises
+QueueFullError beyond that so a server can shed load. generate_many never submits more than it may, it pulls messages
+from its iterable only as slots free up
+"""
+from __future__ import annotations
+import asyncio
+import os
+import signal
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Iterable
+from QR_Code.builder.Batch import warm_worker
+from QR_Code.builder.QRCodeBuilder import QRCodeBuilder, ENGINE_LIST
+from QR_Code.builder.Symbol_Cache import CachedSymbol, SymbolCache, get_symbol_key
+from QR_Code.display.Writers import render
+from QR_Code.utils.Classes import ECCode
+from QR_Code.utils.Exceptions import QueueFullError
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_QUEUED = 256
+
+
+def build_and_render(message: str, ec_level: ECCode | None, engine: str, image_format: str, scale: int,
+                     quiet_zone: int) -> tuple[CachedSymbol, bytes]:
+    """runs on the executor, returns the compact symbol (for the cache) together with the image"""
+    qr = QRCodeBuilder(message, ec_level, engine)
+    return CachedSymbol.from_builder(qr), render(qr.matrix, image_format, scale, quiet_zone)
+
+
+def render_symbol(symbol: CachedSymbol, image_format: str, scale: int, quiet_zone: int) -> bytes:
+    return symbol.to_bytes(image_format, scale, quiet_zone)
+
+
+def init_worker() -> None:
+    """
+    leaves Ctrl+C to the parent, which shuts the pool down (a forked worker would otherwise run the handler asyncio.run
+    installed in it), then warms the worker
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    warm_worker()
+
+
+def _release_slot(loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore) -> None:
+    """called from the executor's thread when a job is done"""
+    try:
+        loop.call_soon_threadsafe(slots.release)
+    except RuntimeError:  # the loop is closed, nobody is waiting for the slot anymore
+        pass
+
+
+class AsyncGenerator:
+    """
+    hands builds to executor (a process pool of max_concurrency workers when not given) with at most max_concurrency jobs
+    in flight. a job keeps its slot until the executor is done with it, even when the coroutine that asked for it timed out
+    or was cancelled, so the limit holds for the executor and not just for the callers
+    """
+
+    def __init__(self, executor: Executor | None = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 max_queued: int = DEFAULT_MAX_QUEUED, cache: SymbolCache | None = None, engine: str = ENGINE_LIST) -> None:
+        if max_concurrency < 1:
+            raise ValueError(f'max_concurrency must be at least 1, got {max_concurrency}')
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.cache = cache
+        self.engine = engine
+        self._executor: Executor | None = executor
+        self._owns_executor: bool = executor is None
+        self._slots: asyncio.Semaphore | None = None  # made inside the loop that uses it, again if another loop does
+        self._slots_loop: asyncio.AbstractEventLoop | None = None
+        self._queued: int = 0
+
+    @property
+    def queued(self) -> int:
+        """the number of requests waiting for a slot"""
+        return self._queued
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.max_concurrency, initializer=init_worker)
+        return self._executor
+
+    async def start(self) -> None:
+        """
+        starts the executor's workers now instead of on the first request. forked workers inherit every socket open at the
+        time, so a server starts them before it listens, or the copies would keep closed connections open
+        """
+        executor: Executor = self._get_executor()
+        await asyncio.gather(*(asyncio.wrap_future(executor.submit(os.getpid)) for _ in range(self.max_concurrency)))
+
+    async def _run(self, function, *args):
+        """runs function on the executor once a slot is free, the slot is given back when the executor is done"""
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots, self._slots_loop = asyncio.Semaphore(self.max_concurrency), loop
+        slots: asyncio.Semaphore = self._slots
+        self._queued += 1
+        try:
+            await slots.acquire()
+        finally:
+            self._queued -= 1
+        try:
+            future: Future = self._get_executor().submit(function, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: _release_slot(loop, slots))
+        return await asyncio.wrap_future(future)
+
+    async def _generate(self, message: str, ec_level: ECCode | None, image_format: str, scale: int, quiet_zone: int) -> bytes:
+        key: str | None = None
+        if self.cache is not None:
+            key = get_symbol_key(message, ec_level)
+            symbol: CachedSymbol | None = await asyncio.to_thread(self.cache.get, key)  # may read the disk tier
+            if symbol is not None:
+                return await self._run(render_symbol, symbol, image_format, scale, quiet_zone)
+        symbol, image = await self._run(build_and_render, message, ec_level, self.engine, image_format, scale, quiet_zone)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, key, symbol)  # may write the disk tier
+        return image
+
+    async def generate(self, message: str, ec_level: ECCode | None = None, image_format: str = 'png', scale: int = 4,
+                       quiet_zone: int = 4, timeout: float | None = None) -> bytes:
+        """
+        the rendered image of message. raises QueueFullError when max_queued requests are already waiting for a slot and
+        TimeoutError when it takes longer than timeout seconds, waiting for a slot included
+        """
+        if self._queued >= self.max_queued:
+            raise QueueFullError(f'{self._queued} requests are already waiting for one of {self.max_concurrency} slots')
+        return await asyncio.wait_for(self._generate(message, ec_level, image_format, scale, quiet_zone), timeout)
+
+    async def generate_many(self, messages: Iterable[str], ec_level: ECCode | None = None, image_format: str = 'png',
+                            scale: int = 4, quiet_zone: int = 4, timeout: float | None = None,
+                            return_exceptions: bool = False) -> list[bytes | BaseException]:
+        """
+        the rendered images of messages in their order. max_concurrency tasks pull messages from the iterable as they
+        finish, so a long iterable is never turned into tasks all at once. timeout applies to every message on its own.
+        the first exception is raised (after cancelling the rest) unless return_exceptions is True, then it takes the
+        place of its image
+        """
+        results: list[bytes | BaseException] = []
+        iterator = iter(enumerate(messages))
+
+        async def worker() -> None:
+            for index, message in iterator:
+                results.extend([None] * (index + 1 - len(results)))
+                try:
+                    results[index] = await asyncio.wait_for(
+                        self._generate(message, ec_level, image_format, scale, quiet_zone), timeout)
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    results[index] = e
+
+        workers: list[asyncio.Task] = [asyncio.ensure_future(worker()) for _ in range(self.max_concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        return results
+
+    def close(self) -> None:
+        """shuts the executor down if it was made here"""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def __aenter__(self) -> AsyncGenerator:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+
+
+_DEFAULT_GENERATOR: AsyncGenerator | None = None
+
+
+def get_default_generator() -> AsyncGenerator:
+    global _DEFAULT_GENERATOR
+    if _DEFAULT_GENERATOR is None:
+        _DEFAULT_GENERATOR = AsyncGenerator()
+    return _DEFAULT_GENERATOR
+
+
+async def generate(message: str, ec_level: ECCode | None = None, image_format: str = 'png', scale: int = 4,
+                   quiet_zone: int = 4, timeout: float | None = None) -> bytes:
+    return await get_default_generator().generate(message, ec_level, image_format, scale, quiet_zone, timeout)
+
+
+async def generate_many(messages: Iterable[str], ec_level: ECCode | None = None, image_format: str = 'png', scale: int = 4,
+                        quiet_zone: int = 4, timeout: float | None = None,
+                        return_exceptions: bool = False) -> list[bytes | BaseException]:
+    return await get_default_generator().generate_many(messages, ec_level, image_format, scale, quiet_zone, timeout,
+                                                       return_exceptions)
+
+
+if __name__ == '__main__':
+    import time
+
+    async def main() -> None:
+        async with AsyncGenerator(max_concurrency=2) as generator:
+            await generator.generate('warm up')
+            start = time.perf_counter()
+            images = await generator.generate_many(f'https://www.qrcode.com/{i}/' + 'x' * 1500 for i in range(16))
+            print(f'{len(images)} v30+ symbols in {time.perf_counter() - start:.2f}s')
+
+    asyncio.run(main())
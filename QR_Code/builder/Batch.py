@@ -0,0 +1,124 @@
+from __future__ import annotations
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Iterable, NamedTuple
+from QR_Code.builder.QRCodeBuilder import QRCodeBuilder, ENGINE_LIST
+from QR_Code.builder.Symbol_Cache import CachedSymbol, SymbolCache, get_symbol_key
+from QR_Code.builder.Templates import TEMPLATE_CACHE
+from QR_Code.error_correction.Reed_Solomon import warm_generator_polynomials
+from QR_Code.utils.Classes import ECCode
+
+
+class BuildResult(NamedTuple):
+    message: str
+    version: int | None
+    ec_level: ECCode | None
+    matrix: list[list[bool]] | None
+    error: Exception | None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def warm_worker() -> None:
+    """builds the generator polynomials and every version's template up front, run once by each pool worker"""
+    warm_generator_polynomials()
+    TEMPLATE_CACHE.warm()
+
+
+def build_one(message: str, ec_level: ECCode | None = None, engine: str = ENGINE_LIST) -> BuildResult:
+    try:
+        qr = QRCodeBuilder(message, ec_level, engine)
+    except Exception as e:  # reported with the message so one bad message does not abort its batch
+        return BuildResult(message, None, None, None, e)
+    return BuildResult(message, qr.version, qr.ec_level, qr.matrix, None)
+
+
+class BatchBuilder:
+    """
+    builds symbols on a pool of worker processes. the pool is started on the first batch and reused by every later batch
+    until close() is called. a pool that lost a worker (killed for running out of memory, crashed) is replaced, and the
+    messages it had not built yet are sent to the new pool once
+    """
+
+    def __init__(self, workers: int | None = None) -> None:
+        self.workers: int = workers or os.cpu_count() or 1
+        self._executor: ProcessPoolExecutor | None = None
+
+    def build_many(self, messages: Iterable[str], ec_level: ECCode | None = None, chunksize: int = 64,
+                   engine: str = ENGINE_LIST, cache: SymbolCache | None = None) -> list[BuildResult]:
+        """
+        returns one BuildResult per message, in the order the messages were given. every distinct message is built once
+        (repeats share its BuildResult), and with a cache only the messages it misses are sent to the pool and then cached
+        """
+        messages = list(messages)
+        results: dict[str, BuildResult] = {}
+        to_build: list[str] = []
+        for message in dict.fromkeys(messages):
+            symbol: CachedSymbol | None = None if cache is None else cache.get(get_symbol_key(message, ec_level))
+            if symbol is None:
+                to_build.append(message)
+            else:
+                results[message] = BuildResult(message, symbol.version, symbol.ec_level, symbol.matrix, None)
+        for retry in (False, True):
+            to_build = [message for message in to_build if message not in results]
+            if not to_build:
+                break
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers, initializer=warm_worker)
+            try:
+                for result in self._executor.map(partial(build_one, ec_level=ec_level, engine=engine), to_build,
+                                                 chunksize=chunksize):
+                    results[result.message] = result
+                    if cache is not None and result.ok:
+                        cache.put(get_symbol_key(result.message, ec_level),
+                                  CachedSymbol.from_matrix(result.version, result.ec_level, result.matrix))
+            except BrokenProcessPool:
+                self.close()  # the next batch starts a new pool either way
+                if retry:
+                    raise
+        return [results[message] for message in messages]
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self) -> BatchBuilder:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+_DEFAULT_BATCH_BUILDER: BatchBuilder | None = None
+
+
+def build_many(messages: Iterable[str], ec_level: ECCode | None = None, workers: int | None = None, chunksize: int = 64,
+               engine: str = ENGINE_LIST, cache: SymbolCache | None = None) -> list[BuildResult]:
+    """
+    builds every message on a shared process pool and returns their BuildResults in input order. the pool is kept for the
+    next call unless a different number of workers is asked for
+    """
+    global _DEFAULT_BATCH_BUILDER
+    if _DEFAULT_BATCH_BUILDER is not None and workers is not None and workers != _DEFAULT_BATCH_BUILDER.workers:
+        _DEFAULT_BATCH_BUILDER.close()
+        _DEFAULT_BATCH_BUILDER = None
+    if _DEFAULT_BATCH_BUILDER is None:
+        _DEFAULT_BATCH_BUILDER = BatchBuilder(workers)
+    return _DEFAULT_BATCH_BUILDER.build_many(messages, ec_level, chunksize, engine, cache)
+
+
+def shutdown_pool() -> None:
+    global _DEFAULT_BATCH_BUILDER
+    if _DEFAULT_BATCH_BUILDER is not None:
+        _DEFAULT_BATCH_BUILDER.close()
+        _DEFAULT_BATCH_BUILDER = None
+
+
+if __name__ == '__main__':
+    for result in build_many(['HELLO WORLD', 'https://www.qrcode.com/', 'x' * 5000], ECCode.M, workers=2):
+        print(result.message[:20], result.version, result.ec_level, result.error)
@@ -0,0 +1,271 @@
+"""
+Reads a finished module matrix back into its message, the inverse of QRCodeBuilder, for round trip checks without a scanner
+
+    decode(QRCodeBuilder('https://www.qrcode.com/').matrix) == 'https://www.qrcode.com/'
+
+the matrix is indexed [x][y] without a quiet zone, as a list of lists or a numpy array (1 = dark). the format info is
+read from whichever copy is closest to a valid word, the data modules are gathered through the same placement index the
+builder scatters them with (so they come out in block order, already de-interleaved) and unmasked with the builder's mask
+patterns, every block is corrected with the GF(256) tables and the segments are parsed from the corrected data codewords
+"""
+from __future__ import annotations
+from array import array
+from itertools import chain
+from typing import Any, Iterable, NamedTuple
+from QR_Code.builder.Format_Info import FORMAT_BITS, FORMAT_WORDS, get_format_positions
+from QR_Code.builder.Masking import get_data_mask_patterns
+from QR_Code.builder.Placement import get_placement_index
+from QR_Code.builder.Templates import get_template
+from QR_Code.error_correction.Galois_Field import xor_bytes
+from QR_Code.error_correction.Reed_Solomon import correct_block
+from QR_Code.processing.Bit_Writer import BitReader
+from QR_Code.processing.Segmentation import Segment
+from QR_Code.processing.Sequencing import (ALPHANUMERIC_CHARS, KANJI_BITS, KANJI_CODE_RANGES, UTF8_ECI_DESIGNATOR, get_block_info,
+                                           get_length_bits, get_total_codewords)
+from QR_Code.utils.Classes import ECCode, EncodingMode
+from QR_Code.utils.Exceptions import DecodingError
+
+MAX_FORMAT_ERRORS = 3  # format words are at least 7 bits apart, so up to 3 wrong bits still point to one word
+MODE_INDICATOR_BITS = 4
+TERMINATOR = 0
+
+_BIT_CHARS: bytes = bytes.maketrans(b'\x00\x01', b'01')
+
+# ECI designator -> the codec of the byte segments after it
+ECI_ENCODINGS: dict[int, str] = {1: 'latin-1', 3: 'latin-1', 20: 'shift_jis', 26: 'utf-8'}
+
+# (version, ec_code, mask_id) -> the mask bits of the data modules in block ordered stream order, packed into bytes
+_MASK_STREAM_CACHE: dict[tuple[int, ECCode, int], bytes] = {}
+
+
+class DecodedSymbol(NamedTuple):
+    message: str
+    segments: list[Segment]
+    version: int
+    ec_level: ECCode
+    mask_id: int
+    corrected_codewords: int  # codewords the error correction had to fix, 0 for a symbol straight from the builder
+
+
+def _pack_bits(bits: bytes) -> bytes:
+    """bytes of 0 and 1 (a multiple of 8 of them) packed 8 to a byte, most significant first"""
+    return int(bits.translate(_BIT_CHARS), 2).to_bytes(len(bits) // 8, 'big') if bits else b''
+
+
+def _read_stream(matrix: Any, index: array, bit_count: int) -> bytes:
+    """the modules at the first bit_count offsets of index, packed into bytes"""
+    if isinstance(matrix, list):
+        flat: list = list(chain.from_iterable(matrix))
+        return _pack_bits(bytes(map(flat.__getitem__, index[:bit_count])))
+    import numpy as np  # numpy is only needed for numpy matrices
+    offsets: Any = np.frombuffer(index, dtype=np.uint16)[:bit_count]
+    return np.packbits(np.asarray(matrix).reshape(-1)[offsets] != 0).tobytes()
+
+
+def _get_mask_stream(version: int, ec_code: ECCode, mask_id: int, index: array, bit_count: int) -> bytes:
+    key: tuple[int, ECCode, int] = (version, ec_code, mask_id)
+    stream: bytes | None = _MASK_STREAM_CACHE.get(key)
+    if stream is None:
+        template = get_template(version)
+        pattern: list[list[bool]] = get_data_mask_patterns(version, template.size, template.module_sequence)[mask_id]
+        stream = _MASK_STREAM_CACHE[key] = _read_stream(pattern, index, bit_count)
+    return stream
+
+
+def read_format(matrix: Any) -> tuple[ECCode, int]:
+    """the EC level and mask id, from the copy of the format info with the fewest wrong bits"""
+    positions: list[tuple[int, int]] = get_format_positions(len(matrix))
+    bits: list[int] = [1 if matrix[x][y] else 0 for x, y in positions]
+    best_errors, best_data = FORMAT_BITS, 0
+    for start in (0, FORMAT_BITS):
+        word: int = int(''.join(map(str, bits[start: start + FORMAT_BITS])), 2)
+        for data, format_word in enumerate(FORMAT_WORDS):
+            errors: int = (word ^ format_word).bit_count()
+            if errors < best_errors:
+                best_errors, best_data = errors, data
+    if best_errors > MAX_FORMAT_ERRORS:
+        raise DecodingError('neither copy of the format info can be read')
+    return ECCode(best_data >> 3), best_data & 7
+
+
+def get_version(size: int) -> int:
+    version, remainder = divmod(size - 17, 4)
+    if remainder or not 1 <= version <= 40:
+        raise DecodingError(f'{size} modules is not the size of a symbol (without a quiet zone)')
+    return version
+
+
+def read_codewords(matrix: Any, version: int, ec_level: ECCode, mask_id: int) -> bytes:
+    """the unmasked codewords of matrix, the data codewords of every block followed by the EC codewords of every block"""
+    template = get_template(version)
+    index: array = get_placement_index(version, ec_level, template.size, template.module_sequence)
+    bit_count: int = get_total_codewords(version, ec_level) * 8
+    return xor_bytes(_read_stream(matrix, index, bit_count), _get_mask_stream(version, ec_level, mask_id, index, bit_count))
+
+
+def correct_codewords(codewords: bytes, version: int, ec_level: ECCode) -> tuple[bytes, int]:
+    """the corrected data codewords of every block and the number of codewords that had to be fixed"""
+    ec_per_block, block_sizes = get_block_info(version, ec_level)
+    data = bytearray()
+    corrected: int = 0
+    data_start: int = 0
+    ec_start: int = sum(block_sizes)
+    for block_index, block_size in enumerate(block_sizes):
+        block = bytearray(codewords[data_start: data_start + block_size])
+        block += codewords[ec_start + block_index * ec_per_block: ec_start + (block_index + 1) * ec_per_block]
+        corrected += correct_block(block, ec_per_block)
+        data += block[:block_size]
+        data_start += block_size
+    return bytes(data), corrected
+
+
+def _parse_numeric(reader: BitReader, count: int) -> str:
+    groups: list[int] = reader.read_fields(count // 3, 10)
+    if groups and max(groups) > 999:
+        raise DecodingError('a numeric group is larger than 999')
+    text: str = ''.join(map('{:03d}'.format, groups))
+    match count % 3:
+        case 2:
+            value: int = reader.read(7)
+            if value > 99:
+                raise DecodingError('a numeric group is larger than 99')
+            text += f'{value:02d}'
+        case 1:
+            value = reader.read(4)
+            if value > 9:
+                raise DecodingError('a numeric group is larger than 9')
+            text += str(value)
+    return text
+
+
+def _parse_alphanumeric(reader: BitReader, count: int) -> str:
+    pairs: list[int] = reader.read_fields(count // 2, 11)
+    if pairs and max(pairs) >= 45 * 45:
+        raise DecodingError('an alphanumeric pair is larger than 2024')
+    text: str = ''.join(ALPHANUMERIC_CHARS[pair // 45] + ALPHANUMERIC_CHARS[pair % 45] for pair in pairs)
+    if count % 2:
+        value: int = reader.read(6)
+        if value >= 45:
+            raise DecodingError('an alphanumeric character is larger than 44')
+        text += ALPHANUMERIC_CHARS[value]
+    return text
+
+
+def _parse_kanji(reader: BitReader, count: int) -> str:
+    codes = bytearray()
+    for value in reader.read_fields(count, KANJI_BITS):
+        code: int = (value // 0xc0) << 8 | value % 0xc0
+        for first, last, offset in KANJI_CODE_RANGES:
+            if first <= code + offset <= last:
+                codes += (code + offset).to_bytes(2, 'big')
+                break
+        else:
+            raise DecodingError(f'kanji value {value} is outside the Shift JIS ranges')
+    try:
+        return codes.decode('shift_jis')
+    except UnicodeDecodeError:
+        raise DecodingError('a kanji segment has codes that are not Shift JIS characters') from None
+
+
+def _parse_eci_designator(reader: BitReader) -> int:
+    """1, 2 or 3 bytes, told apart by their leading bits 0, 10 and 110"""
+    first: int = reader.read(8)
+    if first & 0x80 == 0:
+        return first
+    if first & 0xc0 == 0x80:
+        return (first & 0x3f) << 8 | reader.read(8)
+    if first & 0xe0 == 0xc0:
+        return (first & 0x1f) << 16 | reader.read(16)
+    raise DecodingError(f'malformed ECI designator {first:08b}')
+
+
+def parse_segments(data: bytes, version: int) -> list[Segment]:
+    """
+    the segments of the data codewords, up to the terminator (or the end of the data when it did not fit). an ECI header
+    becomes an ECI segment when it is UTF-8 (the only one the encoder writes), the other supported ones only change the
+    character set of the byte segments after them
+    """
+    reader = BitReader(data)
+    segments: list[Segment] = []
+    byte_encoding: str = 'latin-1'
+    while reader.remaining_bits >= MODE_INDICATOR_BITS:
+        indicator: int = reader.read(MODE_INDICATOR_BITS)
+        if indicator == TERMINATOR:
+            break
+        try:
+            mode = EncodingMode(indicator)
+        except ValueError:
+            raise DecodingError(f'unknown mode indicator {indicator:04b}') from None
+        if mode is EncodingMode.ECI:
+            designator: int = _parse_eci_designator(reader)
+            if designator not in ECI_ENCODINGS:
+                raise DecodingError(f'ECI {designator:06d} is not supported')
+            byte_encoding = ECI_ENCODINGS[designator]
+            if designator == UTF8_ECI_DESIGNATOR:
+                segments.append(Segment(mode, ''))
+            continue
+        count: int = reader.read(get_length_bits(mode, version))
+        match mode:
+            case EncodingMode.NUMERIC:
+                segments.append(Segment(mode, _parse_numeric(reader, count)))
+            case EncodingMode.ALPHA_NUMERIC:
+                segments.append(Segment(mode, _parse_alphanumeric(reader, count)))
+            case EncodingMode.BYTE:
+                try:
+                    segments.append(Segment(mode, reader.read_bytes(count).decode(byte_encoding)))
+                except UnicodeDecodeError:
+                    raise DecodingError(f'a byte segment is not valid {byte_encoding}') from None
+            case EncodingMode.KANJI:
+                segments.append(Segment(mode, _parse_kanji(reader, count)))
+    return segments
+
+
+def decode_symbol(matrix: Any) -> DecodedSymbol:
+    """everything read from matrix, raises DecodingError when it can not be decoded"""
+    version: int = get_version(len(matrix))
+    ec_level, mask_id = read_format(matrix)
+    data, corrected = correct_codewords(read_codewords(matrix, version, ec_level, mask_id), version, ec_level)
+    segments: list[Segment] = parse_segments(data, version)
+    return DecodedSymbol(''.join(segment.text for segment in segments), segments, version, ec_level, mask_id, corrected)
+
+
+def decode(matrix: Any) -> str:
+    """the message of a finished module matrix such as QRCodeBuilder.matrix"""
+    return decode_symbol(matrix).message
+
+
+def check_round_trip(messages: Iterable[str], ec_level: ECCode | None = None, engine: str = 'list') -> list[str]:
+    """builds and decodes every message, returns the ones that did not come back unchanged"""
+    from QR_Code.builder.QRCodeBuilder import QRCodeBuilder
+    failed: list[str] = []
+    for message in messages:
+        qr = QRCodeBuilder(message, ec_level, engine)
+        try:
+            if decode(qr.array.modules if engine == 'array' else qr.matrix) != message:
+                failed.append(message)
+        except DecodingError:
+            failed.append(message)
+    return failed
+
+
+if __name__ == '__main__':
+    import random
+    import time
+    from QR_Code.builder.QRCodeBuilder import QRCodeBuilder
+
+    rng = random.Random(0)
+    alphabets = ['0123456789', ALPHANUMERIC_CHARS, ''.join(map(chr, range(32, 256))), 'カタログ番号漢字テスト 0123 ABC',
+                 'ÄÖÜ€😀 abc']
+    samples = [''.join(rng.choices(rng.choice(alphabets), k=rng.randint(1, 400))) for _ in range(300)]
+    for engine_name in ('list', 'array'):
+        start = time.perf_counter()
+        print(engine_name, 'round trip failures:', len(check_round_trip(samples, engine=engine_name)),
+              f'{len(samples) / (time.perf_counter() - start):.0f} symbols/s')
+
+    qr_code = QRCodeBuilder('https://www.qrcode.com/' * 20, ECCode.M)
+    damaged = [col[:] for col in qr_code.matrix]
+    placement = get_placement_index(qr_code.version, qr_code.ec_level, qr_code.size, qr_code._module_sequence)
+    for offset in placement[:64]:  # the first 8 codewords of the first block
+        damaged[offset // qr_code.size][offset % qr_code.size] ^= True
+    symbol = decode_symbol(damaged)
+    print(symbol.message == qr_code._message, f'{symbol.corrected_codewords} codewords corrected')
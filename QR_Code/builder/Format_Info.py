@@ -0,0 +1,89 @@
+"""
+Lookup tables for the format information (EC level + mask, 15 bits) and the version information (versions 7 and up, 18 bits)
+together with the coordinates they are written to, so writing either is a table lookup followed by a scatter
+
+coordinates are (x, y) like QRCodeBuilder.matrix and are listed most significant bit first, both copies one after the other
+"""
+from __future__ import annotations
+from QR_Code.utils.Classes import ECCode
+
+FORMAT_GENERATOR = 0b10100110111  # x^10 + x^8 + x^5 + x^4 + x^2 + x + 1
+FORMAT_MASK = 0b101010000010010
+VERSION_GENERATOR = 0b1111100100101  # x^12 + x^11 + x^10 + x^9 + x^8 + x^5 + x^2 + 1
+
+FORMAT_BITS = 15
+VERSION_BITS = 18
+FIRST_VERSION_WITH_VERSION_INFO = 7
+
+
+def _bch_word(data: int, generator: int) -> int:
+    """appends the remainder of the division of data (shifted by the generator's degree) by generator, over GF(2)"""
+    degree: int = generator.bit_length() - 1
+    remainder: int = data << degree
+    for shift in range(remainder.bit_length() - 1, degree - 1, -1):
+        if remainder >> shift & 1:
+            remainder ^= generator << (shift - degree)
+    return data << degree | remainder
+
+
+# (EC indicator bits << 3 | mask id) -> masked format word, the EC indicator bits are the ECCode values
+FORMAT_WORDS: list[int] = [_bch_word(data, FORMAT_GENERATOR) ^ FORMAT_MASK for data in range(32)]
+
+# version -> version word, only versions 7 to 40 have one
+VERSION_WORDS: dict[int, int] = {version: _bch_word(version, VERSION_GENERATOR) for version in range(FIRST_VERSION_WITH_VERSION_INFO, 41)}
+
+_FORMAT_POSITIONS_CACHE: dict[int, list[tuple[int, int]]] = {}
+_VERSION_POSITIONS_CACHE: dict[int, list[tuple[int, int]]] = {}
+
+
+def get_format_word(ec_level: ECCode, mask_id: int) -> int:
+    return FORMAT_WORDS[ec_level.value << 3 | mask_id]
+
+
+def get_format_bits(ec_level: ECCode, mask_id: int) -> list[bool]:
+    """the 15 format bits, most significant first"""
+    word: int = get_format_word(ec_level, mask_id)
+    return [bool(word >> (FORMAT_BITS - 1 - i) & 1) for i in range(FORMAT_BITS)]
+
+
+def get_version_bits(version: int) -> list[bool]:
+    """the 18 version bits, most significant first"""
+    word: int = VERSION_WORDS[version]
+    return [bool(word >> (VERSION_BITS - 1 - i) & 1) for i in range(VERSION_BITS)]
+
+
+def get_format_positions(size: int) -> list[tuple[int, int]]:
+    """30 positions, the copy around the top left finder pattern followed by the copy split between the other two"""
+    positions: list[tuple[int, int]] | None = _FORMAT_POSITIONS_CACHE.get(size)
+    if positions is None:
+        first: list[tuple[int, int]] = [(i, 8) for i in range(6)] + [(7, 8), (8, 8), (8, 7)] + [(8, 5 - i) for i in range(6)]
+        second: list[tuple[int, int]] = [(8, size - 1 - i) for i in range(7)] + [(size - 8 + i, 8) for i in range(8)]
+        positions = _FORMAT_POSITIONS_CACHE[size] = first + second
+    return positions
+
+
+def get_version_positions(size: int) -> list[tuple[int, int]]:
+    """36 positions, the 6x3 block below the top right finder pattern then the 3x6 block beside the bottom left one"""
+    positions: list[tuple[int, int]] | None = _VERSION_POSITIONS_CACHE.get(size)
+    if positions is None:
+        bit_indices: range = range(VERSION_BITS - 1, -1, -1)  # bit i of the word sits at offset i // 3, i % 3 of a block
+        top_right: list[tuple[int, int]] = [(size - 11 + i % 3, i // 3) for i in bit_indices]
+        bottom_left: list[tuple[int, int]] = [(i // 3, size - 11 + i % 3) for i in bit_indices]
+        positions = _VERSION_POSITIONS_CACHE[size] = top_right + bottom_left
+    return positions
+
+
+def write_format_info(matrix, ec_level: ECCode, mask_id: int) -> None:
+    """writes both copies of the format info into a list matrix (or anything indexed [x][y])"""
+    bits: list[bool] = get_format_bits(ec_level, mask_id) * 2
+    for (x, y), bit in zip(get_format_positions(len(matrix)), bits):
+        matrix[x][y] = bit
+
+
+def write_version_info(matrix, version: int) -> None:
+    """writes both copies of the version info into a list matrix, versions below 7 have none"""
+    if version < FIRST_VERSION_WITH_VERSION_INFO:
+        return
+    bits: list[bool] = get_version_bits(version) * 2
+    for (x, y), bit in zip(get_version_positions(len(matrix)), bits):
+        matrix[x][y] = bit
@@ -1,8 +1,10 @@
+import math
 from QR_Code.display import Image
-from typing import Callable
-import copy
-from QR_Code.error_correction.Polynomial import GF256Polynomial
+from typing import Callable, Any, NamedTuple
+from operator import xor
+from QR_Code.builder.Format_Info import get_format_bits, write_format_info
 from QR_Code.utils.Classes import ECCode
+from QR_Code.utils.Instrumentation import BuildStats, measure, STAGE_MASK_CANDIDATE, STAGE_FORMAT_INFO
 
 
 def mask_pattern_0(x, y):
@@ -48,17 +50,65 @@ MASK_DICT: dict[int, Callable[[int, int], bool]] = {
     7: mask_pattern_7
 }
 
-EC_CODES_ORDER = 'LMQH'
-FORMAT_DIVISOR = GF256Polynomial([1, 0, 1, 0, 0, 1, 1, 0, 1, 1, 1])
-FORMAT_MASK = [1, 0, 1, 0, 1, 0, 0, 0, 0, 0, 1, 0, 0, 1, 0]
+
+SCORING_REFERENCE = 'reference'  # the _rule_* methods, one candidate at a time
+SCORING_VECTORIZED = 'vectorized'  # Penalty_Scoring, all candidates at once, needs numpy
+
+# the reference rules from the cheapest to the most expensive to evaluate, rule 3 takes several times as long as the others
+RULE_ORDER = (4, 2, 1, 3)
+
+
+class MaskSearchStats(NamedTuple):
+    """how much of the exhaustive search (8 candidates * 4 rules) a reference mask search skipped"""
+    rules_evaluated: int
+    rules_pruned: int
+    candidates_pruned: int  # candidates abandoned before their last rule
+
+
+# version -> the 8 mask patterns restricted to the data modules of that version, as [x][y] matrices
+_MASK_PATTERN_CACHE: dict[int, list[list[list[bool]]]] = {}
+
+
+def get_data_mask_patterns(version: int, size: int, module_order: list[tuple[int, int]]) -> list[list[list[bool]]]:
+    """built on the first call for a version, module_order is only read on that call"""
+    patterns: list[list[list[bool]]] | None = _MASK_PATTERN_CACHE.get(version)
+    if patterns is None:
+        patterns = []
+        for mask_id in range(8):
+            masking_func = MASK_DICT[mask_id]
+            pattern: list[list[bool]] = [[False] * size for _ in range(size)]
+            for x, y in module_order:
+                pattern[x][y] = masking_func(x, y)
+            patterns.append(pattern)
+        _MASK_PATTERN_CACHE[version] = patterns
+    return patterns
+
+
+def get_dark_module_penalty(num_dark_modules: int, size: int) -> int:
+    """rule 4, shared by the reference rules and the scoring engine"""
+    def nearest_5multiple(percent: float) -> int:
+        if percent < 50:
+            return int(percent // 5 * 5) + 5
+        else:
+            return int(percent // 5 * 5)
+
+    rounded_dark_module_percent: int = nearest_5multiple(num_dark_modules / size ** 2 * 100)
+
+    return abs(50 - rounded_dark_module_percent) * 2
 
 
 class Masker:
-    def __init__(self, size: int, version: int, ec_level: ECCode) -> None:
+    def __init__(self, size: int, version: int, ec_level: ECCode, scoring: str = SCORING_REFERENCE,
+                 stats: BuildStats | None = None) -> None:
         self.size = size
+        self.scoring = scoring
         self.matrix = [[False for i in range(self.size)] for i in range(self.size)]
         self.version = version
         self.ec_level = ec_level
+        self._array_buffer: Any = None  # reused by every mask applied to a numpy matrix
+        self.stats = stats
+        self.search_stats: MaskSearchStats | None = None  # of the latest reference search
+        self._rules: dict[int, Callable[[], int]] = {1: self._rule_1, 2: self._rule_2, 3: self._rule_3, 4: self._rule_4}
 
     def show(self, pattern_no: int = 0) -> None:
         for i in range(self.size):
@@ -66,49 +116,112 @@ class Masker:
                 self.matrix[i][j] = MASK_DICT[pattern_no](i, j)
         Image.show(self.matrix)
 
+    def _get_format_bits(self, mask_id: int) -> list[bool]:
+        return get_format_bits(self.ec_level, mask_id)
+
     def _add_format_info(self, mask_id: int):
-        err_level_idx = EC_CODES_ORDER.index(self.ec_level.name)
-        format_poly_coeffs: list[int] = [err_level_idx >> 1, err_level_idx & 1, mask_id >> 2, (mask_id >> 1) & 1, mask_id & 1]
-        rem_poly = GF256Polynomial(format_poly_coeffs, 10) % FORMAT_DIVISOR
-        if len(rem_poly) < 10:
-            format_poly_coeffs.extend([0] * (10 - len(rem_poly)) + rem_poly.coefficients)
-        else:
-            format_poly_coeffs.extend(rem_poly.coefficients)
-        if len(format_poly_coeffs) < 15:
-            format_poly_coeffs.extend([1] * (15 - len(format_poly_coeffs)))
-        format_poly_coeffs = [bit == 1 for bit in format_poly_coeffs]
-        for i in range(6):
-            self.matrix[i][8] = self.matrix[8][-(i + 1)] = format_poly_coeffs[i]  # type: ignore
-        self.matrix[7][8] = self.matrix[8][-7] = format_poly_coeffs[6]
-        self.matrix[8][8] = self.matrix[-8][8] = format_poly_coeffs[7]
-        self.matrix[8][7] = self.matrix[-7][8] = format_poly_coeffs[8]
-
-        for i in range(6):
-            self.matrix[8][5 - i] = self.matrix[i - 6][8] = format_poly_coeffs[9 + i]
+        with measure(self.stats, STAGE_FORMAT_INFO):
+            write_format_info(self.matrix, self.ec_level, mask_id)
 
     def apply_mask(self, matrix: list[list[bool]], module_order: list[tuple[int, int]], mask_id: int) -> list[list[bool]]:
-        self.matrix = copy.deepcopy(matrix)
-        masking_func = MASK_DICT[mask_id]
-        for x, y in module_order:
-            self.matrix[x][y] = self.matrix[x][y] ^ masking_func(x, y)
+        """
+        xors the mask into the data modules of matrix and writes the format info, the result is written into a buffer owned by
+        the masker (and returned) so the matrix passed in is left untouched. a numpy matrix gives back a numpy matrix
+        """
+        if isinstance(matrix, list):
+            if not isinstance(self.matrix, list):
+                self.matrix = [[False for i in range(self.size)] for i in range(self.size)]
+            pattern: list[list[bool]] = get_data_mask_patterns(self.version, self.size, module_order)[mask_id]
+            for buffer_col, col, pattern_col in zip(self.matrix, matrix, pattern):
+                buffer_col[:] = map(xor, col, pattern_col)
+        else:
+            from QR_Code.builder.Array_Engine import get_mask_arrays, np  # numpy is only needed for numpy matrices
+            if self._array_buffer is None:
+                self._array_buffer = np.empty_like(matrix)
+            np.bitwise_xor(matrix, get_mask_arrays(self.version, self.size, module_order)[mask_id], out=self._array_buffer)
+            self.matrix = self._array_buffer
         self._add_format_info(mask_id)
         return self.matrix
 
     def apply_best_mask(self, matrix: list[list[bool]], module_order: list[tuple[int, int]]) -> list[list[bool]]:
-        # original_matrix = matrix
-        best_mask: int = 0
-        best_cost: int = 999999999999999
+        if self.scoring == SCORING_VECTORIZED:
+            with measure(self.stats, STAGE_MASK_CANDIDATE):
+                candidates, costs = self._score_candidates(matrix, module_order)
+            if self.stats is not None:
+                for mask_id, cost in enumerate(costs):
+                    self.stats.record_event('mask_candidate', {'mask_id': mask_id, 'cost': cost})
+            self.matrix = self._array_buffer = candidates[costs.index(min(costs))]  # masked and with its format info
+            return self.matrix
+
+        # branch and bound: a candidate is dropped as soon as its partial cost reaches the best full cost so far, since the
+        # rules never subtract and only a strictly lower cost replaces the best mask this picks the same mask as scoring
+        # every rule of every candidate. the best candidate is kept aside, so the winner is not masked a second time
+        best_cost: float = math.inf
+        best_matrix: Any = None
+        rules_evaluated: int = 0
+        candidates_pruned: int = 0
         for mask_id in range(8):
-            self.apply_mask(matrix, module_order, mask_id)
-            cost = self._calculate_cost()
+            with measure(self.stats, STAGE_MASK_CANDIDATE):
+                self.apply_mask(matrix, module_order, mask_id)
+                cost, rules = self._calculate_cost(best_cost)
+            rules_evaluated += rules
+            if self.stats is not None:
+                self.stats.record_event('mask_candidate', {'mask_id': mask_id, 'cost': cost, 'rules': rules,
+                                                           'pruned': cost >= best_cost})
             if cost < best_cost:
-                best_mask = mask_id
                 best_cost = cost
-        self.apply_mask(matrix, module_order, best_mask)
+                best_matrix = self._keep_candidate(best_matrix)
+            elif rules < len(RULE_ORDER):
+                candidates_pruned += 1
+        self.search_stats = MaskSearchStats(rules_evaluated, 8 * len(RULE_ORDER) - rules_evaluated, candidates_pruned)
+        if self.stats is not None:
+            self.stats.record_event('mask_search', self.search_stats._asdict())
+        self.matrix = best_matrix
+        if not isinstance(best_matrix, list):
+            self._array_buffer = best_matrix
         return self.matrix
 
-    def _calculate_cost(self) -> int:
-        return self._rule_1() + self._rule_2() + self._rule_3() + self._rule_4()
+    def _keep_candidate(self, previous_best: Any) -> Any:
+        """
+        takes the candidate out of the buffer apply_mask writes into, which becomes the previous best candidate's (free
+        again now) instead, and returns it
+        """
+        candidate: Any = self.matrix
+        if isinstance(candidate, list):
+            self.matrix = previous_best if previous_best is not None else [[False] * self.size for _ in range(self.size)]
+        else:
+            self._array_buffer = previous_best  # apply_mask makes a new buffer when there is none
+        return candidate
+
+    def _score_candidates(self, matrix: Any, module_order: list[tuple[int, int]]) -> tuple[Any, list[int]]:
+        """masks matrix with all 8 masks and scores the candidates at once with the numpy scoring engine"""
+        from QR_Code.builder.Array_Engine import get_mask_arrays, get_format_positions, np
+        from QR_Code.builder.Penalty_Scoring import score_penalties
+        from QR_Code.builder.Templates import get_template
+        candidates = np.bitwise_xor(np.asarray(matrix, dtype=np.uint8), get_mask_arrays(self.version, self.size, module_order))
+        format_positions = get_format_positions(self.size)
+        for mask_id in range(8):
+            candidates[mask_id][format_positions] = np.tile(np.array(self._get_format_bits(mask_id), dtype=np.uint8), 2)
+        return candidates, score_penalties(candidates, get_template(self.version).get_penalty_baseline()).sum(axis=1).tolist()
+
+    def _calculate_cost(self, bound: float = math.inf) -> tuple[int, int]:
+        """
+        adds the rules up in RULE_ORDER and stops once the sum reaches bound, returns the sum and the number of rules it
+        took. a sum below bound is the full cost
+        """
+        if not isinstance(self.matrix, list):
+            array_matrix = self.matrix
+            self.matrix = array_matrix.astype(bool).tolist()  # the rules index python lists
+            try:
+                return self._calculate_cost(bound)
+            finally:
+                self.matrix = array_matrix
+        cost: int = 0
+        for rules, rule in enumerate(RULE_ORDER, 1):
+            cost += self._rules[rule]()
+            if cost >= bound:
+                return cost, rules
+        return cost, len(RULE_ORDER)
 
     def __get_row(self, idx: int) -> list[bool]:
         return [self.matrix[i][idx] for i in range(self.size)]
@@ -156,28 +269,20 @@ class Masker:
         for i in range(self.size):
             col: list[bool] = self.matrix[i]
             row: list[bool] = self.__get_row(i)
-            for j in range(self.size - 11):
-                if col[i: i + 11] == R3PATTERN or col[i: i + 11] == REVERSE_R3PATTERN:
+            for j in range(self.size - 10):
+                if col[j: j + 11] == R3PATTERN or col[j: j + 11] == REVERSE_R3PATTERN:
                     penalty += 40
-                if row[i: i + 11] == R3PATTERN or row[i: i + 11] == REVERSE_R3PATTERN:
+                if row[j: j + 11] == R3PATTERN or row[j: j + 11] == REVERSE_R3PATTERN:
                     penalty += 40
         return penalty
 
     def _rule_4(self) -> int:
-        def nearest_5multiple(percent: float) -> int:
-            if percent < 50:
-                return int(percent // 5 * 5) + 5
-            else:
-                return int(percent // 5 * 5)
-
         num_dark_modules = 0
         for x in range(self.size):
             for y in range(self.size):
                 num_dark_modules += 1 if self.matrix[x][y] else 0
 
-        rounded_dark_module_percent: int = nearest_5multiple(num_dark_modules / self.size ** 2 * 100)
-
-        return abs(50 - rounded_dark_module_percent) * 2
+        return get_dark_module_penalty(num_dark_modules, self.size)
 
 
 if __name__ == '__main__':
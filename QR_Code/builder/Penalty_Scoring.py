@@ -0,0 +1,124 @@
+"""
+NumPy implementation of the four mask penalty rules, selected with Masker(..., scoring=SCORING_VECTORIZED)
+
+every rule works on a stack of candidates of shape (n, size, size) and scores whole rows and columns with shifted array
+comparisons instead of walking the modules, the results are identical to the Masker._rule_* reference methods
+"""
+from __future__ import annotations
+import numpy as np
+from QR_Code.builder.Masking import get_dark_module_penalty
+
+# 1011101 followed by 4 light modules and the reverse, as 11 bit integers read left to right
+R3PATTERN_VALUE = 0b10111010000
+REVERSE_R3PATTERN_VALUE = 0b00001011101
+
+
+def _lines(candidates: np.ndarray) -> np.ndarray:
+    """stacks every column and every row of the candidates, shape (n, 2 * size, size)"""
+    return np.concatenate((candidates, candidates.transpose(0, 2, 1)), axis=1)
+
+
+def _rule_1_terms(lines: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # a run of length L >= 5 costs L - 2 = (number of 5 long windows inside it, L - 4) + 2 for the window it starts with
+    same_as_next: np.ndarray = lines[..., 1:] == lines[..., :-1]
+    window_of_5: np.ndarray = same_as_next[..., :-3] & same_as_next[..., 1:-2] & same_as_next[..., 2:-1] & same_as_next[..., 3:]
+    run_starts: np.ndarray = window_of_5.copy()
+    run_starts[..., 1:] &= ~same_as_next[..., :-4]
+    return window_of_5, run_starts
+
+
+def _rule_2_terms(candidates: np.ndarray) -> np.ndarray:
+    top_left: np.ndarray = candidates[:, :-1, :-1]
+    return (top_left == candidates[:, 1:, :-1]) & (top_left == candidates[:, :-1, 1:]) & (top_left == candidates[:, 1:, 1:])
+
+
+def _rule_3_terms(lines: np.ndarray) -> np.ndarray:
+    lines = lines.astype(np.uint16)
+    windows: int = lines.shape[-1] - 10
+    window_values: np.ndarray = np.zeros(lines.shape[:-1] + (windows,), dtype=np.uint16)
+    for k in range(11):
+        window_values |= lines[..., k: k + windows] << (10 - k)
+    return (window_values == R3PATTERN_VALUE) | (window_values == REVERSE_R3PATTERN_VALUE)
+
+
+def _all_in_window(lines: np.ndarray, width: int) -> np.ndarray:
+    windows: int = lines.shape[-1] - width + 1
+    result: np.ndarray = lines[..., :windows].copy()
+    for k in range(1, width):
+        result &= lines[..., k: k + windows]
+    return result
+
+
+class PenaltyBaseline:
+    """
+    the mask invariant part of the penalty of a version. a penalty term whose modules are all fixed (function modules other
+    than the format info) scores the same for every mask, so those terms are added up once here and only the remaining
+    terms are scored per candidate
+    """
+
+    def __init__(self, modules: np.ndarray, fixed: np.ndarray) -> None:
+        fixed_lines: np.ndarray = _lines(fixed[np.newaxis])
+        fixed_windows_of_5: np.ndarray = _all_in_window(fixed_lines, 5)
+        fixed_run_starts: np.ndarray = fixed_windows_of_5.copy()
+        fixed_run_starts[..., 1:] &= fixed_lines[..., :-5]  # a run start also depends on the module before the window
+        fixed_blocks: np.ndarray = _all_in_window(_all_in_window(fixed[np.newaxis], 2).transpose(0, 2, 1), 2).transpose(0, 2, 1)
+        fixed_r3_windows: np.ndarray = _all_in_window(fixed_lines, 11)
+
+        self.variable_windows_of_5: np.ndarray = ~fixed_windows_of_5
+        self.variable_run_starts: np.ndarray = ~fixed_run_starts
+        self.variable_blocks: np.ndarray = ~fixed_blocks
+        self.variable_r3_windows: np.ndarray = ~fixed_r3_windows
+        self.variable_modules: np.ndarray = ~fixed
+
+        base: np.ndarray = modules[np.newaxis].astype(np.bool_)
+        window_of_5, run_starts = _rule_1_terms(_lines(base))
+        self.fixed_penalties: tuple[int, int, int] = (
+            int((window_of_5 & fixed_windows_of_5).sum() + 2 * (run_starts & fixed_run_starts).sum()),
+            int(3 * (_rule_2_terms(base) & fixed_blocks).sum()),
+            int(40 * (_rule_3_terms(_lines(base)) & fixed_r3_windows).sum())
+        )
+        self.fixed_dark_modules: int = int(np.count_nonzero(base[0] & fixed))
+
+
+def rule_1(candidates: np.ndarray, baseline: PenaltyBaseline | None = None) -> np.ndarray:
+    window_of_5, run_starts = _rule_1_terms(_lines(candidates))
+    if baseline is None:
+        return window_of_5.sum(axis=(1, 2)) + 2 * run_starts.sum(axis=(1, 2))
+    return ((window_of_5 & baseline.variable_windows_of_5).sum(axis=(1, 2)) +
+            2 * (run_starts & baseline.variable_run_starts).sum(axis=(1, 2)) + baseline.fixed_penalties[0])
+
+
+def rule_2(candidates: np.ndarray, baseline: PenaltyBaseline | None = None) -> np.ndarray:
+    same_block: np.ndarray = _rule_2_terms(candidates)
+    if baseline is None:
+        return 3 * same_block.sum(axis=(1, 2))
+    return 3 * (same_block & baseline.variable_blocks).sum(axis=(1, 2)) + baseline.fixed_penalties[1]
+
+
+def rule_3(candidates: np.ndarray, baseline: PenaltyBaseline | None = None) -> np.ndarray:
+    matches: np.ndarray = _rule_3_terms(_lines(candidates))
+    if baseline is None:
+        return 40 * matches.sum(axis=(1, 2))
+    return 40 * (matches & baseline.variable_r3_windows).sum(axis=(1, 2)) + baseline.fixed_penalties[2]
+
+
+def rule_4(candidates: np.ndarray, baseline: PenaltyBaseline | None = None) -> np.ndarray:
+    size: int = candidates.shape[-1]
+    if baseline is None:
+        dark_modules: list[int] = np.count_nonzero(candidates, axis=(1, 2)).tolist()
+    else:
+        dark_modules = (np.count_nonzero(candidates & baseline.variable_modules, axis=(1, 2)) +
+                        baseline.fixed_dark_modules).tolist()
+    return np.array([get_dark_module_penalty(num_dark, size) for num_dark in dark_modules], dtype=np.int64)
+
+
+def score_penalties(candidates: np.ndarray, baseline: PenaltyBaseline | None = None) -> np.ndarray:
+    """
+    returns the penalty of every rule for every candidate, shape (n, 4). a single (size, size) matrix is scored as n = 1.
+    with the baseline of the candidates' version only the mask dependent terms are counted, the rest come from the baseline
+    """
+    if candidates.ndim == 2:
+        candidates = candidates[np.newaxis]
+    candidates = candidates.astype(np.bool_, copy=False)
+    return np.stack((rule_1(candidates, baseline), rule_2(candidates, baseline), rule_3(candidates, baseline),
+                     rule_4(candidates, baseline)), axis=1)
@@ -0,0 +1,56 @@
+from __future__ import annotations
+from array import array
+from itertools import chain, repeat
+from typing import Sequence
+from QR_Code.processing.Sequencing import get_block_info
+from QR_Code.utils.Classes import ECCode
+
+# the 8 bits of every byte value, most significant bit first
+BYTE_TO_BITS: list[tuple[bool, ...]] = [tuple(bool(byte >> (7 - i) & 1) for i in range(8)) for byte in range(256)]
+
+_PLACEMENT_INDEX_CACHE: dict[tuple[int, ECCode], array] = {}
+
+
+def get_interleaved_codeword_order(version: int, ec_code: ECCode) -> list[int]:
+    """
+    returns, for every position of the interleaved codeword stream, the index of the codeword it takes from the block
+    ordered stream i.e. the data codewords of all blocks followed by the EC codewords of all blocks
+    """
+    ec_per_block, block_sizes = get_block_info(version, ec_code)
+    block_starts: list[int] = [sum(block_sizes[:b]) for b in range(len(block_sizes))]
+    order: list[int] = []
+    for i in range(max(block_sizes)):
+        for block_start, block_size in zip(block_starts, block_sizes):
+            if i < block_size:  # group 2 blocks are one codeword longer
+                order.append(block_start + i)
+
+    ec_start: int = sum(block_sizes)
+    for i in range(ec_per_block):
+        for b in range(len(block_sizes)):
+            order.append(ec_start + b * ec_per_block + i)
+    return order
+
+
+def get_placement_index(version: int, ec_code: ECCode, size: int, module_sequence: Sequence[tuple[int, int]]) -> array:
+    """
+    returns the flat matrix offset (x * size + y) of every bit of the block ordered codeword stream, followed by the offsets
+    of the remainder bits. block interleaving is folded into the index so the stream never has to be interleaved itself
+
+    the index is built on the first call for a (version, ec_code) pair and shared afterwards, module_sequence is only read
+    on that first call
+    """
+    index: array | None = _PLACEMENT_INDEX_CACHE.get((version, ec_code))
+    if index is None:
+        offsets: list[int] = [x * size + y for x, y in module_sequence]
+        index = array('H', offsets)
+        for interleaved_pos, codeword in enumerate(get_interleaved_codeword_order(version, ec_code)):
+            index[codeword * 8: codeword * 8 + 8] = array('H', offsets[interleaved_pos * 8: interleaved_pos * 8 + 8])
+        _PLACEMENT_INDEX_CACHE[(version, ec_code)] = index
+    return index
+
+
+def place_codewords(matrix: list[list[bool | tuple | None]], codewords: bytes | bytearray, index: array) -> None:
+    """scatters the bits of the block ordered codewords into the matrix, remainder bits are left white"""
+    size: int = len(matrix)
+    for offset, bit in zip(index, chain(chain.from_iterable(map(BYTE_TO_BITS.__getitem__, codewords)), repeat(False))):
+        matrix[offset // size][offset % size] = bit
@@ -0,0 +1,274 @@
+"""
+Content addressed cache of finished symbols, an in memory LRU bounded by bytes in front of an optional directory on disk
+
+entries are keyed by a hash of the message bytes and the EC level asked for, and hold the masked matrix packed 8 modules to
+a byte rather than a rendered image, so one entry serves every image format and scale
+"""
+from __future__ import annotations
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, NamedTuple
+from QR_Code.builder.QRCodeBuilder import QRCodeBuilder, ENGINE_LIST
+from QR_Code.utils.Classes import ECCode
+
+CACHE_KEY_VERSION = b'1'  # part of every key, changing it invalidates every entry on disk
+ENTRY_OVERHEAD = 200  # bytes an entry costs in memory on top of its packed matrix (objects, key, LRU links)
+DISK_ENTRY_SUFFIX = '.qrs'
+_DISK_HEADER = struct.Struct('>BBH')  # version, EC level, size, followed by the packed matrix
+
+# bytes of 0/1 values <-> the ASCII digits int(..., 2) and format(..., 'b') use
+_TO_DIGITS: bytes = bytes.maketrans(b'\x00\x01', b'01')
+_FROM_DIGITS: bytes = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def get_symbol_key(message: str, ec_level: ECCode | None = None) -> str:
+    """the hex digest that identifies the symbol of message, ec_level None (pick the best level) is a key of its own"""
+    digest = hashlib.blake2b(CACHE_KEY_VERSION, digest_size=20)
+    digest.update(b'auto' if ec_level is None else ec_level.name.encode('ascii'))
+    digest.update(b'\x00')
+    digest.update(message.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+def pack_matrix(matrix: list[list[bool]]) -> bytes:
+    """packs the matrix column after column, 8 modules to a byte"""
+    size: int = len(matrix)
+    flat: bytes = b''.join(bytes(col) for col in matrix)
+    return int(flat.translate(_TO_DIGITS), 2).to_bytes((size * size + 7) // 8, 'big')
+
+
+def unpack_matrix(packed: bytes, size: int) -> list[list[bool]]:
+    modules: int = size * size
+    flat: bytes = format(int.from_bytes(packed, 'big'), f'0{len(packed) * 8}b').encode('ascii').translate(_FROM_DIGITS)
+    flat = flat[len(packed) * 8 - modules:]  # pack_matrix right aligns the modules
+    return [list(map(bool, flat[x * size: (x + 1) * size])) for x in range(size)]
+
+
+class CachedSymbol(NamedTuple):
+    version: int
+    ec_level: ECCode
+    size: int
+    packed: bytes
+
+    @property
+    def matrix(self) -> list[list[bool]]:
+        """a fresh [x][y] matrix, like QRCodeBuilder.matrix"""
+        return unpack_matrix(self.packed, self.size)
+
+    def write(self, stream: BinaryIO, image_format: str = 'png', scale: int = 4, quiet_zone: int = 4) -> None:
+        from QR_Code.display.Writers import get_writer
+        get_writer(image_format)(self.matrix, stream, scale=scale, quiet_zone=quiet_zone)
+
+    def to_bytes(self, image_format: str = 'png', scale: int = 4, quiet_zone: int = 4) -> bytes:
+        from QR_Code.display.Writers import render
+        return render(self.matrix, image_format, scale, quiet_zone)
+
+    @classmethod
+    def from_matrix(cls, version: int, ec_level: ECCode, matrix: list[list[bool]]) -> CachedSymbol:
+        return cls(version, ec_level, len(matrix), pack_matrix(matrix))
+
+    @classmethod
+    def from_builder(cls, qr: QRCodeBuilder) -> CachedSymbol:
+        return cls.from_matrix(qr.version, qr.ec_level, qr.matrix)
+
+    @property
+    def memory_size(self) -> int:
+        return len(self.packed) + ENTRY_OVERHEAD
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _parse_disk_entry(data: bytes) -> CachedSymbol:
+    """the symbol of a disk entry, raises struct.error or ValueError when data is not a whole entry"""
+    version, ec_value, size = _DISK_HEADER.unpack_from(data)
+    packed: bytes = data[_DISK_HEADER.size:]
+    if not 1 <= version <= 40 or size != 4 * version + 17 or len(packed) != (size * size + 7) // 8:
+        raise ValueError(f'bad cache entry: version {version}, size {size}, {len(packed)} bytes of modules')
+    return CachedSymbol(version, ECCode(ec_value), size, packed)
+
+
+class SymbolCache:
+    """
+    LRU cache of CachedSymbol objects keyed by get_symbol_key, holding at most max_bytes in memory. with a directory, entries
+    are also written there and memory misses are looked up on disk, which keeps at most disk_max_bytes (least recently used
+    files are deleted first). safe to share between threads, the files are read and written outside the lock. a failed
+    write (disk full, read only or missing directory) keeps the entry in memory only and is counted in disk_write_errors
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20, directory: str | None = None, disk_max_bytes: int = 1 << 30) -> None:
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.hits: int = 0
+        self.disk_hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.disk_evictions: int = 0
+        self.disk_write_errors: int = 0
+        self._symbols: OrderedDict[str, CachedSymbol] = OrderedDict()
+        self._bytes: int = 0
+        self._disk_files: OrderedDict[str, int] = OrderedDict()  # key -> file size, least recently used first
+        self._disk_bytes: int = 0
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._load_disk_index()
+
+    def get(self, key: str) -> CachedSymbol | None:
+        with self._lock:
+            symbol: CachedSymbol | None = self._symbols.get(key)
+            if symbol is not None:
+                self.hits += 1
+                self._symbols.move_to_end(key)
+                return symbol
+            if self.directory is None or key not in self._disk_files:
+                self.misses += 1
+                return None
+        symbol = self._read_from_disk(key)
+        with self._lock:
+            if symbol is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            if key in self._disk_files:
+                self._disk_files.move_to_end(key)
+            self._store_in_memory(key, symbol)
+            return symbol
+
+    def put(self, key: str, symbol: CachedSymbol) -> None:
+        with self._lock:
+            self._store_in_memory(key, symbol)
+            if self.directory is None or key in self._disk_files:
+                return
+        self._write_to_disk(key, symbol)
+
+    def get_or_build(self, message: str, ec_level: ECCode | None = None, engine: str = ENGINE_LIST) -> CachedSymbol:
+        """the cached symbol of message, built and cached first on a miss"""
+        key: str = get_symbol_key(message, ec_level)
+        symbol: CachedSymbol | None = self.get(key)
+        if symbol is None:
+            symbol = CachedSymbol.from_builder(QRCodeBuilder(message, ec_level, engine))
+            self.put(key, symbol)
+        return symbol
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._symbols or key in self._disk_files
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def clear(self, disk: bool = False) -> None:
+        """empties the memory tier and resets the counters, and deletes the files of the disk tier if disk is True"""
+        with self._lock:
+            self._symbols.clear()
+            self._bytes = 0
+            if disk:
+                while self._disk_files:
+                    self._evict_from_disk()
+            self.hits = self.disk_hits = self.misses = self.evictions = self.disk_evictions = self.disk_write_errors = 0
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses, 'evictions': self.evictions,
+                'disk_evictions': self.disk_evictions, 'disk_write_errors': self.disk_write_errors, 'size': len(self._symbols),
+                'bytes': self._bytes, 'max_bytes': self.max_bytes, 'disk_size': len(self._disk_files),
+                'disk_bytes': self._disk_bytes}
+
+    def _store_in_memory(self, key: str, symbol: CachedSymbol) -> None:
+        previous: CachedSymbol | None = self._symbols.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.memory_size
+        if symbol.memory_size > self.max_bytes:
+            return
+        self._symbols[key] = symbol
+        self._bytes += symbol.memory_size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._symbols.popitem(last=False)
+            self._bytes -= evicted.memory_size
+            self.evictions += 1
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + DISK_ENTRY_SUFFIX)
+
+    def _load_disk_index(self) -> None:
+        """indexes the files left by earlier runs, the least recently modified first"""
+        entries: list[tuple[float, str, int]] = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(DISK_ENTRY_SUFFIX) and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len(DISK_ENTRY_SUFFIX)], stat.st_size))
+        for _, key, file_size in sorted(entries):
+            self._disk_files[key] = file_size
+            self._disk_bytes += file_size
+
+    def _read_from_disk(self, key: str) -> CachedSymbol | None:
+        """called without the lock"""
+        path: str = self._get_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data: bytes = f.read()
+            os.utime(path)  # the modification time orders the files by use when the index is loaded again
+        except OSError:  # evicted meanwhile or unreadable
+            with self._lock:
+                self._forget_disk_file(key)
+            return None
+        try:
+            return _parse_disk_entry(data)
+        except (struct.error, ValueError):  # truncated or corrupt, a miss that is not worth keeping
+            with self._lock:
+                self._forget_disk_file(key)
+            _remove_file(path)
+            return None
+
+    def _write_to_disk(self, key: str, symbol: CachedSymbol) -> None:
+        """called without the lock, the file is indexed once it is complete"""
+        path: str = self._get_path(key)
+        temporary_path: str = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        data: bytes = _DISK_HEADER.pack(symbol.version, symbol.ec_level.value, symbol.size) + symbol.packed
+        try:
+            with open(temporary_path, 'wb') as f:
+                f.write(data)
+            os.replace(temporary_path, path)  # readers never see a partly written file
+        except OSError:
+            _remove_file(temporary_path)
+            with self._lock:
+                self.disk_write_errors += 1
+            return
+        with self._lock:
+            if key in self._disk_files:  # written by another thread meanwhile
+                return
+            self._disk_files[key] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.disk_max_bytes and self._disk_files:
+                self._evict_from_disk()
+
+    def _evict_from_disk(self) -> None:
+        key, _ = next(iter(self._disk_files.items()))
+        self._forget_disk_file(key)
+        _remove_file(self._get_path(key))
+        self.disk_evictions += 1
+
+    def _forget_disk_file(self, key: str) -> None:
+        self._disk_bytes -= self._disk_files.pop(key, 0)
+
+
+SYMBOL_CACHE = SymbolCache()
+
+
+def get_symbol(message: str, ec_level: ECCode | None = None, engine: str = ENGINE_LIST) -> CachedSymbol:
+    return SYMBOL_CACHE.get_or_build(message, ec_level, engine)
+
+
+if __name__ == '__main__':
+    for m in ('https://www.qrcode.com/', 'LOCATION 0042', 'https://www.qrcode.com/'):
+        get_symbol(m, ECCode.M)
+    print(SYMBOL_CACHE.stats())
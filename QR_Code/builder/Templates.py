@@ -0,0 +1,192 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Iterable
+from QR_Code.processing.Sequencing import get_size_info
+from QR_Code.utils.Constants import ALIGNMENT_PATTERN_POSITION_TABLE
+from QR_Code.utils.Exceptions import CannotDrawPatternError
+from QR_Code.builder.Format_Info import write_version_info
+
+BLACK = True
+WHITE = False
+
+
+class PatternDrawer:
+    """draws the function patterns of a version into self.matrix, shared by QRCodeBuilder and SymbolTemplate"""
+    matrix: list[list[bool | tuple | None]]
+    size: int
+    version: int
+
+    def draw_finder_patterns(self) -> None:
+        self._draw_finder_pattern(0, 0)
+        self._draw_finder_pattern(0, self.size - 7)
+        self._draw_finder_pattern(self.size - 7, 0)
+        self._draw_finder_pattern_edges()
+
+    def draw_alignment_patterns(self) -> None:
+        alignment_tracks: list[int] = ALIGNMENT_PATTERN_POSITION_TABLE[self.version - 1]
+        for row in alignment_tracks:
+            for col in alignment_tracks:
+                if ((row - 2 <= 7 and col - 2 <= 7) or (row - 2 <= 7 and col + 2 >= self.size - 7)
+                        or (row + 2 >= self.size - 7 and col - 2 <= 7)):
+                    continue
+                else:
+                    self._draw_alignment_pattern(row, col)
+
+    def draw_dark_module(self) -> None:
+        self.matrix[8][self.size - 8] = BLACK
+
+    def draw_timing_patterns(self) -> None:
+        for i in range(self.size - 14):
+            if i % 2 != 0:
+                self.matrix[6][7 + i] = BLACK
+                self.matrix[7 + i][6] = BLACK
+            else:
+                self.matrix[6][7 + i] = WHITE
+                self.matrix[7 + i][6] = WHITE
+
+    def _draw_finder_pattern(self, x: int, y: int) -> None:
+        if x > self.size - 7 or y > self.size - 7:
+            raise CannotDrawPatternError(f'trying to draw a finder pattern at <{x}, {y}> in a QR Code of size {self.size}')
+        self.matrix[x + 0][y: y + 7] = [BLACK for _ in range(7)]
+        self.matrix[x + 1][y: y + 7] = [BLACK, WHITE, WHITE, WHITE, WHITE, WHITE, BLACK]
+        for i in range(2, 5):
+            self.matrix[x + i][y: y + 7] = [BLACK, WHITE, BLACK, BLACK, BLACK, WHITE, BLACK]
+        self.matrix[x + 5][y: y + 7] = [BLACK, WHITE, WHITE, WHITE, WHITE, WHITE, BLACK]
+        self.matrix[x + 6][y: y + 7] = [BLACK for _ in range(7)]
+
+    def _draw_finder_pattern_edges(self) -> None:
+        self.matrix[7][:8] = [WHITE] * 8
+        self.matrix[7][-8:] = [WHITE] * 8
+        self.matrix[self.size - 8][:8] = [WHITE] * 8
+        for i in range(7):
+            self.matrix[i][7] = WHITE
+            self.matrix[self.size - i - 1][7] = WHITE
+            self.matrix[i][self.size - 8] = WHITE
+
+    def _draw_alignment_pattern(self, x: int, y: int) -> None:
+        self.matrix[x - 2][y - 2: y + 3] = [BLACK, BLACK, BLACK, BLACK, BLACK]
+        self.matrix[x - 1][y - 2: y + 3] = [BLACK, WHITE, WHITE, WHITE, BLACK]
+        self.matrix[x][y - 2: y + 3] = [BLACK, WHITE, BLACK, WHITE, BLACK]
+        self.matrix[x + 1][y - 2: y + 3] = [BLACK, WHITE, WHITE, WHITE, BLACK]
+        self.matrix[x + 2][y - 2: y + 3] = [BLACK, BLACK, BLACK, BLACK, BLACK]
+
+    def _get_module_sequence(self) -> list[tuple[int, int]]:
+        row_step: int = -1
+        row = col = self.size - 1
+        module_sequence: list[tuple[int, int]] = []
+        index: int = 0
+
+        while col >= 0:
+            if self.matrix[col][row] != BLACK and self.matrix[col][row] != WHITE:
+                module_sequence.append((col, row))
+
+            if index & 1:  # checking if index is odd
+                row += row_step
+                if row == -1 or row == self.size:
+                    row_step = - row_step  # flipping direction if we reach the edge
+                    row += row_step
+                    col -= 2 if col == 7 else 1
+                else:
+                    col += 1
+            else:
+                col -= 1
+            index += 1
+        return module_sequence
+
+    def draw_all_format_info(self):
+        # need to change
+        self.matrix[8][:8] = [WHITE] * 6 + [BLACK, WHITE]
+        self.matrix[8][-7:] = [WHITE] * 7
+        for i in range(9):
+            if i != 8:
+                self.matrix[self.size - i - 1][8] = WHITE
+            if i != 6:
+                self.matrix[i][8] = WHITE
+
+    def draw_version_info(self) -> None:
+        write_version_info(self.matrix, self.version)
+
+
+class SymbolTemplate(PatternDrawer):
+    """
+    everything about a symbol that only depends on its version: the matrix with the function patterns drawn and the format
+    areas reserved, the reserved module mask, the data module order and (for the vectorized scorer) the part of the mask
+    penalty that is the same for every mask
+    """
+
+    def __init__(self, version: int) -> None:
+        self.version = version
+        self.size: int = get_size_info(version)
+        self.matrix = [[None for row in range(self.size)] for col in range(self.size)]
+        self.draw_finder_patterns()
+        self.draw_timing_patterns()
+        self.draw_dark_module()
+        self.draw_alignment_patterns()
+        self.draw_all_format_info()
+        self.draw_version_info()
+        self.reserved: list[list[bool]] = [[module is not None for module in col] for col in self.matrix]
+        self.module_sequence: list[tuple[int, int]] = self._get_module_sequence()
+        self._module_array: Any = None
+        self._penalty_baseline: Any = None
+
+    def copy_matrix(self) -> list[list[bool | tuple | None]]:
+        return [col[:] for col in self.matrix]
+
+    def copy_module_array(self) -> Any:
+        """returns a copy of the template as an Array_Engine.ModuleArray, the array form is built on first use"""
+        if self._module_array is None:
+            from QR_Code.builder.Array_Engine import ModuleArray  # numpy is only needed by the array engine
+            self._module_array = ModuleArray(self.version)
+        return self._module_array.copy()
+
+    def get_penalty_baseline(self) -> Any:
+        """returns the Penalty_Scoring.PenaltyBaseline of this version, built on first use"""
+        if self._penalty_baseline is None:
+            from QR_Code.builder.Penalty_Scoring import PenaltyBaseline
+            base = self.copy_module_array()
+            self._penalty_baseline = PenaltyBaseline(base.modules, base.get_fixed_mask())
+        return self._penalty_baseline
+
+
+class TemplateCache:
+    """LRU cache of SymbolTemplate objects keyed by version"""
+
+    def __init__(self, max_size: int = 40) -> None:
+        self.max_size = max_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._templates: OrderedDict[int, SymbolTemplate] = OrderedDict()
+
+    def get(self, version: int) -> SymbolTemplate:
+        template: SymbolTemplate | None = self._templates.get(version)
+        if template is not None:
+            self.hits += 1
+            self._templates.move_to_end(version)
+            return template
+        self.misses += 1
+        template = self._templates[version] = SymbolTemplate(version)
+        if len(self._templates) > self.max_size:
+            self._templates.popitem(last=False)
+        return template
+
+    def warm(self, versions: Iterable[int] = range(1, 41)) -> None:
+        """builds the templates of the given versions ahead of time, without counting hits or misses"""
+        for version in versions:
+            if version not in self._templates:
+                self._templates[version] = SymbolTemplate(version)
+                if len(self._templates) > self.max_size:
+                    self._templates.popitem(last=False)
+
+    def clear(self) -> None:
+        self._templates.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._templates), 'max_size': self.max_size}
+
+
+TEMPLATE_CACHE = TemplateCache()
+
+
+def get_template(version: int) -> SymbolTemplate:
+    return TEMPLATE_CACHE.get(version)
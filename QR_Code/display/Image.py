@@ -1,8 +1,8 @@
 from __future__ import annotations
-from PIL import Image
 
 
 def show(matrix: list[list[bool | tuple | None]]):
+    from PIL import Image  # PIL is only loaded when a symbol is actually shown
     s: int = len(matrix)
     img = Image.new('RGB', (s, s), 'grey')
     pixels = img.load()
@@ -0,0 +1,145 @@
+"""
+PNG, PBM and PGM writers that stream a module matrix straight into a file like object, without PIL
+
+the matrix is indexed [x][y] like QRCodeBuilder.matrix (truthy = dark). every row of modules is turned into one scaled
+scanline which is written `scale` times, so the full bitmap is never held in memory
+"""
+from __future__ import annotations
+import io
+import struct
+import time
+import zlib
+from typing import BinaryIO, Callable, Iterator, Sequence
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+IDAT_CHUNK_SIZE = 1 << 16  # compressed bytes collected before an IDAT chunk is written
+TAR_BLOCK_SIZE = 512
+TAR_END = b'\x00' * (2 * TAR_BLOCK_SIZE)  # closes a tar stream made of tar_member blocks
+
+Matrix = Sequence[Sequence[bool]]
+
+
+def check_image_options(scale: int, quiet_zone: int) -> None:
+    """raises ValueError unless scale is at least 1 and quiet_zone at least 0"""
+    if scale < 1:
+        raise ValueError(f'scale must be at least 1 pixel per module, got {scale}')
+    if quiet_zone < 0:
+        raise ValueError(f'quiet_zone must not be negative, got {quiet_zone}')
+
+
+def _scanline_bits(matrix: Matrix, scale: int, quiet_zone: int, dark: str, light: str) -> Iterator[str]:
+    """yields every row of modules as a '0'/'1' string of scaled pixels, quiet zone included"""
+    size: int = len(matrix)
+    pixels: int = (size + 2 * quiet_zone) * scale
+    dark_pixel: str = dark * scale
+    light_pixel: str = light * scale
+    quiet_row: str = light * pixels
+    quiet_edge: str = light_pixel * quiet_zone
+    for _ in range(quiet_zone):
+        yield quiet_row
+    for row in zip(*matrix):  # the matrix is indexed [x][y], so zipping its columns gives the rows
+        yield quiet_edge + ''.join([dark_pixel if module else light_pixel for module in row]) + quiet_edge
+    for _ in range(quiet_zone):
+        yield quiet_row
+
+
+def _packed_scanlines(matrix: Matrix, scale: int, quiet_zone: int, dark: str, light: str) -> Iterator[bytes]:
+    """yields every scanline packed 8 pixels to a byte, each row of modules `scale` times"""
+    pixels: int = (len(matrix) + 2 * quiet_zone) * scale
+    row_bytes: int = (pixels + 7) // 8
+    padding: str = light * (row_bytes * 8 - pixels)
+    for bits in _scanline_bits(matrix, scale, quiet_zone, dark, light):
+        packed: bytes = int(bits + padding, 2).to_bytes(row_bytes, 'big')
+        for _ in range(scale):
+            yield packed
+
+
+def _write_png_chunk(stream: BinaryIO, chunk_type: bytes, data: bytes) -> None:
+    stream.write(struct.pack('>I', len(data)))
+    stream.write(chunk_type)
+    stream.write(data)
+    stream.write(struct.pack('>I', zlib.crc32(chunk_type + data)))
+
+
+def write_png(matrix: Matrix, stream: BinaryIO, scale: int = 4, quiet_zone: int = 4, compression: int = 6) -> None:
+    """writes a 1 bit grayscale PNG"""
+    check_image_options(scale, quiet_zone)
+    pixels: int = (len(matrix) + 2 * quiet_zone) * scale
+    stream.write(PNG_SIGNATURE)
+    # width, height, bit depth 1, color type 0 (grayscale), compression, filter and interlace methods 0
+    _write_png_chunk(stream, b'IHDR', struct.pack('>IIBBBBB', pixels, pixels, 1, 0, 0, 0, 0))
+    compressor = zlib.compressobj(compression)
+    pending: list[bytes] = []
+    pending_size: int = 0
+    for scanline in _packed_scanlines(matrix, scale, quiet_zone, dark='0', light='1'):
+        compressed: bytes = compressor.compress(b'\x00' + scanline)  # filter type 0 (none) for every scanline
+        if compressed:
+            pending.append(compressed)
+            pending_size += len(compressed)
+            if pending_size >= IDAT_CHUNK_SIZE:
+                _write_png_chunk(stream, b'IDAT', b''.join(pending))
+                pending.clear()
+                pending_size = 0
+    pending.append(compressor.flush())
+    _write_png_chunk(stream, b'IDAT', b''.join(pending))
+    _write_png_chunk(stream, b'IEND', b'')
+
+
+def write_pbm(matrix: Matrix, stream: BinaryIO, scale: int = 4, quiet_zone: int = 4) -> None:
+    """writes a binary (P4) PBM"""
+    check_image_options(scale, quiet_zone)
+    pixels: int = (len(matrix) + 2 * quiet_zone) * scale
+    stream.write(b'P4\n%d %d\n' % (pixels, pixels))
+    for scanline in _packed_scanlines(matrix, scale, quiet_zone, dark='1', light='0'):
+        stream.write(scanline)
+
+
+def write_pgm(matrix: Matrix, stream: BinaryIO, scale: int = 4, quiet_zone: int = 4) -> None:
+    """writes a binary (P5) 8 bit PGM"""
+    check_image_options(scale, quiet_zone)
+    pixels: int = (len(matrix) + 2 * quiet_zone) * scale
+    stream.write(b'P5\n%d %d\n255\n' % (pixels, pixels))
+    translation: bytes = bytes.maketrans(b'01', b'\xff\x00')
+    for bits in _scanline_bits(matrix, scale, quiet_zone, dark='1', light='0'):
+        scanline: bytes = bits.encode('ascii').translate(translation)
+        for _ in range(scale):
+            stream.write(scanline)
+
+
+WRITERS: dict[str, Callable[..., None]] = {
+    'png': write_png,
+    'pbm': write_pbm,
+    'pgm': write_pgm
+}
+
+CONTENT_TYPES: dict[str, str] = {
+    'png': 'image/png',
+    'pbm': 'image/x-portable-bitmap',
+    'pgm': 'image/x-portable-graymap'
+}
+
+
+def get_writer(image_format: str) -> Callable[..., None]:
+    if image_format not in WRITERS:
+        raise ValueError(f'unknown image format {image_format!r}, expected one of {", ".join(WRITERS)}')
+    return WRITERS[image_format]
+
+
+def render(matrix: Matrix, image_format: str = 'png', scale: int = 4, quiet_zone: int = 4) -> bytes:
+    """returns the encoded image as bytes"""
+    stream = io.BytesIO()
+    get_writer(image_format)(matrix, stream, scale=scale, quiet_zone=quiet_zone)
+    return stream.getvalue()
+
+
+def tar_member(name: str, data: bytes, mtime: int | None = None) -> bytes:
+    """
+    the header, data and padding of one file of an uncompressed tar stream, so images can be streamed into a tar. names
+    that don't fit a USTAR header (longer than 100 characters) get a PAX header in front
+    """
+    import tarfile  # only archives need it, and it takes longer to import than the rest of the module
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(time.time()) if mtime is None else mtime
+    info.mode = 0o644
+    return info.tobuf(tarfile.PAX_FORMAT) + data + b'\x00' * (-len(data) % TAR_BLOCK_SIZE)
@@ -0,0 +1,222 @@
+"""
+GF(256) arithmetic kernel (primitive polynomial x^8 + x^4 + x^3 + x^2 + 1, generator 2), every EC computation goes through it
+
+    MUL_TABLE[a << 8 | b]             a * b, one lookup into a 64 KiB table
+    data.translate(get_mul_row(c))    every byte of data multiplied by c, at C speed
+    mul_add(target, source, c)        target += c * source, on bytearrays or numpy arrays
+
+GFPolynomial keeps its coefficients (highest power first) in a bytearray and works in place where it can
+"""
+from __future__ import annotations
+from typing import Any, Iterable
+from QR_Code.utils.Exceptions import OutOfFieldError
+
+PRIMITIVE_POLYNOMIAL = 0x11d  # 285
+
+G256_EXP: list[int] = [1] * 256  # 2^i, i = 255 wraps around to 1
+G256_LOG: list[int] = [0] * 256  # log_2(a), 0 for a = 0 which has no log
+
+_value: int = 1
+for _exponent in range(1, 256):
+    _value = ((_value << 1) ^ PRIMITIVE_POLYNOMIAL) if _value > 127 else _value << 1
+    G256_LOG[_value] = _exponent % 255
+    G256_EXP[_exponent % 255] = _value
+
+
+def _build_mul_table() -> bytes:
+    # row a maps b to 2^(log a + log b): the logs of 1..255 translated through the exp table rotated by log a
+    logs: bytes = bytes(G256_LOG[1:])
+    exps: bytes = bytes(G256_EXP[:255]) * 3
+    return bytes(256) + b''.join(b'\x00' + logs.translate(exps[G256_LOG[a]: G256_LOG[a] + 256]) for a in range(1, 256))
+
+
+MUL_TABLE: bytes = _build_mul_table()
+_MUL_VIEW = memoryview(MUL_TABLE)
+INVERSE: bytes = bytes([0] + [G256_EXP[(255 - G256_LOG[a]) % 255] for a in range(1, 256)])  # 0 has no inverse
+
+_MUL_ARRAY: Any = None  # MUL_TABLE as a (256, 256) numpy array, made on first use
+
+
+def mul(a: int, b: int) -> int:
+    return MUL_TABLE[a << 8 | b]
+
+
+def div(a: int, b: int) -> int:
+    if b == 0:
+        raise ZeroDivisionError('division by 0 in GF(256)')
+    return MUL_TABLE[a << 8 | INVERSE[b]]
+
+
+def power(exponent: int) -> int:
+    """2^exponent"""
+    return G256_EXP[exponent % 255]
+
+
+def get_mul_row(c: int) -> memoryview:
+    """the products of c with 0..255, a 256 byte view usable as a bytes.translate table"""
+    return _MUL_VIEW[c << 8: (c + 1) << 8]
+
+
+def get_mul_array() -> Any:
+    """MUL_TABLE as a read only (256, 256) numpy uint8 array, indexed [a, b]"""
+    global _MUL_ARRAY
+    if _MUL_ARRAY is None:
+        import numpy as np
+        _MUL_ARRAY = np.frombuffer(MUL_TABLE, dtype=np.uint8).reshape(256, 256)
+    return _MUL_ARRAY
+
+
+def scale(data: bytes | bytearray, c: int) -> bytes:
+    """every element of data multiplied by c"""
+    return data.translate(get_mul_row(c))
+
+
+def mul_add(target: Any, source: Any, c: int, offset: int = 0) -> None:
+    """
+    target[offset + i] ^= c * source[i] for every i, in place. target is a bytearray (source then bytes like) or a numpy
+    uint8 array (source an array or bytes like)
+    """
+    if c == 0 or len(source) == 0:
+        return
+    end: int = offset + len(source)
+    if isinstance(target, bytearray):
+        scaled: bytes = source.translate(get_mul_row(c)) if c != 1 else bytes(source)
+        target[offset: end] = (int.from_bytes(target[offset: end], 'big') ^ int.from_bytes(scaled, 'big')).to_bytes(
+            len(source), 'big')
+    else:
+        import numpy as np
+        target[offset: end] ^= get_mul_array()[c][np.frombuffer(source, dtype=np.uint8) if isinstance(source, (bytes, bytearray))
+                                                  else source]
+
+
+def xor_bytes(a: bytes | bytearray, b: bytes | bytearray) -> bytes:
+    """element wise sum of two equally long byte strings"""
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+
+class GFPolynomial:
+    """
+    polynomial over GF(256), coefficients highest power first in a bytearray without leading zeros (the zero polynomial is
+    a single 0). the i* methods change the polynomial and return it, everything else returns a new one
+    """
+    __slots__ = ('coefficients',)
+
+    def __init__(self, coefficients: Iterable[int] | bytes | bytearray = b'\x00') -> None:
+        try:
+            self.coefficients = bytearray(coefficients)
+        except ValueError:
+            raise OutOfFieldError(f'coefficients must be in range(256), got {coefficients}') from None
+        self._strip()
+
+    @classmethod
+    def monomial(cls, coefficient: int, degree: int) -> GFPolynomial:
+        if not 0 <= coefficient < 256 or degree < 0:
+            raise OutOfFieldError(f'at least one of coefficient: {coefficient} or degree: {degree} is invalid')
+        polynomial: GFPolynomial = cls.__new__(cls)
+        polynomial.coefficients = bytearray([coefficient]) + bytearray(degree) if coefficient else bytearray(1)
+        return polynomial
+
+    def _strip(self) -> None:
+        coefficients: bytearray = self.coefficients
+        if not coefficients or coefficients[0] == 0:
+            leading: int = len(coefficients) - len(coefficients.lstrip(b'\x00'))
+            del coefficients[:min(leading, len(coefficients) - 1)]  # deleting from the front only moves the start pointer
+            if not coefficients:
+                coefficients.append(0)
+
+    @property
+    def degree(self) -> int:
+        return len(self.coefficients) - 1
+
+    def is_zero(self) -> bool:
+        return self.coefficients[0] == 0
+
+    def __len__(self) -> int:
+        return len(self.coefficients)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, GFPolynomial) and self.coefficients == other.coefficients
+
+    def __repr__(self) -> str:
+        return f'GFPolynomial({list(self.coefficients)})'
+
+    def copy(self) -> GFPolynomial:
+        polynomial: GFPolynomial = GFPolynomial.__new__(GFPolynomial)
+        polynomial.coefficients = bytearray(self.coefficients)
+        return polynomial
+
+    def iadd(self, other: GFPolynomial) -> GFPolynomial:
+        """adds other in place (subtraction is the same operation)"""
+        shortfall: int = len(other.coefficients) - len(self.coefficients)
+        if shortfall > 0:
+            self.coefficients[:0] = bytes(shortfall)
+        mul_add(self.coefficients, other.coefficients, 1, len(self.coefficients) - len(other.coefficients))
+        self._strip()
+        return self
+
+    def iscale(self, c: int) -> GFPolynomial:
+        if c == 0:
+            self.coefficients = bytearray(1)
+        elif c != 1:
+            self.coefficients = bytearray(self.coefficients.translate(get_mul_row(c)))
+        return self
+
+    def ishift(self, degree: int) -> GFPolynomial:
+        """multiplies by x^degree in place"""
+        if not self.is_zero():
+            self.coefficients += bytes(degree)
+        return self
+
+    def __add__(self, other: GFPolynomial) -> GFPolynomial:
+        return self.copy().iadd(other)
+
+    __sub__ = __add__
+
+    def __mul__(self, other: GFPolynomial) -> GFPolynomial:
+        """one scaled row of other added per coefficient of self"""
+        result = bytearray(len(self.coefficients) + len(other.coefficients) - 1)
+        source: bytearray = other.coefficients
+        for i, coefficient in enumerate(self.coefficients):
+            mul_add(result, source, coefficient, i)
+        polynomial: GFPolynomial = GFPolynomial.__new__(GFPolynomial)
+        polynomial.coefficients = result
+        polynomial._strip()
+        return polynomial
+
+    def divmod(self, divisor: GFPolynomial) -> tuple[GFPolynomial, GFPolynomial]:
+        """synthetic division, returns the quotient and the remainder"""
+        if divisor.is_zero():
+            raise ZeroDivisionError('division by the zero polynomial')
+        divisor_degree: int = divisor.degree
+        if self.degree < divisor_degree:
+            return GFPolynomial(), self.copy()
+        work = bytearray(self.coefficients)
+        lead_inverse: int = INVERSE[divisor.coefficients[0]]
+        tail: bytes = bytes(divisor.coefficients[1:])
+        quotient_length: int = len(work) - divisor_degree
+        for i in range(quotient_length):
+            factor: int = MUL_TABLE[work[i] << 8 | lead_inverse]
+            work[i] = factor
+            if factor and divisor_degree:
+                mul_add(work, tail, factor, i + 1)
+        return GFPolynomial(work[:quotient_length]), GFPolynomial(work[quotient_length:] or b'\x00')
+
+    def __mod__(self, divisor: GFPolynomial) -> GFPolynomial:
+        return self.divmod(divisor)[1]
+
+    def evaluate(self, x: int) -> int:
+        """the value at x, by Horner's rule"""
+        if x == 0:
+            return self.coefficients[-1]
+        row: memoryview = get_mul_row(x)
+        value: int = 0
+        for coefficient in self.coefficients:
+            value = row[value] ^ coefficient
+        return value
+
+
+if __name__ == '__main__':
+    p = GFPolynomial([1, 2, 3])
+    q = GFPolynomial([1, 7])
+    quotient_polynomial, remainder_polynomial = (p * q + GFPolynomial([5])).divmod(q)
+    print(quotient_polynomial == p, remainder_polynomial, p.evaluate(2), mul(div(100, 7), 7))
@@ -1,18 +1,237 @@
-from QR_Code.error_correction.Polynomial import GF256Polynomial, G256_EXP
+from __future__ import annotations
+from functools import reduce
+from operator import xor
+from typing import Iterable, Sequence
+from QR_Code.error_correction.Galois_Field import G256_LOG, GFPolynomial, MUL_TABLE, div, get_mul_row, mul, power, scale
+from QR_Code.error_correction.Polynomial import GF256Polynomial
+from QR_Code.utils.Constants import CODEWORDS_AND_BLOCK_INFO
+from QR_Code.utils.Classes import ECCode
+from QR_Code.utils.Exceptions import CodewordVerificationError, DecodingError
 from QR_Code.processing.Sequencing import (Encoder,
+                                           get_block_info,
                                            get_total_codewords,
                                            get_smallest_version_and_ec,
                                            get_encoding_mode)
 
+# every EC codewords per block count used by the standard (7..30)
+EC_CODEWORDS_PER_BLOCK: tuple[int, ...] = tuple(sorted({info[1] for info in CODEWORDS_AND_BLOCK_INFO.values()}))
 
-def get_generator_polynomial(degree: int) -> GF256Polynomial:
-    poly = GF256Polynomial([1])
+# degree -> coefficients of the generator polynomial (highest power first), built once per degree
+_GENERATOR_REGISTRY: dict[int, bytes] = {}
+# degree -> log of every coefficient of the generator polynomial, derived from _GENERATOR_REGISTRY.
+# the generator is monic and none of its coefficients are 0 for the degrees used by QR codes, so the log domain is lossless
+_GENERATOR_LOG_REGISTRY: dict[int, bytes] = {}
+# degree -> row k holds 2^(j * k) for j = 0..degree-1, see _get_syndrome_powers
+_SYNDROME_POWER_REGISTRY: dict[int, list[bytes]] = {}
+# degree -> the generator without its leading 1 scaled by every feedback term 0..255, each as one big endian int
+_FEEDBACK_TABLE_REGISTRY: dict[int, list[int]] = {}
+# c -> the translate table multiplying by c, copied out as bytes which translate reads faster than a memoryview
+_MUL_ROWS: list[bytes] = [bytes(get_mul_row(c)) for c in range(256)]
+
+
+def _build_generator(degree: int) -> bytes:
+    generator = GFPolynomial(b'\x01')
     for d in range(degree):
-        poly = poly * GF256Polynomial([1, G256_EXP[d % 256]])
-    return poly
+        generator = generator * GFPolynomial((1, power(d)))  # (x + a^d)
+    return bytes(generator.coefficients)
+
+
+def get_generator_coefficients(degree: int) -> bytes:
+    """returns the generator polynomial of the given degree, building and registering it on first use"""
+    coefficients: bytes | None = _GENERATOR_REGISTRY.get(degree)
+    if coefficients is None:
+        coefficients = _GENERATOR_REGISTRY[degree] = _build_generator(degree)
+    return coefficients
+
+
+def get_generator_logs(degree: int) -> bytes:
+    """returns the generator polynomial of the given degree in log form, building and registering it on first use"""
+    logs: bytes | None = _GENERATOR_LOG_REGISTRY.get(degree)
+    if logs is None:
+        logs = _GENERATOR_LOG_REGISTRY[degree] = bytes(G256_LOG[c] for c in get_generator_coefficients(degree))
+    return logs
+
+
+def get_feedback_table(degree: int) -> list[int]:
+    table: list[int] | None = _FEEDBACK_TABLE_REGISTRY.get(degree)
+    if table is None:
+        tail: bytes = get_generator_coefficients(degree)[1:]  # the leading coefficient is always 1
+        table = _FEEDBACK_TABLE_REGISTRY[degree] = [int.from_bytes(scale(tail, f), 'big') for f in range(256)]
+    return table
+
+
+def get_generator_polynomial(degree: int) -> GF256Polynomial:
+    return GF256Polynomial(list(get_generator_coefficients(degree)))
+
+
+def warm_generator_polynomials(degrees: Iterable[int] = EC_CODEWORDS_PER_BLOCK) -> None:
+    for degree in degrees:
+        get_feedback_table(degree)
+
+
+def registered_generator_degrees() -> list[int]:
+    return sorted(_GENERATOR_REGISTRY)
+
+
+def rs_encode(data: bytes | bytearray | Sequence[int], ec_count: int) -> bytearray:
+    """
+    systematic reed-solomon encoding, returns the ec_count error correction codewords for data
+
+    works like the LFSR of a hardware encoder, with the whole remainder register held in one int: per data codeword the
+    register is shifted by a byte and the generator scaled by the feedback term (looked up, see get_feedback_table) is
+    xor-ed in, so the work per codeword does not grow with ec_count in python code
+    """
+    if ec_count <= 0:
+        if ec_count == 0:
+            return bytearray()
+        raise ValueError(f'ec_count must not be negative, got {ec_count}')
+    table: list[int] = get_feedback_table(ec_count)
+    shift: int = 8 * (ec_count - 1)
+    register_mask: int = (1 << 8 * ec_count) - 1
+    remainder: int = 0
+    for codeword in data:
+        remainder = ((remainder << 8) & register_mask) ^ table[codeword ^ (remainder >> shift)]
+    return bytearray(remainder.to_bytes(ec_count, 'big'))
+
+
+def get_error_correction_words(data: bytes | bytearray | Sequence[int] | GF256Polynomial, codewords: int) -> bytearray:
+    if isinstance(data, GF256Polynomial):
+        data = data.coefficients
+    return rs_encode(data, codewords - len(data))
+
+
+def get_block_error_correction_words(data: bytes | bytearray | Sequence[int], version: int, ec_code: ECCode) -> bytearray:
+    """splits data into the blocks of the given version and EC level and returns the EC codewords of every block, in block
+    order (not interleaved)"""
+    ec_per_block, block_sizes = get_block_info(version, ec_code)
+    ec_words = bytearray()
+    start: int = 0
+    for block_size in block_sizes:
+        ec_words += rs_encode(data[start: start + block_size], ec_per_block)
+        start += block_size
+    return ec_words
+
+
+def _get_syndrome_powers(ec_count: int, block_length: int) -> list[bytes]:
+    """
+    for every distance k of a codeword from the end of a block, the bytes 2^(j * k) for j = 0..ec_count-1, i.e. what the
+    codeword is multiplied by in each syndrome. extended as longer blocks come along
+    """
+    powers: list[bytes] | None = _SYNDROME_POWER_REGISTRY.get(ec_count)
+    if powers is None:
+        powers = _SYNDROME_POWER_REGISTRY[ec_count] = []
+    for k in range(len(powers), block_length):
+        powers.append(bytes(power(j * k) for j in range(ec_count)))
+    return powers
+
+
+def get_syndromes(block: bytes | bytearray, ec_count: int) -> bytes:
+    """
+    the ec_count syndromes of a block (its data codewords followed by its EC codewords), the values of the block polynomial
+    at the generator's roots 2^0..2^(ec_count-1). all of them are 0 for a correctly encoded block
+
+    evaluated independently of the generator and the encoder: each codeword scales its row of powers with one translate
+    and the rows are xor-ed together as ints, so every syndrome is computed at once and the loop never leaves C
+    """
+    powers: list[bytes] = _get_syndrome_powers(ec_count, len(block))
+    syndromes: int = reduce(xor, map(int.from_bytes, map(bytes.translate, powers[len(block) - 1::-1],
+                                                         map(_MUL_ROWS.__getitem__, block))), 0)
+    return syndromes.to_bytes(ec_count, 'big')
+
+
+def find_corrupt_blocks(codewords: bytes | bytearray, version: int, ec_code: ECCode) -> list[int]:
+    """
+    the indices of the blocks with a non-zero syndrome, codewords laid out like the builder makes them (the data codewords
+    of every block followed by the EC codewords of every block, not interleaved)
+    """
+    ec_per_block, block_sizes = get_block_info(version, ec_code)
+    corrupt: list[int] = []
+    data_start: int = 0
+    ec_start: int = sum(block_sizes)
+    for block_index, block_size in enumerate(block_sizes):
+        block: bytes = (codewords[data_start: data_start + block_size] +
+                        codewords[ec_start + block_index * ec_per_block: ec_start + (block_index + 1) * ec_per_block])
+        if len(block) != block_size + ec_per_block or any(get_syndromes(block, ec_per_block)):
+            corrupt.append(block_index)
+        data_start += block_size
+    return corrupt
+
+
+def verify_codewords(codewords: bytes | bytearray, version: int, ec_code: ECCode) -> None:
+    """raises CodewordVerificationError unless every block of codewords has all syndromes 0"""
+    corrupt: list[int] = find_corrupt_blocks(codewords, version, ec_code)
+    if corrupt:
+        raise CodewordVerificationError(f'non-zero syndromes in block(s) {", ".join(map(str, corrupt))} of version {version} '
+                                        f'{ec_code.name}')
+
+
+def _find_error_locator(syndromes: bytes) -> list[int]:
+    """
+    Berlekamp-Massey: the shortest LFSR generating the syndromes, i.e. the error locator polynomial (lowest power first)
+    whose roots are the inverses of the error positions 2^k
+    """
+    length: int = len(syndromes) + 1
+    locator: list[int] = [1] + [0] * (length - 1)
+    previous: list[int] = locator[:]
+    errors: int = 0
+    shift: int = 1
+    previous_discrepancy: int = 1
+    for n, syndrome in enumerate(syndromes):
+        discrepancy: int = syndrome
+        for i in range(1, errors + 1):
+            discrepancy ^= MUL_TABLE[locator[i] << 8 | syndromes[n - i]]
+        if discrepancy == 0:
+            shift += 1
+            continue
+        row: memoryview = get_mul_row(div(discrepancy, previous_discrepancy))
+        updated: list[int] = locator[:]
+        for i in range(length - shift):
+            updated[i + shift] ^= row[previous[i]]
+        if 2 * errors <= n:
+            previous, previous_discrepancy, errors, shift = locator, discrepancy, n + 1 - errors, 1
+        else:
+            shift += 1
+        locator = updated
+    return locator[:errors + 1]
+
+
+def correct_block(block: bytearray, ec_count: int) -> int:
+    """
+    corrects a block (its data codewords followed by its ec_count EC codewords) in place and returns the number of
+    codewords that were wrong. up to ec_count // 2 wrong codewords are corrected, DecodingError is raised for more
+    """
+    syndromes: bytes = get_syndromes(block, ec_count)
+    if not any(syndromes):
+        return 0
+    locator: list[int] = _find_error_locator(syndromes)
+    errors: int = len(locator) - 1
+    if 2 * errors > ec_count:
+        raise DecodingError(f'more than {ec_count // 2} of the {len(block)} codewords of a block are wrong')
+    # Chien search, codeword i of the block is the coefficient of x^k with k = len(block) - 1 - i
+    locator_polynomial = GFPolynomial(locator[::-1])
+    positions: list[int] = [k for k in range(len(block)) if locator_polynomial.evaluate(power(-k)) == 0]
+    if len(positions) != errors:
+        raise DecodingError(f'the errors of a block of {len(block)} codewords could not be located')
+    # Forney, for a generator whose first root is 2^0: e_k = X_k * omega(1 / X_k) / locator'(1 / X_k)
+    evaluator: list[int] = [0] * errors  # syndromes * locator mod x^errors, lowest power first
+    for i in range(errors):
+        for j in range(i + 1):
+            evaluator[i] ^= mul(syndromes[i - j], locator[j])
+    evaluator_polynomial = GFPolynomial(evaluator[::-1])
+    derivative_polynomial = GFPolynomial([locator[i + 1] if i % 2 == 0 else 0 for i in range(errors)][::-1])
+    for k in positions:
+        x_inverse: int = power(-k)
+        denominator: int = derivative_polynomial.evaluate(x_inverse)
+        if denominator == 0:
+            raise DecodingError(f'the errors of a block of {len(block)} codewords could not be corrected')
+        block[len(block) - 1 - k] ^= mul(power(k), div(evaluator_polynomial.evaluate(x_inverse), denominator))
+    if any(get_syndromes(block, ec_count)):
+        raise DecodingError(f'more than {ec_count // 2} of the {len(block)} codewords of a block are wrong')
+    return errors
 
 
-def get_error_correction_words(data: GF256Polynomial, codewords: int):
+def get_error_correction_words_reference(data: GF256Polynomial, codewords: int) -> list[int]:
+    """the original polynomial long division, kept as a reference for differential testing of rs_encode"""
     deg: int = codewords - len(data)
     return (GF256Polynomial(data.coefficients, deg) % get_generator_polynomial(deg)).coefficients
 
@@ -23,4 +242,4 @@ if __name__ == '__main__':
     version, ec_code = get_smallest_version_and_ec(len(msg), enc_mode)
     e = Encoder(version, ec_code)
     byte_data = e.encode(msg)
-    print(get_error_correction_words(GF256Polynomial(byte_data), get_total_codewords(version, ec_code)))
+    print(get_error_correction_words(byte_data, get_total_codewords(version, ec_code)))
@@ -0,0 +1,129 @@
+from __future__ import annotations
+from typing import Sequence
+from QR_Code.utils.Exceptions import DataLimitExceededError, DecodingError
+
+FLUSH_FIELDS = 64  # fields joined before their bytes are copied, so shifting the int never becomes the bottleneck
+
+
+class BitWriter:
+    """
+    packs fields most significant bit first into a bytearray preallocated to the data capacity of the symbol. bits are
+    collected in an int until a whole byte is available, so no bit strings are ever built
+    """
+    __slots__ = ('buffer', '_position', '_accumulator', '_pending')
+
+    def __init__(self, capacity: int) -> None:
+        self.buffer = bytearray(capacity)
+        self._position: int = 0  # bytes written to buffer
+        self._accumulator: int = 0  # the last _pending bits, not yet a whole byte
+        self._pending: int = 0
+
+    @property
+    def bit_length(self) -> int:
+        return self._position * 8 + self._pending
+
+    @property
+    def capacity_bits(self) -> int:
+        return len(self.buffer) * 8
+
+    def _overflow(self, bits: int) -> DataLimitExceededError:
+        return DataLimitExceededError(f"{self.bit_length + bits} bits don't fit in {self.capacity_bits} data bits")
+
+    def write(self, value: int, length: int) -> None:
+        """writes the lowest length bits of value"""
+        self.write_fields((value,), length)
+
+    def write_fields(self, values: Sequence[int], length: int) -> None:
+        """
+        writes the lowest length bits of every value, the fields are joined into one int and its whole bytes copied at
+        once. higher bits are dropped, they would otherwise run into the fields written before
+        """
+        bits: int = len(values) * length
+        mask: int = (1 << length) - 1
+        if self.bit_length + bits > self.capacity_bits:
+            raise self._overflow(bits)
+        for start in range(0, len(values), FLUSH_FIELDS):
+            run: int = self._accumulator
+            chunk: Sequence[int] = values[start: start + FLUSH_FIELDS]
+            for value in chunk:
+                run = run << length | value & mask
+            self._flush(run, self._pending + len(chunk) * length)
+
+    def _flush(self, run: int, bits: int) -> None:
+        """copies the whole bytes of the bits lowest bits of run to the buffer and keeps the rest pending"""
+        count, pending = divmod(bits, 8)
+        self.buffer[self._position: self._position + count] = (run >> pending).to_bytes(count, 'big')
+        self._position += count
+        self._accumulator = run & ((1 << pending) - 1)
+        self._pending = pending
+
+    def write_bytes(self, data: bytes) -> None:
+        count: int = len(data)
+        if self.bit_length + count * 8 > self.capacity_bits:
+            raise self._overflow(count * 8)
+        if self._pending:  # shift the whole run through the pending bits at once
+            run: int = self._accumulator << count * 8 | int.from_bytes(data, 'big')
+            data = (run >> self._pending).to_bytes(count, 'big')
+            self._accumulator = run & ((1 << self._pending) - 1)
+        self.buffer[self._position: self._position + count] = data
+        self._position += count
+
+    def align(self) -> None:
+        """pads with zeros to a whole byte"""
+        if self._pending:
+            self.write(0, 8 - self._pending)
+
+    def fill(self, pattern: bytes) -> None:
+        """aligns and repeats pattern until the buffer is full"""
+        self.align()
+        remaining: int = len(self.buffer) - self._position
+        self.buffer[self._position:] = (pattern * (remaining // len(pattern) + 1))[:remaining]
+        self._position = len(self.buffer)
+
+    def getvalue(self) -> bytes:
+        return bytes(self.buffer[:self._position])
+
+
+class BitReader:
+    """
+    reads fields most significant bit first, the inverse of BitWriter. runs of fields are cut out of the data as one int
+    before they are split, so the whole data is never shifted once per field
+    """
+    __slots__ = ('data', '_position')
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self._position: int = 0  # bits read
+
+    @property
+    def remaining_bits(self) -> int:
+        return len(self.data) * 8 - self._position
+
+    def _take(self, bits: int) -> int:
+        """the next bits bits as an int"""
+        if bits > self.remaining_bits:
+            raise DecodingError(f'{bits} bits asked for with {self.remaining_bits} left')
+        start, skip = divmod(self._position, 8)
+        end: int = (self._position + bits + 7) // 8
+        self._position += bits
+        return int.from_bytes(self.data[start: end], 'big') >> ((end - start) * 8 - skip - bits) & ((1 << bits) - 1)
+
+    def read(self, length: int) -> int:
+        return self._take(length)
+
+    def read_fields(self, count: int, length: int) -> list[int]:
+        """count fields of length bits each"""
+        fields: list[int] = []
+        mask: int = (1 << length) - 1
+        for start in range(0, count, FLUSH_FIELDS):
+            chunk: int = min(FLUSH_FIELDS, count - start)
+            run: int = self._take(chunk * length)
+            fields.extend(run >> shift & mask for shift in range((chunk - 1) * length, -1, -length))
+        return fields
+
+    def read_bytes(self, count: int) -> bytes:
+        if self._position % 8 == 0 and count * 8 <= self.remaining_bits:
+            start: int = self._position // 8
+            self._position += count * 8
+            return self.data[start: start + count]
+        return self._take(count * 8).to_bytes(count, 'big')
@@ -0,0 +1,60 @@
+"""
+Exact data bit capacities of every version and EC level, derived from CODEWORDS_AND_BLOCK_INFO
+
+the capacities of one EC level grow with the version, so the smallest version that holds an encoded bit length is found
+with a bisect. the bit length of a message depends on the width of its character count fields, which is fixed within each
+of VERSION_RANGES, so a lookup is always restricted to one range
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from QR_Code.utils.Classes import EncodingMode, ECCode
+from QR_Code.utils.Constants import CODEWORDS_AND_BLOCK_INFO
+
+# the versions that share the width of the character count fields
+VERSION_RANGES: tuple[tuple[int, int], ...] = ((1, 9), (10, 26), (27, 40))
+
+# the order EC levels are preferred in when none is asked for, most redundancy first
+EC_LEVELS_BY_REDUNDANCY: tuple[ECCode, ...] = (ECCode.H, ECCode.Q, ECCode.M, ECCode.L)
+
+# EC level -> data bits of versions 1 to 40, at index version - 1
+DATA_BITS: dict[ECCode, list[int]] = {
+    ec_level: [CODEWORDS_AND_BLOCK_INFO[f'{version}{ec_level.name}'][0] * 8 for version in range(1, 41)]
+    for ec_level in ECCode
+}
+
+
+def get_data_bits(version: int, ec_level: ECCode) -> int:
+    return DATA_BITS[ec_level][version - 1]
+
+
+def get_character_bits(enc_mode: EncodingMode, count: int) -> int:
+    """bits taken by count characters of a segment, without the mode indicator and the character count"""
+    match enc_mode:
+        case EncodingMode.NUMERIC:
+            return count // 3 * 10 + (0, 4, 7)[count % 3]
+        case EncodingMode.ALPHA_NUMERIC:
+            return count // 2 * 11 + (0, 6)[count % 2]
+        case EncodingMode.BYTE:
+            return count * 8
+        case EncodingMode.KANJI:
+            return count * 13
+    raise ValueError(f'{enc_mode} has no fixed number of bits per character')
+
+
+def find_version(bit_length: int, ec_level: ECCode | None = None, first_version: int = 1,
+                 last_version: int = 40) -> tuple[int, ECCode] | None:
+    """
+    returns the smallest version between first_version and last_version that holds bit_length data bits at ec_level, or
+    with the most redundant EC level that fits at that version when ec_level is None. None when no version does
+    """
+    capacities: list[int] = DATA_BITS[ECCode.L if ec_level is None else ec_level]
+    index: int = bisect_left(capacities, bit_length, first_version - 1, last_version)
+    if index == last_version:
+        return None
+    version: int = index + 1
+    if ec_level is not None:
+        return version, ec_level
+    for ec in EC_LEVELS_BY_REDUNDANCY:  # L always fits, it holds the most data at every version
+        if DATA_BITS[ec][index] >= bit_length:
+            return version, ec
+    return None
@@ -0,0 +1,72 @@
+"""
+Microbenchmark of Encoder per mode, against the previous encoder that built '0'/'1' strings into a bitarray
+
+run with python -m QR_Code.processing.Encoding_Benchmark (the reference encoder needs bitarray). both encoders get the same
+single segment per mode and their codewords are compared before timing
+"""
+from __future__ import annotations
+import timeit
+from QR_Code.processing.Segmentation import Segment
+from QR_Code.processing.Sequencing import (Encoder, ALPHANUMERIC_CHARS, get_data_codewords, get_length_bits, int_to_bit,
+                                           split_into_chunks)
+from QR_Code.utils.Classes import EncodingMode, ECCode
+
+# mode -> (message, version, EC level) that fills most of the symbol
+BENCHMARK_MESSAGES: dict[EncodingMode, tuple[str, int, ECCode]] = {
+    EncodingMode.NUMERIC: ('3141592653' * 50, 10, ECCode.M),
+    EncodingMode.ALPHA_NUMERIC: ('HTTPS://WWW.QRCODE.COM/ ' * 12, 10, ECCode.M),
+    EncodingMode.BYTE: ('https://www.qrcode.com/?id=' * 7, 10, ECCode.M),
+}
+BENCHMARK_RUNS = 5
+BENCHMARK_NUMBER = 200
+
+
+def encode_with_strings(segment: Segment, version: int, ec_code: ECCode) -> bytes:
+    """the encoding as it was done before BitWriter, with the terminator and padding done once at the end"""
+    from bitarray import bitarray
+    bits = bitarray(int_to_bit(segment.mode.value, 4))
+    bits.extend(int_to_bit(len(segment.text), get_length_bits(segment.mode, version)))
+    match segment.mode:
+        case EncodingMode.NUMERIC:
+            for chunk in split_into_chunks(segment.text, 3):
+                bits.extend(int_to_bit(int(chunk), (0, 4, 7, 10)[len(chunk)]))
+        case EncodingMode.ALPHA_NUMERIC:
+            for chunk in split_into_chunks(segment.text, 2):
+                if len(chunk) == 2:
+                    bits.extend(int_to_bit(45 * ALPHANUMERIC_CHARS.index(chunk[0]) + ALPHANUMERIC_CHARS.index(chunk[1]), 11))
+                else:
+                    bits.extend(int_to_bit(ALPHANUMERIC_CHARS.index(chunk), 6))
+        case EncodingMode.BYTE:
+            for char in segment.text:
+                bits.extend(int_to_bit(ord(char), 8))
+    capacity: int = get_data_codewords(version, ec_code) * 8
+    bits.extend('0' * min(4, capacity - len(bits)))
+    bits.extend('0' * (-len(bits) % 8))
+    for i in range((capacity - len(bits)) // 8):
+        bits.extend('11101100') if i % 2 == 0 else bits.extend('00010001')
+    return bytes(map(int, bits.tobytes()))
+
+
+def run_benchmark(runs: int = BENCHMARK_RUNS, number: int = BENCHMARK_NUMBER) -> dict[EncodingMode, tuple[float, float]]:
+    """returns the best time per encode in microseconds of the reference and the current encoder for every mode"""
+    results: dict[EncodingMode, tuple[float, float]] = {}
+    for mode, (message, version, ec_code) in BENCHMARK_MESSAGES.items():
+        segments: list[Segment] = [Segment(mode, message)]
+        encoder = Encoder(version, ec_code)
+        if encode_with_strings(segments[0], version, ec_code) != encoder.encode_segments(segments):
+            raise AssertionError(f'the encoders disagree in {mode.name} mode')
+
+        def current() -> bytes:
+            return encoder.encode_segments(segments)
+
+        reference: float = min(timeit.repeat(lambda: encode_with_strings(segments[0], version, ec_code), repeat=runs,
+                                             number=number))
+        optimized: float = min(timeit.repeat(current, repeat=runs, number=number))
+        results[mode] = (reference / number * 1e6, optimized / number * 1e6)
+    return results
+
+
+if __name__ == '__main__':
+    for enc_mode, (reference_us, optimized_us) in run_benchmark().items():
+        print(f'{enc_mode.name:<14} strings {reference_us:8.1f}us  BitWriter {optimized_us:8.1f}us  '
+              f'{reference_us / optimized_us:5.1f}x')
@@ -0,0 +1,215 @@
+"""
+Splits a message into NUMERIC, ALPHA_NUMERIC, BYTE and KANJI segments with the smallest total bit length
+
+the bit length of a segment depends on the version through the width of its character count fields, so the split is
+computed for each of the three version ranges (1-9, 10-26, 27-40) and the smallest version it fits in is picked
+
+byte segments hold ISO 8859-1. a message with characters outside of it (and outside kanji mode) is split with byte
+segments in UTF-8 behind an ECI segment, which is also done when that comes out shorter than using kanji mode. kanji
+segments are only used without an ECI and next to byte segments of plain ASCII: readers guess the character set of byte
+segments and decode kanji segments in the character set of the ECI, so anything else is not read back reliably
+"""
+from __future__ import annotations
+from typing import NamedTuple
+from QR_Code.processing.Capacity import VERSION_RANGES, EC_LEVELS_BY_REDUNDANCY, DATA_BITS, find_version, get_character_bits
+from QR_Code.processing.Sequencing import ALPHANUMERIC_CHARS, ECI_HEADER_BITS, KANJI_BITS, get_kanji_values, get_length_bits
+from QR_Code.utils.Classes import EncodingMode, ECCode
+from QR_Code.utils.Exceptions import DataLimitExceededError, ModeNotImplementedError
+
+MODE_INDICATOR_BITS = 4
+
+# DP states, in the order of the tuples the DP keeps per character: (mode, number of characters of the current segment
+# modulo the size of the mode's character groups). numeric packs 3 digits into 10 bits (4, 7 and 10 bits for 1, 2 and 3
+# digits) and alphanumeric 2 characters into 11 bits (6 and 11 bits for 1 and 2), so a state fixes the next character's cost
+_STATE_MODES: tuple[EncodingMode, ...] = ((EncodingMode.NUMERIC,) * 3 + (EncodingMode.ALPHA_NUMERIC,) * 2 + (EncodingMode.BYTE,) +
+                                          (EncodingMode.KANJI,))
+_START = 7  # the state before the first character
+_UNREACHABLE = 1 << 30
+
+# character class: 0 digit (any mode), 1 other alphanumeric character (alphanumeric or byte), 2 byte or kanji mode only
+_CHAR_CLASSES: dict[str, int] = {char: 0 if char.isdigit() else 1 for char in ALPHANUMERIC_CHARS}
+
+# character -> (class, bits in a byte segment or 0 if it can't be in one, fits in kanji mode), one table for ISO 8859-1 byte
+# segments and one for UTF-8 byte segments (next to which kanji segments are not used). filled in as characters come along
+_LATIN1_CHAR_COSTS: dict[str, tuple[int, int, bool]] = {chr(code): (_CHAR_CLASSES.get(chr(code), 2), 8, False)
+                                                        for code in range(128)}
+_UTF8_CHAR_COSTS: dict[str, tuple[int, int, bool]] = dict(_LATIN1_CHAR_COSTS)
+
+
+class Segment(NamedTuple):
+    mode: EncodingMode
+    text: str  # empty for an ECI segment, which switches the byte segments after it to UTF-8
+
+
+def _add_char_costs(char: str) -> None:
+    try:
+        utf8_bits: int = len(char.encode('utf-8')) * 8
+    except UnicodeEncodeError:  # a lone surrogate
+        raise ModeNotImplementedError(f"{char!r} can't be encoded in any mode") from None
+    _LATIN1_CHAR_COSTS[char] = (2, 8 if ord(char) <= 0xff else 0, get_kanji_values(char) is not None)
+    _UTF8_CHAR_COSTS[char] = (2, utf8_bits, False)
+
+
+def _fits_kanji_mode(char: str) -> bool:
+    if char not in _LATIN1_CHAR_COSTS:
+        _add_char_costs(char)
+    return _LATIN1_CHAR_COSTS[char][2]
+
+
+def get_segment_bit_length(segment: Segment, version: int, utf8: bool = False) -> int:
+    """utf8 tells whether an ECI segment came before, it changes the bytes of a byte segment"""
+    if segment.mode is EncodingMode.ECI:
+        return ECI_HEADER_BITS
+    if segment.mode not in (EncodingMode.NUMERIC, EncodingMode.ALPHA_NUMERIC, EncodingMode.BYTE, EncodingMode.KANJI):
+        raise ModeNotImplementedError(f"Unrecognized Encoding Mode: {segment.mode}")
+    count: int = len(segment.text.encode('utf-8')) if utf8 and segment.mode is EncodingMode.BYTE else len(segment.text)
+    return MODE_INDICATOR_BITS + get_length_bits(segment.mode, version) + get_character_bits(segment.mode, count)
+
+
+def get_segments_bit_length(segments: list[Segment], version: int) -> int:
+    total: int = 0
+    utf8: bool = False
+    for segment in segments:
+        total += get_segment_bit_length(segment, version, utf8)
+        utf8 = utf8 or segment.mode is EncodingMode.ECI
+    return total
+
+
+def _split_message(message: str, version: int, utf8: bool) -> tuple[list[Segment], int]:
+    """
+    the cheapest segments of message and their bit length, byte segments in UTF-8 (and no kanji segments) if utf8 else in
+    ISO 8859-1. every character is put in every state it can be in, either by continuing the segment of the previous
+    character or by starting a new segment after the cheapest state of the previous character (paying for the segment
+    header), and only the cheapest way to reach each state is kept
+    """
+    numeric_header: int = MODE_INDICATOR_BITS + get_length_bits(EncodingMode.NUMERIC, version)
+    alphanumeric_header: int = MODE_INDICATOR_BITS + get_length_bits(EncodingMode.ALPHA_NUMERIC, version)
+    byte_header: int = MODE_INDICATOR_BITS + get_length_bits(EncodingMode.BYTE, version)
+    kanji_header: int = MODE_INDICATOR_BITS + get_length_bits(EncodingMode.KANJI, version)
+    unreachable: int = _UNREACHABLE
+    n0 = n1 = n2 = a0 = a1 = b = k = unreachable  # cheapest bit length of the message so far ending in each state
+    cheapest, cheapest_state = 0, _START
+    # per character the way every state was reached, 2 * previous state + 1 if the character starts a new segment
+    came_from: list[tuple[int, int, int, int, int, int, int]] = []
+
+    char_costs: dict[str, tuple[int, int, bool]] = _UTF8_CHAR_COSTS if utf8 else _LATIN1_CHAR_COSTS
+
+    for char in message:
+        costs: tuple[int, int, bool] | None = char_costs.get(char)
+        if costs is None:
+            _add_char_costs(char)
+            costs = char_costs[char]
+        char_class, byte_bits, kanji = costs
+        if not byte_bits and not kanji:
+            raise ModeNotImplementedError(f"{char!r} can't be encoded without UTF-8 byte segments")
+        new_segment: int = 2 * cheapest_state + 1
+
+        if byte_bits:
+            start: int = cheapest + byte_header + byte_bits
+            nb, pb = (b + byte_bits, 10) if b + byte_bits <= start else (start, new_segment)
+        else:
+            nb, pb = unreachable, -1
+        if kanji:
+            start = cheapest + kanji_header + KANJI_BITS
+            nk, pk = (k + KANJI_BITS, 12) if k + KANJI_BITS <= start else (start, new_segment)
+        else:
+            nk, pk = unreachable, -1
+        if char_class < 2:
+            start = cheapest + alphanumeric_header + 6
+            na0, pa0 = (a1 + 6, 8) if a1 + 6 <= start else (start, new_segment)
+            na1, pa1 = a0 + 5, 6
+        else:
+            na0 = na1 = unreachable
+            pa0 = pa1 = -1
+        if char_class == 0:
+            start = cheapest + numeric_header + 4
+            nn0, pn0 = (n2 + 4, 4) if n2 + 4 <= start else (start, new_segment)
+            nn1, pn1, nn2, pn2 = n0 + 3, 0, n1 + 3, 2
+        else:
+            nn0 = nn1 = nn2 = unreachable
+            pn0 = pn1 = pn2 = -1
+
+        came_from.append((pn0, pn1, pn2, pa0, pa1, pb, pk))
+        n0, n1, n2, a0, a1, b, k = state_costs = (nn0, nn1, nn2, na0, na1, nb, nk)
+        cheapest = min(state_costs)
+        cheapest_state = state_costs.index(cheapest)
+
+    segments: list[Segment] = []
+    end: int = len(message)
+    state: int = cheapest_state
+    for i in range(len(message) - 1, -1, -1):
+        previous: int = came_from[i][state]
+        if previous & 1:
+            segments.append(Segment(_STATE_MODES[state], message[i: end]))
+            end = i
+        state = previous >> 1
+    segments.reverse()
+    return segments, cheapest
+
+
+def segment_message(message: str, version: int) -> list[Segment]:
+    """
+    returns the segments that encode message in the fewest bits for version. messages with characters outside ISO 8859-1
+    are split both with ISO 8859-1 byte segments (if kanji mode holds the rest) and with UTF-8 ones behind an ECI segment,
+    the first only counts when its byte segments are plain ASCII
+    """
+    if not message:
+        return [Segment(EncodingMode.NUMERIC, '')]
+    if message.isascii() and message.isdigit():  # digits are cheapest in numeric mode, so one segment is optimal
+        return [Segment(EncodingMode.NUMERIC, message)]
+    if message.isascii():
+        return _split_message(message, version, False)[0]
+    other_chars: set[str] = {char for char in message if ord(char) > 0xff}
+    if not other_chars:  # UTF-8 byte segments are never shorter than ISO 8859-1 ones
+        return _split_message(message, version, False)[0]
+    candidates: list[tuple[int, list[Segment]]] = []
+    if all(map(_fits_kanji_mode, other_chars)):
+        segments, bit_length = _split_message(message, version, False)
+        if all(segment.mode is not EncodingMode.BYTE or segment.text.isascii() for segment in segments):
+            candidates.append((bit_length, segments))
+    segments, bit_length = _split_message(message, version, True)
+    candidates.append((ECI_HEADER_BITS + bit_length, [Segment(EncodingMode.ECI, '')] + segments))
+    return min(candidates, key=lambda candidate: candidate[0])[1]
+
+
+class SymbolPlan(NamedTuple):
+    """what a message would be built as, worked out without building it"""
+    version: int
+    ec_level: ECCode
+    segments: list[Segment]
+    bit_length: int
+    capacity_bits: int
+
+    @property
+    def headroom_bits(self) -> int:
+        """data bits still free, terminator and padding included"""
+        return self.capacity_bits - self.bit_length
+
+
+def plan_symbol(message: str, ec_level: ECCode | None = None) -> SymbolPlan:
+    """
+    splits message optimally and picks the smallest version it fits in, with the most redundant EC level that still fits
+    at that version when ec_level is not given. raises DataLimitExceededError when it fits in no version
+    """
+    ec_levels: tuple[ECCode, ...] = EC_LEVELS_BY_REDUNDANCY if ec_level is None else (ec_level,)
+    for first_version, last_version in VERSION_RANGES:
+        if len(message) * 10 > max(DATA_BITS[ec][last_version - 1] for ec in ec_levels) * 3:
+            continue  # even all digits (10 bits per 3 characters) wouldn't fit in the largest version of the range
+        segments: list[Segment] = segment_message(message, first_version)
+        bit_length: int = get_segments_bit_length(segments, first_version)
+        found: tuple[int, ECCode] | None = find_version(bit_length, ec_level, first_version, last_version)
+        if found is not None:
+            version, ec = found
+            return SymbolPlan(version, ec, segments, bit_length, DATA_BITS[ec][version - 1])
+    raise DataLimitExceededError(f"the length of your message is {len(message)}, which is too long for any version")
+
+
+def get_smallest_version_and_segments(message: str, ec_level: ECCode | None = None) -> tuple[int, ECCode, list[Segment]]:
+    plan: SymbolPlan = plan_symbol(message, ec_level)
+    return plan.version, plan.ec_level, plan.segments
+
+
+if __name__ == '__main__':
+    for m in ('0123456789012345678901234567890a', 'HELLO WORLD 0123456789012345', 'https://www.qrcode.com/'):
+        p = plan_symbol(m)
+        print(p.version, p.ec_level.name, p.segments, p.bit_length, p.headroom_bits)
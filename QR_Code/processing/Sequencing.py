@@ -1,32 +1,39 @@
 from __future__ import annotations
-from typing import Sized
+from typing import Iterable, Sized, TYPE_CHECKING
 from QR_Code.utils.Classes import Regex, EncodingMode, ECCode
-from QR_Code.utils.Constants import CHARACTER_CAPACITIES_BY_VERSION, EC_CODE_IDX, CODEWORDS_AND_BLOCK_INFO, CHARACTER_CAPACITIES_BY_EC
+from QR_Code.utils.Constants import CODEWORDS_AND_BLOCK_INFO
+from QR_Code.processing.Capacity import VERSION_RANGES, find_version, get_character_bits
 from QR_Code.utils.Exceptions import DataLimitExceededError, ModeNotImplementedError
+from QR_Code.processing.Bit_Writer import BitWriter
 
 import re
-from bitarray import bitarray
 
+if TYPE_CHECKING:
+    from QR_Code.utils.Instrumentation import BuildStats
+    from QR_Code.processing.Segmentation import Segment
 
-def get_smallest_version_and_ec(message_len: int, enc_mode: EncodingMode) -> tuple[int, ECCode]:
-    capacities_by_version: dict[int, list[int]] = CHARACTER_CAPACITIES_BY_VERSION[enc_mode]
-    version: int = 1
-    while version <= 40:
-        for e, code_words in enumerate(capacities_by_version[version][::-1]):
-            if code_words >= message_len:
-                return version, EC_CODE_IDX[3 - e]
-        version += 1
+
+def _get_smallest_version(message_len: int, enc_mode: EncodingMode, ec_level: ECCode | None) -> tuple[int, ECCode]:
+    if enc_mode not in LENGTH_BITS:
+        raise ModeNotImplementedError(f"Unrecognized Encoding Mode: {enc_mode}")
+    for first_version, last_version in VERSION_RANGES:
+        bit_length: int = 4 + get_length_bits(enc_mode, first_version) + get_character_bits(enc_mode, message_len)
+        found: tuple[int, ECCode] | None = find_version(bit_length, ec_level, first_version, last_version)
+        if found is not None:
+            return found
     raise DataLimitExceededError(f"the length of your message is {message_len}, which is too long for {enc_mode} encoding")
 
 
+def get_smallest_version_and_ec(message_len: int, enc_mode: EncodingMode) -> tuple[int, ECCode]:
+    return _get_smallest_version(message_len, enc_mode, None)
+
+
 def get_smallest_version_from_ec(message_len: int, enc_mode: EncodingMode, ec_level: ECCode) -> tuple[int, ECCode]:
-    capacities_by_ec: list[int] = CHARACTER_CAPACITIES_BY_EC[enc_mode][ec_level]
-    version: int = 1
-    while version <= 40:
-        if capacities_by_ec[version - 1] >= message_len:
-            return version, ec_level
-        version += 1
-    raise DataLimitExceededError(f"the length of your message is {message_len}, which is too long for {enc_mode} encoding")
+    return _get_smallest_version(message_len, enc_mode, ec_level)
+
+
+def get_size_info(version: int) -> int:
+    return version * 4 + 17
 
 
 def get_encoding_mode(message: str) -> EncodingMode:
@@ -36,7 +43,7 @@ def get_encoding_mode(message: str) -> EncodingMode:
         return EncodingMode.ALPHA_NUMERIC
     if re.fullmatch(Regex.BYTE, message):
         return EncodingMode.BYTE
-    if re.fullmatch(Regex.KANJI, message):
+    if re.fullmatch(Regex.KANJI, message) and get_kanji_values(message) is not None:
         return EncodingMode.KANJI
     return EncodingMode.ECI
 
@@ -67,6 +74,12 @@ def get_total_codewords(version: int, ec_code: ECCode):
     return data[0] + (data[2] + data[4]) * data[1]
 
 
+def get_block_info(version: int, ec_code: ECCode) -> tuple[int, list[int]]:
+    """returns the EC codewords per block and the number of data codewords in each block, group 1 blocks first"""
+    data: tuple = CODEWORDS_AND_BLOCK_INFO[f'{version}{ec_code.name}']
+    return data[1], [data[3]] * data[2] + [data[5]] * data[4]
+
+
 def split_into_chunks(l: Sized, chunk_size: int) -> list:
     return [l[i: i + chunk_size] for i in range(0, len(l), chunk_size)]
 
@@ -77,90 +90,141 @@ ALPHANUMERIC_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:'
 # ALPHANUMERIC_CHARS = '0123456789abcdefghijklmnopqrstuvwxyz $%*+-./:'
 
 
+# character -> its value in alphanumeric mode, every other byte maps to INVALID_ALPHANUMERIC
+INVALID_ALPHANUMERIC = 0xff
+ALPHANUMERIC_TABLE: bytes = bytes(ALPHANUMERIC_CHARS.index(chr(byte)) if chr(byte) in ALPHANUMERIC_CHARS else INVALID_ALPHANUMERIC
+                                  for byte in range(256))
+DIGITS_OFFSET = 111 * ord('0')  # 100 * d0 + 10 * d1 + d2 over the ASCII codes of 3 digits exceeds their value by this
+
+PAD_CODEWORDS = b'\xec\x11'
+
+# the double byte Shift JIS codes kanji mode holds, with what is subtracted from them before they are packed into 13 bits
+KANJI_CODE_RANGES: tuple[tuple[int, int, int], ...] = ((0x8140, 0x9ffc, 0x8140), (0xe040, 0xebbf, 0xc140))
+KANJI_BITS = 13
+
+# an ECI header switches the byte segments after it to another character set, only UTF-8 (ECI 000026) is written
+UTF8_ECI_DESIGNATOR = 26
+ECI_DESIGNATOR_BITS = 8  # designators below 128 take one byte
+ECI_HEADER_BITS = 4 + ECI_DESIGNATOR_BITS
+
+
+def get_kanji_values(text: str) -> list[int] | None:
+    """the 13 bit kanji mode value of every character of text, None if one of them has no Shift JIS code kanji mode holds"""
+    try:
+        encoded: bytes = text.encode('shift_jis')
+    except UnicodeEncodeError:
+        return None
+    if len(encoded) != 2 * len(text):  # a character with a single byte code
+        return None
+    values: list[int] = []
+    for high, low in zip(encoded[0::2], encoded[1::2]):
+        code: int = high << 8 | low
+        for first, last, offset in KANJI_CODE_RANGES:
+            if first <= code <= last:
+                code -= offset
+                break
+        else:
+            return None
+        values.append((code >> 8) * 0xc0 + (code & 0xff))
+    return values
+
+
 class Encoder:
-    def __init__(self, version: int, ec_code: ECCode):
+    def __init__(self, version: int, ec_code: ECCode, stats: BuildStats | None = None):
         self._message = ''
         self._enc_mode = EncodingMode.NUMERIC
         self.version = version
         self.ec_code = ec_code
-
-    def _encode_numeric_message(self) -> bitarray:
-        bits = bitarray('0001')
-        bits.extend(int_to_bit(len(self._message), get_length_bits(EncodingMode.NUMERIC, self.version)))
-
-        for chunk in split_into_chunks(self._message, 3):
-            _int = int(chunk)
-            match len(chunk):
-                case 3:
-                    bits.extend(int_to_bit(_int, 10))
-                case 2:
-                    bits.extend(int_to_bit(_int, 7))
-                case 1:
-                    bits.extend(int_to_bit(_int, 4))
-
-            bits.extend('0000')
-            bits.extend('0' * (8 - len(bits) % 8))
-
-        for i in range(get_data_codewords(self.version, self.ec_code) - len(bits) // 8):
-            bits.extend('11101100') if i % 2 == 0 else bits.extend('00010001')
-
-        return bits
-
-    def _encode_alphanumeric_message(self) -> bitarray:
-        bits = bitarray('0010')
-        bits.extend(int_to_bit(len(self._message), get_length_bits(EncodingMode.ALPHA_NUMERIC, self.version)))
-
-        for chunk in split_into_chunks(self._message, 2):
-            print(chunk)
-            if len(chunk) == 2:
-                bits.extend(int_to_bit(45 * ALPHANUMERIC_CHARS.index(chunk[0]) + ALPHANUMERIC_CHARS.index(chunk[1]), 11))
-            else:
-                bits.extend(int_to_bit(ALPHANUMERIC_CHARS.index(chunk), 6))
-        bits.extend('0000')
-        bits.extend('0' * (8 - len(bits) % 8))
-
-        for i in range(get_data_codewords(self.version, self.ec_code) - len(bits) // 8):
-            bits.extend('11101100') if i % 2 == 0 else bits.extend('00010001')
-
-        return bits
-
-    def _encode_byte_message(self) -> bitarray:
-        bits = bitarray('0100')
-        bits.extend(int_to_bit(len(self._message), get_length_bits(EncodingMode.BYTE, self.version)))
-
-        for char in self._message:
-            bits.extend(int_to_bit(ord(char), 8))
-
-        bits.extend('0000')
-
-        for i in range(get_data_codewords(self.version, self.ec_code) - len(bits) // 8):
-            bits.extend('11101100') if i % 2 == 0 else bits.extend('00010001')
-
-        return bits
-
-    def encode(self, message: str):
-        self._message = message
-        self._enc_mode = get_encoding_mode(message)
-        print(self._enc_mode)
-
-        bits = bitarray('0')
-
-        match self._enc_mode:
-            case EncodingMode.NUMERIC:
-                bits = self._encode_numeric_message()
-            case EncodingMode.ALPHA_NUMERIC:
-                bits = self._encode_alphanumeric_message()
-            case EncodingMode.BYTE:
-                bits = self._encode_byte_message()
-            case EncodingMode.KANJI:
-                raise ModeNotImplementedError("Kanji mode is not yet implemented")
-            case _:
-                raise ModeNotImplementedError(f"Unrecognized Encoding Mode: {self._enc_mode}")
-
-        return list(map(int, bits.tobytes()))
-
-
-def print_bit_array(bits: bitarray, num_bytes: int = 5):
+        self.stats = stats
+
+    def _encode_segment_header(self, writer: BitWriter, enc_mode: EncodingMode, count: int) -> None:
+        writer.write(enc_mode.value, 4)
+        writer.write(count, get_length_bits(enc_mode, self.version))
+
+    def _encode_numeric_segment(self, writer: BitWriter, text: str) -> None:
+        self._encode_segment_header(writer, EncodingMode.NUMERIC, len(text))
+        digits: bytes = text.encode('latin-1')
+        if digits and not digits.isdigit():
+            raise ModeNotImplementedError(f"{text!r} has characters that can't be encoded in numeric mode")
+        full: int = len(digits) - len(digits) % 3
+        writer.write_fields([100 * d0 + 10 * d1 + d2 - DIGITS_OFFSET
+                             for d0, d1, d2 in zip(digits[0:full:3], digits[1:full:3], digits[2:full:3])], 10)
+        match len(digits) - full:
+            case 2:
+                writer.write(10 * digits[full] + digits[full + 1] - 11 * ord('0'), 7)
+            case 1:
+                writer.write(digits[full] - ord('0'), 4)
+
+    def _encode_alphanumeric_segment(self, writer: BitWriter, text: str) -> None:
+        self._encode_segment_header(writer, EncodingMode.ALPHA_NUMERIC, len(text))
+        values: bytes = text.encode('latin-1').translate(ALPHANUMERIC_TABLE)
+        if INVALID_ALPHANUMERIC in values:
+            raise ModeNotImplementedError(f"{text!r} has characters that can't be encoded in alphanumeric mode")
+        full: int = len(values) - len(values) % 2
+        writer.write_fields([45 * first + second for first, second in zip(values[0:full:2], values[1:full:2])], 11)
+        if full < len(values):
+            writer.write(values[full], 6)
+
+    def _encode_byte_segment(self, writer: BitWriter, text: str, encoding: str = 'latin-1') -> None:
+        """the character count of a byte segment is its number of bytes, more than len(text) in UTF-8"""
+        data: bytes = text.encode(encoding)
+        self._encode_segment_header(writer, EncodingMode.BYTE, len(data))
+        writer.write_bytes(data)
+
+    def _encode_kanji_segment(self, writer: BitWriter, text: str) -> None:
+        values: list[int] | None = get_kanji_values(text)
+        if values is None:
+            raise ModeNotImplementedError(f"{text!r} has characters that can't be encoded in kanji mode")
+        self._encode_segment_header(writer, EncodingMode.KANJI, len(text))
+        writer.write_fields(values, KANJI_BITS)
+
+    def _encode_eci_header(self, writer: BitWriter, designator: int) -> None:
+        writer.write(EncodingMode.ECI.value, 4)
+        writer.write(designator, ECI_DESIGNATOR_BITS)
+
+    def _add_padding(self, writer: BitWriter) -> None:
+        """adds the terminator (as much of it as fits), pads to a whole codeword and fills the symbol with pad codewords"""
+        writer.write(0, min(4, writer.capacity_bits - writer.bit_length))
+        writer.fill(PAD_CODEWORDS)
+
+    def encode_segments(self, segments: list[Segment]) -> bytes:
+        """
+        encodes the segments one after the other into the data codewords of the symbol. an ECI segment (its text is empty)
+        writes the UTF-8 designator, byte segments after it are encoded in UTF-8 instead of ISO 8859-1
+        """
+        writer = BitWriter(get_data_codewords(self.version, self.ec_code))
+        self._message = ''.join(segment.text for segment in segments)
+        byte_encoding: str = 'latin-1'
+        for segment in segments:
+            self._enc_mode = segment.mode
+            if self.stats is not None:
+                self.stats.record_event('segment', {'mode': segment.mode.name, 'characters': len(segment.text)})
+
+            match segment.mode:
+                case EncodingMode.NUMERIC:
+                    self._encode_numeric_segment(writer, segment.text)
+                case EncodingMode.ALPHA_NUMERIC:
+                    self._encode_alphanumeric_segment(writer, segment.text)
+                case EncodingMode.BYTE:
+                    self._encode_byte_segment(writer, segment.text, byte_encoding)
+                case EncodingMode.KANJI:
+                    self._encode_kanji_segment(writer, segment.text)
+                case EncodingMode.ECI:
+                    self._encode_eci_header(writer, UTF8_ECI_DESIGNATOR)
+                    byte_encoding = 'utf-8'
+                case _:
+                    raise ModeNotImplementedError(f"Unrecognized Encoding Mode: {segment.mode}")
+
+        self._add_padding(writer)
+        return writer.getvalue()
+
+    def encode(self, message: str) -> bytes:
+        """encodes message split into the segments with the fewest bits"""
+        from QR_Code.processing.Segmentation import segment_message  # Segmentation builds on this module
+        return self.encode_segments(segment_message(message, self.version))
+
+
+def print_bit_array(bits: Iterable[int], num_bytes: int = 5):
     if num_bytes <= 0:
         num_bytes = -1
     i, j = 0, 0
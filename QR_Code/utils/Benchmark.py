@@ -0,0 +1,217 @@
+"""
+Throughput benchmark of every build stage over versions 1-40, the four EC levels and a payload corpus covering each mode
+
+    python -m QR_Code.utils.Benchmark --save baseline.json            # record a baseline
+    python -m QR_Code.utils.Benchmark --baseline baseline.json        # exits with 1 when a stage got slower
+
+every payload is grown until it needs exactly the version being measured, then each stage is timed on its own (best of
+BENCHMARK_REPEAT runs): mode detection, planning (mode detection and version selection, as a build runs it), encoding, EC,
+placement, mask selection and PNG rendering. results are written as JSON, one record per (version, EC level, payload) with
+the time of every stage in microseconds
+"""
+from __future__ import annotations
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Callable, Iterable
+from QR_Code.builder.Masking import Masker, SCORING_REFERENCE, SCORING_VECTORIZED
+from QR_Code.builder.Placement import get_placement_index, place_codewords
+from QR_Code.builder.QRCodeBuilder import ENGINE_LIST, ENGINE_ARRAY
+from QR_Code.builder.Templates import get_template
+from QR_Code.display.Writers import render
+from QR_Code.error_correction.Reed_Solomon import get_block_error_correction_words
+from QR_Code.processing.Segmentation import SymbolPlan, plan_symbol, segment_message
+from QR_Code.processing.Sequencing import Encoder, get_size_info
+from QR_Code.utils.Classes import ECCode
+from QR_Code.utils.Exceptions import DataLimitExceededError
+
+STAGES = ('mode_detection', 'plan', 'encode', 'error_correction', 'placement', 'masking', 'render')
+BENCHMARK_REPEAT = 5
+REGRESSION_TOLERANCE = 0.25  # a stage regresses when it is this much slower than the baseline ...
+REGRESSION_FLOOR_US = 5.0  # ... and slower by at least this much per symbol, so timer noise on tiny stages is ignored
+
+# payload name -> text it is grown from, the name says which mode it exercises
+PAYLOAD_CORPUS: dict[str, str] = {
+    'serial': '0049123456789017 ',  # numeric, the separator is dropped below
+    'label': 'SN-4711/AB-0042 LOT:7 ',  # alphanumeric
+    'url': 'https://shop.example.com/p/84213?utm_source=qr&ref=flyer-',  # byte
+    'vcard': 'BEGIN:VCARD\nVERSION:3.0\nN:Doe;Jane\nTEL:+1-555-0100\nEMAIL:jane@example.com\nEND:VCARD\n',  # byte
+    'kanji': '品番4711東京都千代田区丸の内1丁目検査済み ',  # kanji, with numeric runs and an ASCII byte
+    'utf8': 'Grüße aus Köln – 東京 ✓ naïve café № 42 ',  # byte, UTF-8 behind an ECI header
+}
+
+
+def get_corpus_text(name: str, length: int) -> str:
+    base: str = PAYLOAD_CORPUS[name].strip() if name == 'serial' else PAYLOAD_CORPUS[name]
+    return (base * (length // len(base) + 1))[:length]
+
+
+def make_payload(name: str, version: int, ec_level: ECCode) -> str | None:
+    """the longest text of the corpus entry that still fits in version, None when even its shortest text needs more"""
+    low, high = 1, 7089  # the most characters any symbol holds
+    best: str | None = None
+    while low <= high:
+        length: int = (low + high) // 2
+        text: str = get_corpus_text(name, length)
+        try:
+            fits: bool = plan_symbol(text, ec_level).version <= version
+        except DataLimitExceededError:
+            fits = False
+        if fits:
+            best, low = text, length + 1
+        else:
+            high = length - 1
+    return best
+
+
+def _best_time_us(function: Callable[[], Any], repeat: int) -> float:
+    timings: list[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1e6
+
+
+def benchmark_payload(message: str, ec_level: ECCode, engine: str = ENGINE_LIST,
+                      repeat: int = BENCHMARK_REPEAT) -> tuple[SymbolPlan, dict[str, float]]:
+    """times every stage of building message, each stage gets the output of the previous one as input"""
+    plan: SymbolPlan = plan_symbol(message, ec_level)
+    version, ec = plan.version, plan.ec_level
+    timings: dict[str, float] = {'mode_detection': _best_time_us(lambda: segment_message(message, version), repeat),
+                                 'plan': _best_time_us(lambda: plan_symbol(message, ec_level), repeat)}
+    size: int = get_size_info(version)
+    template = get_template(version)
+
+    encoder = Encoder(version, ec)
+    timings['encode'] = _best_time_us(lambda: encoder.encode_segments(plan.segments), repeat)
+    data: bytes = encoder.encode_segments(plan.segments)
+    timings['error_correction'] = _best_time_us(lambda: get_block_error_correction_words(data, version, ec), repeat)
+    codewords: bytes = data + get_block_error_correction_words(data, version, ec)
+
+    if engine == ENGINE_ARRAY:
+        def place() -> Any:
+            module_array = template.copy_module_array()
+            module_array.place_codewords(codewords, get_placement_index(version, ec, size, template.module_sequence))
+            return module_array.modules
+    else:
+        def place() -> Any:
+            matrix = template.copy_matrix()
+            place_codewords(matrix, codewords, get_placement_index(version, ec, size, template.module_sequence))
+            return matrix
+    timings['placement'] = _best_time_us(place, repeat)
+    placed: Any = place()
+
+    masker = Masker(size, version, ec, SCORING_VECTORIZED if engine == ENGINE_ARRAY else SCORING_REFERENCE)
+    timings['masking'] = _best_time_us(lambda: masker.apply_best_mask(placed, template.module_sequence), repeat)
+    masked: Any = masker.apply_best_mask(placed, template.module_sequence)
+    matrix: list[list[bool]] = masked.astype(bool).tolist() if engine == ENGINE_ARRAY else masked
+    timings['render'] = _best_time_us(lambda: render(matrix, 'png'), repeat)
+    return plan, timings
+
+
+def run_benchmark(versions: Iterable[int] = range(1, 41), ec_levels: Iterable[ECCode] = tuple(ECCode),
+                  payloads: Iterable[str] = tuple(PAYLOAD_CORPUS), engine: str = ENGINE_LIST,
+                  repeat: int = BENCHMARK_REPEAT) -> dict[str, Any]:
+    records: list[dict[str, Any]] = []
+    for version in versions:
+        for ec_level in ec_levels:
+            for name in payloads:
+                message: str | None = make_payload(name, version, ec_level)
+                if message is None:
+                    continue
+                benchmark_payload(message, ec_level, engine, 1)  # warms the per version caches
+                plan, timings = benchmark_payload(message, ec_level, engine, repeat)
+                records.append({
+                    'version': plan.version, 'ec_level': ec_level.name, 'payload': name, 'characters': len(message),
+                    'modes': [segment.mode.name for segment in plan.segments], 'stage_us': timings
+                })
+    return {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'engine': engine, 'repeat': repeat},
+        'results': records
+    }
+
+
+def _record_key(record: dict[str, Any]) -> tuple[int, str, str]:
+    return record['version'], record['ec_level'], record['payload']
+
+
+def summarize(results: dict[str, Any], keys: set[tuple[int, str, str]] | None = None) -> dict[str, float]:
+    """
+    total time of every stage over the grid (or the records with the given keys), in microseconds. stages some record
+    has no time for (results saved before the stage was added) are left out
+    """
+    records: list[dict[str, Any]] = [r for r in results['results'] if keys is None or _record_key(r) in keys]
+    return {stage: sum(record['stage_us'][stage] for record in records) for stage in STAGES
+            if all(stage in record['stage_us'] for record in records)}
+
+
+def compare_with_baseline(current: dict[str, Any], baseline: dict[str, Any], tolerance: float = REGRESSION_TOLERANCE,
+                          floor_us: float = REGRESSION_FLOOR_US) -> list[str]:
+    """
+    returns a description of every stage that is slower than in the baseline, empty when nothing regressed. stages are
+    compared by their total over the grid, single records are too noisy to be compared on their own, and only when both
+    runs timed them. raises ValueError when the runs used different engines or grids, their totals would not measure the
+    same work
+    """
+    if current['meta']['engine'] != baseline['meta']['engine']:
+        raise ValueError(f"baseline used the {baseline['meta']['engine']} engine, this run the {current['meta']['engine']} engine")
+    shared: set[tuple[int, str, str]] = {_record_key(r) for r in current['results']}
+    baseline_keys: set[tuple[int, str, str]] = {_record_key(r) for r in baseline['results']}
+    if shared != baseline_keys:
+        raise ValueError(f'baseline has a different grid: {len(baseline_keys - shared)} symbols only in the baseline, '
+                         f'{len(shared - baseline_keys)} only in this run')
+    before_totals: dict[str, float] = summarize(baseline, shared)
+    regressions: list[str] = []
+    for stage, elapsed in summarize(current, shared).items():
+        if stage not in before_totals:
+            continue
+        before: float = before_totals[stage]
+        if elapsed > before * (1 + tolerance) and elapsed - before > floor_us * len(shared):
+            regressions.append(f'{stage}: {before / 1000:.1f}ms -> {elapsed / 1000:.1f}ms (+{(elapsed / before - 1) * 100:.0f}%) '
+                               f'over {len(shared)} symbols')
+    return regressions
+
+
+def _parse_versions(text: str) -> list[int]:
+    versions: list[int] = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        versions.extend(range(int(first), int(last or first) + 1))
+    return versions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--versions', type=_parse_versions, default=list(range(1, 41)), help='e.g. 1-10,20,40')
+    parser.add_argument('--ec', nargs='*', choices=[ec.name for ec in ECCode], default=[ec.name for ec in ECCode])
+    parser.add_argument('--payloads', nargs='*', choices=list(PAYLOAD_CORPUS), default=list(PAYLOAD_CORPUS))
+    parser.add_argument('--engine', choices=(ENGINE_LIST, ENGINE_ARRAY), default=ENGINE_LIST)
+    parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT)
+    parser.add_argument('--save', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare with the results saved in this file')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    benchmark: dict[str, Any] = run_benchmark(args.versions, [ECCode[name] for name in args.ec], args.payloads, args.engine,
+                                              args.repeat)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(benchmark, f, indent=1)
+    else:
+        json.dump(benchmark, sys.stdout, indent=1)
+        print()
+    for stage_name, total_us in summarize(benchmark).items():
+        print(f'{stage_name:<17}{total_us / 1000:10.1f}ms', file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline: dict[str, Any] = json.load(f)
+        try:
+            regressed: list[str] = compare_with_baseline(benchmark, baseline, args.tolerance)
+        except ValueError as error:
+            sys.exit(f'cannot compare with {args.baseline}: {error}')
+        for line in regressed:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        sys.exit(1 if regressed else 0)
@@ -0,0 +1,473 @@
+"""
+Bulk export of messages read from CSV or JSONL into images, on every core and resumable after the job is killed
+
+    python -m QR_Code batch labels.csv labels.tar --column serial --ec M
+    python -m QR_Code batch labels.jsonl labels/ --format pbm --shard-size 50000
+
+rows are handed to a process pool in chunks of chunk_size and the images come back in input order, at most two chunks per
+worker in flight, so memory stays bounded whatever the size of the input. every shard_size rows go to a shard of their
+own: OUTPUT-00000.tar / .zip, or OUTPUT/00000/ for a directory. a chunk is written with one write call, and files are synced
+and a checkpoint (OUTPUT.checkpoint.json) is saved at most every checkpoint_seconds. a rerun with the same arguments
+continues at the last checkpoint: tar shards and directories right where it was saved, zip shards (which are only valid
+once closed) from the start of the unfinished shard. messages that cannot be built are listed in OUTPUT.errors.jsonl
+"""
+from __future__ import annotations
+import csv
+import json
+import os
+import sys
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Iterator, NamedTuple
+from QR_Code.builder.Async_Builder import init_worker
+from QR_Code.builder.QRCodeBuilder import QRCodeBuilder, ENGINE_LIST
+from QR_Code.display.Writers import TAR_END, WRITERS, check_image_options, render, tar_member
+from QR_Code.utils.Classes import ECCode
+
+DEFAULT_CHUNK_SIZE = 256
+DEFAULT_SHARD_SIZE = 100000
+DEFAULT_CHECKPOINT_SECONDS = 5.0
+CHECKPOINT_VERSION = 1
+WRITE_BUFFER_SIZE = 1 << 20
+MAX_NAME_BYTES = 255  # the longest file name most file systems take, extension included
+
+
+class Row(NamedTuple):
+    index: int
+    name: str  # file name of its image without the extension
+    message: str
+    error: str | None = None  # why the row can't be read, it goes to the errors file instead of being built
+
+
+class ExportOptions(NamedTuple):
+    """everything that decides what ends up in the output, a checkpoint is only resumed with the same options"""
+    input_path: str
+    output_path: str
+    output_kind: str  # 'tar', 'zip' or 'dir'
+    column: str | None
+    name_column: str | None
+    ec_level: ECCode | None
+    image_format: str
+    scale: int
+    quiet_zone: int
+    shard_size: int
+
+    def to_json(self) -> dict[str, Any]:
+        return {**self._asdict(), 'ec_level': None if self.ec_level is None else self.ec_level.name}
+
+
+class ExportSummary(NamedTuple):
+    rows: int
+    errors: int
+    seconds: float
+    resumed_at: int
+
+
+def get_output_kind(output_path: str) -> str:
+    extension: str = os.path.splitext(output_path)[1].lower()
+    return extension[1:] if extension in ('.tar', '.zip') else 'dir'
+
+
+def _decode_line(line: str) -> Any:
+    """the value of a JSONL line, or the JSONDecodeError for a line that is not JSON"""
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return e
+
+
+def iter_messages(path: str, column: str | None = None, name_column: str | None = None) -> Iterator[Row]:
+    """
+    the rows of a CSV file (with a header, column defaults to 'message' or else the first column) or a JSONL file (every
+    line a string or an object, column defaults to 'message'). name_column names the image of a row, its index otherwise.
+    a row that is not JSON, not a string or an object, or has no (or a null) message or name comes with its error set
+    """
+    jsonl: bool = os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson')
+    with open(path, newline='' if not jsonl else None, encoding='utf-8') as f:
+        if jsonl:
+            records: Iterator[Any] = (_decode_line(line) for line in f if line.strip())
+            field: str = column or 'message'
+        else:
+            reader = csv.DictReader(f)
+            if reader.fieldnames is None:
+                return
+            field = column or ('message' if 'message' in reader.fieldnames else reader.fieldnames[0])
+            if field not in reader.fieldnames or name_column is not None and name_column not in reader.fieldnames:
+                raise ValueError(f'{path} has the columns {", ".join(reader.fieldnames)}')
+            records = reader
+        for index, record in enumerate(records):
+            default_name: str = f'{index:09d}'
+            if isinstance(record, str):
+                yield Row(index, default_name, record)
+                continue
+            if isinstance(record, json.JSONDecodeError):
+                yield Row(index, default_name, record.doc.strip(), f'JSONDecodeError: {record}')
+                continue
+            if not isinstance(record, dict):
+                yield Row(index, default_name, json.dumps(record), f'row is a JSON {type(record).__name__}, not a string '
+                                                                   f'or an object')
+                continue
+            message: Any = record.get(field)
+            name: Any = default_name if name_column is None else record.get(name_column)
+            if message is None:
+                yield Row(index, default_name if name is None else str(name), '', f'row has no {field!r} field')
+            elif name is None:
+                yield Row(index, default_name, str(message), f'row has no {name_column!r} field')
+            else:
+                yield Row(index, str(name), str(message))
+
+
+def render_rows(rows: list[Row], ec_level: ECCode | None, image_format: str, scale: int, quiet_zone: int,
+                engine: str = ENGINE_LIST) -> list[tuple[bytes | None, str | None]]:
+    """runs on a worker, (image, None) for every row that was built and (None, error) for the others"""
+    results: list[tuple[bytes | None, str | None]] = []
+    for row in rows:
+        if row.error is not None:
+            results.append((None, row.error))
+            continue
+        try:
+            qr = QRCodeBuilder(row.message, ec_level, engine)
+            image: bytes = render(qr.matrix, image_format, scale, quiet_zone)
+        except Exception as e:  # one bad row does not stop the job, it is listed in the errors file
+            results.append((None, f'{type(e).__name__}: {e}'))
+            continue
+        results.append((image, None))
+    return results
+
+
+def check_options(options: ExportOptions) -> None:
+    """raises ValueError for options no row could be exported with, before anything is written"""
+    if options.output_kind not in SHARD_WRITERS:
+        raise ValueError(f'output_kind must be one of {", ".join(SHARD_WRITERS)}')
+    if options.image_format not in WRITERS:
+        raise ValueError(f'image_format must be one of {", ".join(WRITERS)}')
+    check_image_options(options.scale, options.quiet_zone)
+    if options.shard_size < 1:
+        raise ValueError(f'shard_size must be at least 1, got {options.shard_size}')
+
+
+def check_member_name(name: str, extension: str = '') -> str | None:
+    """
+    why name (followed by extension) can't be the file name of an image, None if it can. a name is a single path
+    component, so no row can write outside its shard
+    """
+    if not name or name in ('.', '..'):
+        return f'{name!r} is not a file name'
+    if '/' in name or '\\' in name or '\x00' in name or os.path.isabs(name) or os.path.basename(name) != name:
+        return f'{name!r} is a path, not a file name'
+    if len((name + extension).encode('utf-8', 'surrogateescape')) > MAX_NAME_BYTES:
+        return f'{name[:32]!r}... is longer than {MAX_NAME_BYTES} bytes'
+    return None
+
+
+class TarShards:
+    """one uncompressed tar per shard, appended to in place, so a resume continues at the synced offset"""
+    resumable: bool = True
+
+    def __init__(self, output_path: str) -> None:
+        self.stem, self.extension = os.path.splitext(output_path)
+        self._file = None
+        self._mtime: int = int(time.time())
+
+    def open(self, shard: int, offset: int) -> None:
+        self._file = open(f'{self.stem}-{shard:05d}{self.extension}', 'r+b' if offset else 'wb', buffering=WRITE_BUFFER_SIZE)
+        self._file.truncate(offset)  # drops whatever was written after the checkpoint
+        self._file.seek(offset)
+
+    def write(self, members: list[tuple[str, bytes]]) -> dict[int, str]:
+        """writes members and returns {position in members: error} for the ones that could not be written"""
+        blocks: list[bytes] = []
+        failed: dict[int, str] = {}
+        for position, (name, data) in enumerate(members):
+            try:
+                blocks.append(tar_member(name, data, self._mtime))
+            except ValueError as e:
+                failed[position] = f'{type(e).__name__}: {e}'
+        self._file.write(b''.join(blocks))
+        return failed
+
+    def sync(self) -> int:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def finish(self) -> None:
+        self._file.write(TAR_END)
+        self.sync()
+        self._file.close()
+        self._file = None
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ZipShards:
+    """
+    one stored (not deflated, the images are compressed already) zip per shard. a zip is only readable once its central
+    directory is written at the end, so shards are written as .partial files and an unfinished shard starts over on resume
+    """
+    resumable: bool = False
+
+    def __init__(self, output_path: str) -> None:
+        self.stem, self.extension = os.path.splitext(output_path)
+        self._zip: zipfile.ZipFile | None = None
+        self._path: str = ''
+        self._date_time: tuple[int, ...] = time.localtime()[:6]
+
+    def open(self, shard: int, offset: int) -> None:
+        self._path = f'{self.stem}-{shard:05d}{self.extension}'
+        self._zip = zipfile.ZipFile(open(self._path + '.partial', 'wb', buffering=WRITE_BUFFER_SIZE), 'w', zipfile.ZIP_STORED)
+
+    def write(self, members: list[tuple[str, bytes]]) -> dict[int, str]:
+        failed: dict[int, str] = {}
+        for position, (name, data) in enumerate(members):
+            try:
+                info = zipfile.ZipInfo(name, self._date_time)
+            except ValueError as e:
+                failed[position] = f'{type(e).__name__}: {e}'
+                continue
+            self._zip.writestr(info, data)
+        return failed
+
+    def sync(self) -> None:
+        return None
+
+    def finish(self) -> None:
+        stream = self._zip.fp
+        self._zip.close()
+        stream.flush()
+        os.fsync(stream.fileno())
+        stream.close()
+        os.replace(self._path + '.partial', self._path)
+        self._zip = None
+
+    def close(self) -> None:
+        if self._zip is not None:
+            stream = self._zip.fp
+            self._zip.close()
+            stream.close()
+            self._zip = None
+
+
+class DirectoryShards:
+    """one subdirectory per shard, rows after the checkpoint are simply written again on resume"""
+    resumable: bool = True
+
+    def __init__(self, output_path: str) -> None:
+        self.directory = output_path
+        self._shard_directory: str = ''
+        self._written: list[str] = []
+
+    def open(self, shard: int, offset: int) -> None:
+        self._shard_directory = os.path.join(self.directory, f'{shard:05d}')
+        os.makedirs(self._shard_directory, exist_ok=True)
+
+    def write(self, members: list[tuple[str, bytes]]) -> dict[int, str]:
+        failed: dict[int, str] = {}
+        for position, (name, data) in enumerate(members):
+            path: str = os.path.join(self._shard_directory, name)
+            try:
+                with open(path, 'wb') as f:
+                    f.write(data)
+            except OSError as e:
+                failed[position] = f'{type(e).__name__}: {e}'
+                continue
+            self._written.append(path)
+        return failed
+
+    def sync(self) -> int:
+        for path in self._written:
+            with open(path, 'rb') as f:
+                os.fsync(f.fileno())
+        self._written.clear()
+        return 0
+
+    def finish(self) -> None:
+        self.sync()
+
+    def close(self) -> None:
+        self._written.clear()
+
+
+SHARD_WRITERS: dict[str, type] = {'tar': TarShards, 'zip': ZipShards, 'dir': DirectoryShards}
+
+
+class Checkpoint(NamedTuple):
+    rows_done: int
+    shard_offset: int  # bytes of the unfinished shard (tar) that are part of the checkpoint
+    errors: int
+    errors_offset: int  # bytes of the errors file that are part of the checkpoint
+    done: bool
+
+
+def get_checkpoint_path(output_path: str) -> str:
+    return output_path.rstrip('/\\') + '.checkpoint.json'
+
+
+def load_checkpoint(options: ExportOptions) -> Checkpoint | None:
+    path: str = get_checkpoint_path(options.output_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data: dict[str, Any] = json.load(f)
+    if data.get('version') != CHECKPOINT_VERSION or data.get('options') != options.to_json():
+        raise ValueError(f'{path} was written by a job with other options, delete it (or pass --restart) to start over')
+    return Checkpoint(data['rows_done'], data['shard_offset'], data['errors'], data['errors_offset'], data['done'])
+
+
+def save_checkpoint(options: ExportOptions, checkpoint: Checkpoint) -> None:
+    """written to a temporary file first, so a kill leaves either the previous or the new checkpoint"""
+    path: str = get_checkpoint_path(options.output_path)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'version': CHECKPOINT_VERSION, 'options': options.to_json(), **checkpoint._asdict()}, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _get_used_names(options: ExportOptions, first_row: int, last_row: int) -> set[str]:
+    """the names of rows first_row to last_row, to pick up the names of the unfinished shard on resume"""
+    rows: Iterator[Row] = iter_messages(options.input_path, options.column, options.name_column)
+    return {row.name for row in islice(rows, first_row, last_row)}
+
+
+def _iter_chunks(rows: Iterator[Row], first_row: int, chunk_size: int, shard_size: int) -> Iterator[list[Row]]:
+    """chunks of at most chunk_size rows that never span two shards"""
+    position: int = first_row
+    while True:
+        chunk: list[Row] = list(islice(rows, min(chunk_size, shard_size - position % shard_size)))
+        if not chunk:
+            return
+        position += len(chunk)
+        yield chunk
+
+
+def export(options: ExportOptions, workers: int | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+           checkpoint_seconds: float = DEFAULT_CHECKPOINT_SECONDS, restart: bool = False, engine: str = ENGINE_LIST,
+           progress: bool = True) -> ExportSummary:
+    """runs (or resumes) the export described by options, see the module docstring. raises ValueError for bad options"""
+    check_options(options)
+    if chunk_size < 1:
+        raise ValueError(f'chunk_size must be at least 1, got {chunk_size}')
+    start_time: float = time.perf_counter()
+    if restart and os.path.exists(get_checkpoint_path(options.output_path)):
+        os.remove(get_checkpoint_path(options.output_path))
+    checkpoint: Checkpoint = load_checkpoint(options) or Checkpoint(0, 0, 0, 0, False)
+    if checkpoint.done:
+        return ExportSummary(checkpoint.rows_done, checkpoint.errors, 0.0, checkpoint.rows_done)
+    shards = SHARD_WRITERS[options.output_kind](options.output_path)  # zip checkpoints only ever fall on shard ends
+    resumed_at: int = checkpoint.rows_done
+    if options.output_kind == 'dir':
+        os.makedirs(options.output_path, exist_ok=True)
+
+    errors_file = open(options.output_path.rstrip('/\\') + '.errors.jsonl', 'r+b' if checkpoint.errors_offset else 'wb')
+    errors_file.truncate(checkpoint.errors_offset)
+    errors_file.seek(checkpoint.errors_offset)
+    rows: Iterator[Row] = islice(iter_messages(options.input_path, options.column, options.name_column),
+                                 checkpoint.rows_done, None)
+    chunks: Iterator[list[Row]] = _iter_chunks(rows, checkpoint.rows_done, chunk_size, options.shard_size)
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(workers, initializer=init_worker)
+    pending: deque[tuple[list[Row], Future]] = deque()
+    rows_done, errors = checkpoint.rows_done, checkpoint.errors
+    shard_open: bool = False
+    last_checkpoint: float = time.perf_counter()
+    extension: str = '.' + options.image_format
+    # names of the rows of the current shard so far, a row reusing one is an error instead of overwriting the other image
+    used_names: set[str] = (_get_used_names(options, rows_done - rows_done % options.shard_size, rows_done)
+                            if options.name_column is not None else set())
+
+    def submit_next() -> None:
+        chunk: list[Row] | None = next(chunks, None)
+        if chunk is not None:
+            pending.append((chunk, executor.submit(render_rows, chunk, options.ec_level, options.image_format,
+                                                   options.scale, options.quiet_zone, engine)))
+
+    def save(offset: int, done: bool = False) -> None:
+        nonlocal last_checkpoint
+        errors_file.flush()
+        os.fsync(errors_file.fileno())
+        save_checkpoint(options, Checkpoint(rows_done, offset, errors, errors_file.tell(), done))
+        last_checkpoint = time.perf_counter()
+        if progress:
+            rate: float = (rows_done - resumed_at) / (time.perf_counter() - start_time)
+            print(f'{rows_done} rows, {errors} errors, {rate:.0f} rows/s', file=sys.stderr, flush=True)
+
+    try:
+        for _ in range(2 * workers):
+            submit_next()
+        while pending:
+            chunk, future = pending.popleft()
+            results: list[tuple[bytes | None, str | None]] = future.result()
+            submit_next()
+            if not shard_open:
+                shards.open(rows_done // options.shard_size, checkpoint.shard_offset if rows_done == resumed_at else 0)
+                shard_open = True
+                if rows_done % options.shard_size == 0:
+                    used_names.clear()
+            members: list[tuple[str, bytes]] = []
+            member_rows: list[Row] = []
+            failed_rows: list[tuple[Row, str]] = []
+            for row, (image, error) in zip(chunk, results):
+                name: str = row.name + extension
+                if options.name_column is not None:
+                    if error is None:
+                        error = check_member_name(row.name, extension)
+                    if error is None and row.name in used_names:
+                        error = f'{name!r} is already the name of an earlier row of the shard'
+                    used_names.add(row.name)  # failed rows included, as the names are picked up again on resume
+                if error is None:
+                    members.append((name, image))
+                    member_rows.append(row)
+                else:
+                    failed_rows.append((row, error))
+            for position, error in shards.write(members).items():
+                failed_rows.append((member_rows[position], error))
+            failed_rows.sort(key=lambda failure: failure[0].index)
+            error_lines: list[bytes] = [json.dumps({'row': row.index, 'message': row.message, 'error': error}).encode() + b'\n'
+                                        for row, error in failed_rows]
+            errors_file.write(b''.join(error_lines))
+            rows_done += len(chunk)
+            errors += len(error_lines)
+            if rows_done % options.shard_size == 0:
+                shards.finish()
+                shard_open = False
+                save(0)
+            elif shards.resumable and time.perf_counter() - last_checkpoint >= checkpoint_seconds:
+                save(shards.sync())
+        if shard_open:
+            shards.finish()
+            shard_open = False
+        save(0, done=True)
+    except BaseException:
+        for _, future in pending:
+            future.cancel()
+        if shard_open and shards.resumable:
+            save(shards.sync())  # a Ctrl+C keeps everything written so far
+        raise
+    finally:
+        executor.shutdown(cancel_futures=True)
+        shards.close()
+        errors_file.close()
+    return ExportSummary(rows_done, errors, time.perf_counter() - start_time, resumed_at)
+
+
+if __name__ == '__main__':
+    import tempfile
+    import tarfile
+    with tempfile.TemporaryDirectory() as directory:
+        source: str = os.path.join(directory, 'labels.csv')
+        with open(source, 'w', newline='') as f:
+            csv_writer = csv.writer(f)
+            csv_writer.writerow(['serial', 'message'])
+            csv_writer.writerows([(f'SN{i:06d}', f'https://example.com/p/{i}' if i != 7 else 'x' * 3000) for i in range(1000)])
+        target: str = os.path.join(directory, 'labels.tar')
+        export_options = ExportOptions(source, target, 'tar', None, 'serial', ECCode.M, 'pbm', 2, 4, 400)
+        print(export(export_options, workers=2, chunk_size=64, progress=False))
+        with tarfile.open(os.path.join(directory, 'labels-00002.tar')) as tar:
+            print(len(tar.getnames()), tar.getnames()[:2])
@@ -1,14 +1,19 @@
 from __future__ import annotations
 
 from enum import Enum
-from strenum import StrEnum  # StrEnum was added to enum in 3.11
+try:
+    from enum import StrEnum
+except ImportError:  # StrEnum was added to enum in 3.11
+    from strenum import StrEnum
 
 
 class Regex(StrEnum):
     NUMERIC = r"^[0-9]*$"
     ALPHA_NUMERIC = r"^[0-9A-Z $%*+-./:]*$"
     BYTE = r"^[\u0000-\u00ff]*$"
-    KANJI = r"(?!x)x"  # don't know the regex so using a regex that never matches with anything
+    # the unicode blocks the Shift JIS double byte characters come from, a string that matches can still have characters
+    # without a Shift JIS code: Sequencing.get_kanji_values has the final say
+    KANJI = r"^[\u00a2-\u00f7\u0391-\u0451\u2010-\u266f\u3000-\u30fe\u4e00-\u9fa0\uff01-\uffe5]*$"
 
 
 class EncodingMode(Enum):
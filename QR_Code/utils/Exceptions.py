@@ -12,3 +12,15 @@ class OutOfFieldError(Exception):
 
 class CannotDrawPatternError(Exception):
     pass
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class CodewordVerificationError(Exception):
+    pass
+
+
+class DecodingError(Exception):
+    pass
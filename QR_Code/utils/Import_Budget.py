@@ -0,0 +1,64 @@
+"""
+Import time budget of the package, checked in a fresh interpreter with python -X importtime
+
+run with python -m QR_Code.utils.Import_Budget, which exits with 1 when a budget is exceeded or an optional dependency is
+loaded by a plain import
+"""
+from __future__ import annotations
+import os
+import subprocess
+import sys
+
+# module -> budget for its cumulative import time in milliseconds (best of IMPORT_RUNS runs)
+IMPORT_TIME_BUDGETS_MS: dict[str, float] = {
+    'QR_Code': 10,
+    'QR_Code.builder.QRCodeBuilder': 50,
+}
+IMPORT_RUNS = 5
+
+# only needed for rendering, the array engine or the scraping script, never by importing the package or the builder
+LAZY_DEPENDENCIES = ('PIL', 'numpy', 'bitarray', 'requests', 'bs4')
+
+PROJECT_ROOT: str = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def measure_import(module: str) -> tuple[float, set[str]]:
+    """returns the cumulative import time of module in milliseconds and the names of every module the import loaded"""
+    env: dict[str, str] = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_ROOT, os.environ.get('PYTHONPATH')])))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], capture_output=True, text=True,
+                            env=env, check=True)
+    cumulative_us: int = 0
+    loaded: set[str] = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        loaded.add(name)
+        if name == module:
+            cumulative_us = int(cumulative)
+    return cumulative_us / 1000, loaded
+
+
+def check_import_budget(runs: int = IMPORT_RUNS) -> list[str]:
+    """returns a description of every budget that is exceeded, empty when the package is within budget"""
+    problems: list[str] = []
+    for module, budget_ms in IMPORT_TIME_BUDGETS_MS.items():
+        timings: list[float] = []
+        loaded: set[str] = set()
+        for _ in range(runs):
+            elapsed_ms, loaded = measure_import(module)
+            timings.append(elapsed_ms)
+        if min(timings) > budget_ms:
+            problems.append(f'import {module} took {min(timings):.1f}ms, budget is {budget_ms}ms')
+        for dependency in LAZY_DEPENDENCIES:
+            if dependency in loaded:
+                problems.append(f'import {module} loaded {dependency}')
+    return problems
+
+
+if __name__ == '__main__':
+    over_budget: list[str] = check_import_budget()
+    for problem in over_budget:
+        print(problem)
+    sys.exit(1 if over_budget else 0)
@@ -0,0 +1,135 @@
+"""
+Per stage wall time and allocation counts of symbol builds, and debug events in place of prints
+
+nothing is measured unless a BuildStats is passed to QRCodeBuilder(stats=...) or made active for every build with
+enable_stats(). the build code checks for a stats object before doing anything, so builds without one pay for a None check:
+
+    stats = QR_Code.utils.Instrumentation.enable_stats()
+    ...  # real traffic
+    print(stats.report())
+
+subclass BuildStats and override record_stage / record_event to forward the measurements somewhere else
+"""
+from __future__ import annotations
+import sys
+import time
+from collections import deque
+from typing import Any, Iterator, NamedTuple
+
+STAGE_PLAN = 'plan'
+STAGE_TEMPLATE = 'template'
+STAGE_ENCODE = 'encode'
+STAGE_ERROR_CORRECTION = 'error_correction'
+STAGE_VERIFY = 'verify'  # only when the build checks its codewords
+STAGE_PLACEMENT = 'placement'
+STAGE_MASK_SEARCH = 'mask_search'
+STAGE_MASK_CANDIDATE = 'mask_candidate'  # one per mask the reference scoring tries, all 8 at once for vectorized scoring
+STAGE_FORMAT_INFO = 'format_info'
+
+MAX_EVENTS = 1000  # the most recent debug events a BuildStats keeps
+
+
+class StageTotals(NamedTuple):
+    calls: int
+    seconds: float
+    max_seconds: float
+    allocated_blocks: int  # net memory blocks allocated during the stage (sys.getallocatedblocks), summed over its calls
+
+
+class _Stage:
+    """times one run of a stage, made by BuildStats.stage"""
+    __slots__ = ('stats', 'name', '_start', '_blocks')
+
+    def __init__(self, stats: BuildStats, name: str) -> None:
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self) -> _Stage:
+        self._blocks: int = sys.getallocatedblocks()
+        self._start: float = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        elapsed: float = time.perf_counter() - self._start
+        self.stats.record_stage(self.name, elapsed, sys.getallocatedblocks() - self._blocks)
+
+
+class BuildStats:
+    """collects the totals of every stage over all the builds it is given to, and the latest debug events"""
+
+    def __init__(self, max_events: int = MAX_EVENTS) -> None:
+        self._totals: dict[str, list[float]] = {}  # stage -> [calls, seconds, max seconds, allocated blocks]
+        self.events: deque[tuple[str, dict[str, Any]]] = deque(maxlen=max_events)
+        self.builds: int = 0
+
+    def stage(self, name: str) -> _Stage:
+        """context manager that records the time and allocations of the code it wraps as one call of stage name"""
+        return _Stage(self, name)
+
+    def record_stage(self, name: str, seconds: float, allocated_blocks: int) -> None:
+        totals: list[float] | None = self._totals.get(name)
+        if totals is None:
+            totals = self._totals[name] = [0, 0.0, 0.0, 0]
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+        totals[3] += allocated_blocks
+
+    def record_event(self, name: str, data: dict[str, Any]) -> None:
+        self.events.append((name, data))
+
+    def get_totals(self) -> dict[str, StageTotals]:
+        return {name: StageTotals(int(t[0]), t[1], t[2], int(t[3])) for name, t in self._totals.items()}
+
+    def iter_events(self, name: str | None = None) -> Iterator[dict[str, Any]]:
+        return (data for event, data in self.events if name is None or event == name)
+
+    def clear(self) -> None:
+        self._totals.clear()
+        self.events.clear()
+        self.builds = 0
+
+    def report(self) -> str:
+        """one line per stage, slowest first"""
+        lines: list[str] = [f'{self.builds} builds']
+        for name, totals in sorted(self.get_totals().items(), key=lambda item: -item[1].seconds):
+            lines.append(f'{name:<17}{totals.calls:>8} calls {totals.seconds * 1000:10.2f}ms '
+                         f'(max {totals.max_seconds * 1000:.2f}ms) {totals.allocated_blocks:>10} blocks')
+        return '\n'.join(lines)
+
+
+_ACTIVE_STATS: BuildStats | None = None
+
+
+def enable_stats(stats: BuildStats | None = None) -> BuildStats:
+    """makes stats (a new BuildStats if not given) record every build that is not given its own"""
+    global _ACTIVE_STATS
+    _ACTIVE_STATS = stats if stats is not None else BuildStats()
+    return _ACTIVE_STATS
+
+
+def disable_stats() -> None:
+    global _ACTIVE_STATS
+    _ACTIVE_STATS = None
+
+
+def get_active_stats() -> BuildStats | None:
+    return _ACTIVE_STATS
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+
+_NO_STAGE = _NoStage()
+
+
+def measure(stats: BuildStats | None, name: str) -> _Stage | _NoStage:
+    """stats.stage(name), or a context manager that does nothing when there is no stats object"""
+    return _NO_STAGE if stats is None else stats.stage(name)
@@ -0,0 +1,465 @@
+"""
+Local HTTP service that generates symbols, on asyncio streams and the standard library only
+
+    python -m QR_Code serve --port 8080
+
+    GET  /symbol?data=...&ec=M&format=png&scale=4&quiet_zone=4   one image
+    POST /batch?format=pbm&archive=tar                             a JSON list of messages (or {"messages": [...]}), the
+                                                                    images are streamed back as multipart/mixed or a tar
+    GET  /metrics                                                   latency, throughput and cache counters as JSON
+
+symbols are built by an AsyncGenerator (a process pool in front of a SymbolCache). connections are kept alive between
+requests unless the client asks otherwise. a batch streams its images in message order as they are built, a message that
+fails becomes an error part (multipart) or an .error.txt member (tar) instead of aborting the batch
+"""
+from __future__ import annotations
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, AsyncIterator, NamedTuple
+from urllib.parse import parse_qs, urlsplit
+from QR_Code.builder.Async_Builder import AsyncGenerator, DEFAULT_MAX_QUEUED
+from QR_Code.builder.Symbol_Cache import SymbolCache
+from QR_Code.display.Writers import CONTENT_TYPES, TAR_END, WRITERS, tar_member
+from QR_Code.utils.Classes import ECCode
+from QR_Code.utils.Exceptions import DataLimitExceededError, QueueFullError
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+KEEP_ALIVE_TIMEOUT = 15.0  # seconds an idle connection is kept open for its next request
+READ_TIMEOUT = 10.0  # seconds a client has to send a whole request once it connected or started one
+MAX_HEADER_BYTES = 16 << 10
+MAX_BODY_BYTES = 16 << 20
+MAX_BATCH_MESSAGES = 10000
+MAX_SCALE = 32
+MAX_QUIET_ZONE = 16
+MULTIPART_BOUNDARY = 'qr-code-batch-boundary'
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 10000)
+
+STATUS_REASONS: dict[int, str] = {
+    100: 'Continue', 200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 408: 'Request Timeout',
+    413: 'Payload Too Large', 422: 'Unprocessable Entity', 431: 'Request Header Fields Too Large', 500: 'Internal Server Error',
+    501: 'Not Implemented', 503: 'Service Unavailable', 504: 'Gateway Timeout'
+}
+
+
+class _RequestError(Exception):
+    """ends the request with status and message as a text/plain response"""
+
+    def __init__(self, status: int, message: str, headers: dict[str, str] | None = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]  # lower case names
+    body: bytes
+    keep_alive: bool
+    version: str  # 'HTTP/1.1' or 'HTTP/1.0', a 1.0 client can't read a chunked response
+
+
+class ImageOptions(NamedTuple):
+    ec_level: ECCode | None
+    image_format: str
+    scale: int
+    quiet_zone: int
+
+
+class ServiceMetrics:
+    """request counts, latency histograms per endpoint and symbol throughput since the service started"""
+
+    def __init__(self) -> None:
+        self.started: float = time.monotonic()
+        self.connections: int = 0
+        self.open_connections: int = 0
+        self.reused_connections: int = 0  # requests that were not the first on their connection
+        self.symbols: int = 0
+        self.symbol_errors: int = 0
+        self.statuses: dict[int, int] = {}
+        # endpoint -> [requests, total seconds, max seconds, one count per bucket of LATENCY_BUCKETS_MS and one above]
+        self._latency: dict[str, list[float]] = {}
+
+    def record_request(self, endpoint: str, status: int, seconds: float) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        latency: list[float] | None = self._latency.get(endpoint)
+        if latency is None:
+            latency = self._latency[endpoint] = [0, 0.0, 0.0] + [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        latency[0] += 1
+        latency[1] += seconds
+        latency[2] = max(latency[2], seconds)
+        milliseconds: float = seconds * 1000
+        bucket: int = next((i for i, limit in enumerate(LATENCY_BUCKETS_MS) if milliseconds <= limit), len(LATENCY_BUCKETS_MS))
+        latency[3 + bucket] += 1
+
+    def record_symbol(self, ok: bool) -> None:
+        if ok:
+            self.symbols += 1
+        else:
+            self.symbol_errors += 1
+
+    def snapshot(self, generator: AsyncGenerator | None = None) -> dict[str, Any]:
+        uptime: float = time.monotonic() - self.started
+        endpoints: dict[str, Any] = {}
+        for endpoint, latency in self._latency.items():
+            buckets: dict[str, int] = {f'le_{limit}ms': int(count) for limit, count in zip(LATENCY_BUCKETS_MS, latency[3:])}
+            buckets['above'] = int(latency[-1])
+            endpoints[endpoint] = {'requests': int(latency[0]), 'mean_ms': latency[1] / latency[0] * 1000,
+                                   'max_ms': latency[2] * 1000, 'buckets': buckets}
+        snapshot: dict[str, Any] = {
+            'uptime_seconds': uptime, 'connections': self.connections, 'open_connections': self.open_connections,
+            'reused_connections': self.reused_connections, 'requests': sum(self.statuses.values()),
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())}, 'symbols': self.symbols,
+            'symbol_errors': self.symbol_errors, 'symbols_per_second': self.symbols / uptime if uptime else 0.0,
+            'endpoints': endpoints
+        }
+        if generator is not None:
+            snapshot['queued'] = generator.queued
+            if generator.cache is not None:
+                snapshot['cache'] = generator.cache.stats()
+        return snapshot
+
+
+def _get_query_int(query: dict[str, str], name: str, default: int, low: int, high: int) -> int:
+    try:
+        value: int = int(query.get(name, default))
+    except ValueError:
+        raise _RequestError(400, f'{name} must be an integer') from None
+    if not low <= value <= high:
+        raise _RequestError(400, f'{name} must be between {low} and {high}')
+    return value
+
+
+def parse_image_options(query: dict[str, str]) -> ImageOptions:
+    ec_name: str | None = query.get('ec')
+    if ec_name is not None and ec_name.upper() not in ECCode.__members__:
+        raise _RequestError(400, f'ec must be one of {", ".join(ECCode.__members__)}')
+    image_format: str = query.get('format', 'png')
+    if image_format not in WRITERS:
+        raise _RequestError(400, f'format must be one of {", ".join(WRITERS)}')
+    return ImageOptions(None if ec_name is None else ECCode[ec_name.upper()], image_format,
+                        _get_query_int(query, 'scale', 4, 1, MAX_SCALE),
+                        _get_query_int(query, 'quiet_zone', 4, 0, MAX_QUIET_ZONE))
+
+
+def parse_batch_messages(body: bytes) -> list[str]:
+    """the messages of a batch body, a JSON list of strings or an object with one under "messages" """
+    try:
+        data: Any = json.loads(body)
+    except (UnicodeDecodeError, ValueError):
+        raise _RequestError(400, 'the body must be JSON') from None
+    messages: Any = data.get('messages') if isinstance(data, dict) else data
+    if not isinstance(messages, list) or not all(isinstance(message, str) for message in messages):
+        raise _RequestError(400, 'expected a JSON list of strings or {"messages": [...]}')
+    if len(messages) > MAX_BATCH_MESSAGES:
+        raise _RequestError(413, f'a batch holds at most {MAX_BATCH_MESSAGES} messages')
+    return messages
+
+
+def _get_error_status(error: Exception) -> int:
+    if isinstance(error, DataLimitExceededError):
+        return 422
+    if isinstance(error, QueueFullError):
+        return 503
+    if isinstance(error, asyncio.TimeoutError):
+        return 504
+    return 500
+
+
+def _multipart_part(headers: dict[str, str], data: bytes) -> bytes:
+    head: str = ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+    return f'--{MULTIPART_BOUNDARY}\r\n{head}\r\n'.encode('latin-1') + data + b'\r\n'
+
+
+class QRCodeServer:
+    """
+    HTTP/1.1 server around generator (an AsyncGenerator with a SymbolCache when not given). timeout limits the seconds
+    one symbol may take, queueing for a worker included. read_timeout limits the seconds from a new connection to its
+    first request line and from any request line to the end of its body, so slow or silent clients can't hold a handler
+    """
+
+    def __init__(self, generator: AsyncGenerator | None = None, timeout: float | None = 30.0,
+                 keep_alive_timeout: float = KEEP_ALIVE_TIMEOUT, read_timeout: float = READ_TIMEOUT) -> None:
+        self.generator: AsyncGenerator = generator if generator is not None else AsyncGenerator(cache=SymbolCache())
+        self.timeout = timeout
+        self.keep_alive_timeout = keep_alive_timeout
+        self.read_timeout = read_timeout
+        self.metrics = ServiceMetrics()
+        self._server: asyncio.Server | None = None
+        self._connections: dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._idle: set[asyncio.Task] = set()  # connections waiting for their next request
+        self._closing: bool = False
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> tuple[str, int]:
+        """starts the workers, then listens and returns the address, port 0 picks a free port"""
+        await self.generator.start()  # before any socket is open, the workers must not inherit one
+        self._server = await asyncio.start_server(self._handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self, grace_period: float = 5.0) -> None:
+        """stops listening, gives open requests grace_period seconds to finish and closes every connection"""
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for task in self._idle:
+            self._connections[task].close()  # ends the handler's read, handlers are never cancelled
+        if self._connections:
+            await asyncio.wait(list(self._connections), timeout=grace_period)
+        for writer in self._connections.values():
+            writer.close()
+        if self._connections:
+            await asyncio.wait(list(self._connections))
+        self.generator.close()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task: asyncio.Task = asyncio.current_task()
+        self._connections[task] = writer
+        self.metrics.connections += 1
+        self.metrics.open_connections += 1
+        first: bool = True
+        try:
+            while not self._closing:
+                self._idle.add(task)
+                try:
+                    request: Request | None = await self._read_request(reader, writer, first)
+                except _RequestError as e:
+                    await self._write_error(writer, e, keep_alive=False)
+                    self.metrics.record_request('invalid', e.status, 0.0)
+                    break
+                finally:
+                    self._idle.discard(task)
+                if request is None:
+                    break
+                if not first:
+                    self.metrics.reused_connections += 1
+                first = False
+                if not await self._handle_request(request, writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # the client went away
+        finally:
+            self.metrics.open_connections -= 1
+            del self._connections[task]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, first: bool) -> Request | None:
+        """
+        the next request on the connection, None when the client closed it or sent nothing in time (read_timeout for a
+        new connection, keep_alive_timeout between requests). the rest of the request has to arrive within read_timeout
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            line: bytes = await asyncio.wait_for(reader.readline(), self.read_timeout if first else self.keep_alive_timeout)
+        except asyncio.TimeoutError:
+            return None
+        except ValueError:  # longer than the stream limit
+            raise _RequestError(431, 'request line too long') from None
+        if not line.strip():
+            return None
+        deadline: float = loop.time() + self.read_timeout
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise _RequestError(400, 'malformed request line') from None
+        headers: dict[str, str] = {}
+        header_bytes: int = 0
+        while True:
+            try:
+                line = await asyncio.wait_for(reader.readline(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                raise _RequestError(408, 'the headers took too long') from None
+            except ValueError:
+                raise _RequestError(431, 'header line too long') from None
+            header_bytes += len(line)
+            if header_bytes > MAX_HEADER_BYTES:
+                raise _RequestError(431, 'headers too long')
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'transfer-encoding' in headers:
+            raise _RequestError(501, 'chunked request bodies are not supported, send a Content-Length')
+        try:
+            length: int = int(headers.get('content-length', 0))
+        except ValueError:
+            raise _RequestError(400, 'malformed Content-Length') from None
+        if length > MAX_BODY_BYTES:
+            raise _RequestError(413, f'the body is limited to {MAX_BODY_BYTES} bytes')
+        if length and headers.get('expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        body: bytes = b''
+        if length:
+            try:
+                body = await asyncio.wait_for(reader.readexactly(length), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                raise _RequestError(408, 'the body took too long') from None
+
+        connection: str = headers.get('connection', '').lower()
+        keep_alive: bool = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        url = urlsplit(target)
+        query: dict[str, str] = {name: values[-1] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+        return Request(method.upper(), url.path, query, headers, body, keep_alive, version)
+
+    async def _handle_request(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """answers request, returns whether the connection stays open"""
+        start: float = time.perf_counter()
+        endpoint: str = request.path if request.path in ('/symbol', '/batch', '/metrics') else 'other'
+        keep_alive: bool = request.keep_alive
+        try:
+            match request.path, request.method:
+                case '/symbol', 'GET':
+                    await self._handle_symbol(request, writer)
+                case '/batch', 'POST':
+                    keep_alive = await self._handle_batch(request, writer)
+                case '/metrics', 'GET':
+                    body: bytes = json.dumps(self.metrics.snapshot(self.generator), indent=1).encode()
+                    self._write_head(writer, 200, {'Content-Type': 'application/json', 'Content-Length': str(len(body))},
+                                     request.keep_alive)
+                    writer.write(body)
+                case ('/symbol' | '/metrics'), _:
+                    raise _RequestError(405, 'use GET', {'Allow': 'GET'})
+                case '/batch', _:
+                    raise _RequestError(405, 'use POST', {'Allow': 'POST'})
+                case _:
+                    raise _RequestError(404, f'no endpoint {request.path}')
+            status: int = 200
+        except _RequestError as e:
+            await self._write_error(writer, e, request.keep_alive)
+            status = e.status
+        await writer.drain()
+        self.metrics.record_request(endpoint, status, time.perf_counter() - start)
+        return keep_alive
+
+    async def _handle_symbol(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        message: str | None = request.query.get('data')
+        if message is None:
+            raise _RequestError(400, 'missing the data parameter')
+        options: ImageOptions = parse_image_options(request.query)
+        try:
+            image: bytes = await self.generator.generate(message, options.ec_level, options.image_format, options.scale,
+                                                         options.quiet_zone, self.timeout)
+        except Exception as e:
+            self.metrics.record_symbol(False)
+            headers: dict[str, str] = {'Retry-After': '1'} if isinstance(e, QueueFullError) else {}
+            raise _RequestError(_get_error_status(e), str(e) or type(e).__name__, headers) from e
+        self.metrics.record_symbol(True)
+        self._write_head(writer, 200, {'Content-Type': CONTENT_TYPES[options.image_format], 'Content-Length': str(len(image))},
+                         request.keep_alive)
+        writer.write(image)
+
+    async def _handle_batch(self, request: Request, writer: asyncio.StreamWriter) -> bool:
+        """
+        streams the images of a batch, chunked for HTTP/1.1. an HTTP/1.0 response is not framed and its end is the end of
+        the connection, returns whether the connection stays open
+        """
+        options: ImageOptions = parse_image_options(request.query)
+        messages: list[str] = parse_batch_messages(request.body)
+        archive: str = request.query.get('archive') or ('tar' if 'application/x-tar' in request.headers.get('accept', '')
+                                                        else 'multipart')
+        if archive not in ('multipart', 'tar'):
+            raise _RequestError(400, 'archive must be multipart or tar')
+        if self.generator.queued >= self.generator.max_queued:
+            raise _RequestError(503, 'too many requests are waiting for a worker', {'Retry-After': '1'})
+
+        content_type: str = 'application/x-tar' if archive == 'tar' else f'multipart/mixed; boundary={MULTIPART_BOUNDARY}'
+        chunked: bool = request.version != 'HTTP/1.0'
+        keep_alive: bool = request.keep_alive and chunked
+        headers: dict[str, str] = {'Content-Type': content_type}
+        if chunked:
+            headers['Transfer-Encoding'] = 'chunked'
+        self._write_head(writer, 200, headers, keep_alive)
+        write = self._write_chunk if chunked else self._write_unframed
+        async for index, result in self._iter_images(messages, options):
+            if archive == 'tar':
+                chunk: bytes = (tar_member(f'{index:05d}.{options.image_format}', result) if isinstance(result, bytes) else
+                                tar_member(f'{index:05d}.error.txt', str(result).encode()))
+            elif isinstance(result, bytes):
+                chunk = _multipart_part({'Content-Type': CONTENT_TYPES[options.image_format], 'X-Index': str(index)}, result)
+            else:
+                chunk = _multipart_part({'Content-Type': 'text/plain; charset=utf-8', 'X-Index': str(index),
+                                         'X-Status': str(_get_error_status(result))}, str(result).encode())
+            write(writer, chunk)
+            await writer.drain()  # a slow client holds the batch back instead of filling memory
+        write(writer, TAR_END if archive == 'tar' else f'--{MULTIPART_BOUNDARY}--\r\n'.encode('latin-1'))
+        if chunked:
+            writer.write(b'0\r\n\r\n')
+        return keep_alive
+
+    async def _iter_images(self, messages: list[str], options: ImageOptions) -> AsyncIterator[tuple[int, bytes | Exception]]:
+        """yields (index, image or the exception) in message order, keeping max_concurrency symbols in flight"""
+        pending: deque[asyncio.Task] = deque()
+        try:
+            for index, message in enumerate(messages):
+                pending.append(asyncio.ensure_future(self._generate_or_error(message, options)))
+                if len(pending) >= self.generator.max_concurrency:
+                    yield index - len(pending) + 1, await pending.popleft()
+            first: int = len(messages) - len(pending)
+            for offset in range(len(pending)):
+                yield first + offset, await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _generate_or_error(self, message: str, options: ImageOptions) -> bytes | Exception:
+        try:
+            image: bytes = await self.generator.generate(message, options.ec_level, options.image_format, options.scale,
+                                                         options.quiet_zone, self.timeout)
+        except Exception as e:
+            self.metrics.record_symbol(False)
+            return e
+        self.metrics.record_symbol(True)
+        return image
+
+    @staticmethod
+    def _write_head(writer: asyncio.StreamWriter, status: int, headers: dict[str, str], keep_alive: bool) -> None:
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        head: str = f'HTTP/1.1 {status} {STATUS_REASONS[status]}\r\n'
+        writer.write((head + ''.join(f'{name}: {value}\r\n' for name, value in headers.items()) + '\r\n').encode('latin-1'))
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(b'%x\r\n' % len(data) + data + b'\r\n')
+
+    @staticmethod
+    def _write_unframed(writer: asyncio.StreamWriter, data: bytes) -> None:
+        writer.write(data)
+
+    async def _write_error(self, writer: asyncio.StreamWriter, error: _RequestError, keep_alive: bool) -> None:
+        body: bytes = f'{error}\n'.encode()
+        self._write_head(writer, error.status, {**error.headers, 'Content-Type': 'text/plain; charset=utf-8',
+                                                'Content-Length': str(len(body))}, keep_alive)
+        writer.write(body)
+        await writer.drain()
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = 4, max_queued: int = DEFAULT_MAX_QUEUED,
+                cache_bytes: int = 64 << 20, cache_directory: str | None = None, timeout: float | None = 30.0) -> None:
+    generator = AsyncGenerator(max_concurrency=workers, max_queued=max_queued,
+                               cache=SymbolCache(cache_bytes, cache_directory))
+    server = QRCodeServer(generator, timeout)
+    address: tuple[str, int] = await server.start(host, port)
+    print(f'serving on http://{address[0]}:{address[1]}/', flush=True)
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
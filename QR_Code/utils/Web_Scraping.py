@@ -86,7 +86,8 @@ def get_codewords_and_block_info():
         )
 
 
-# extract_character_capacities_from_web()
-# get_total_data_codewords_from_web()
-# get_total_codewords_from_web()
-get_codewords_and_block_info()
+if __name__ == '__main__':
+    # extract_character_capacities_from_web()
+    # get_total_data_codewords_from_web()
+    # get_total_codewords_from_web()
+    get_codewords_and_block_info()
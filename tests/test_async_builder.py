@@ -0,0 +1,158 @@
+"""
+the event loop stays responsive while AsyncGenerator builds large symbols, and its slots and queue hold through full
+queues, timeouts and cancellations
+"""
+from __future__ import annotations
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+import pytest
+from QR_Code.builder import Async_Builder
+from QR_Code.builder.Async_Builder import AsyncGenerator
+from QR_Code.builder.Symbol_Cache import SymbolCache
+from QR_Code.utils.Exceptions import QueueFullError
+
+MAX_LOOP_LAG = 0.1  # seconds, a single v30+ build on the loop takes more than twice this
+MESSAGES = [f'https://www.qrcode.com/{i}/' + 'x' * 1500 for i in range(8)]
+
+
+async def measure_loop_lag(messages: Iterable[str], generator: AsyncGenerator, interval: float = 0.005) -> tuple[float, int]:
+    """
+    runs generate_many next to a ticker that wakes up every interval seconds, returns the longest the ticker was late (in
+    seconds) and the number of images. a responsive loop stays within a few milliseconds of interval however big the batch
+    """
+    loop = asyncio.get_running_loop()
+    worst: float = 0.0
+    done = asyncio.Event()
+
+    async def ticker() -> None:
+        nonlocal worst
+        while not done.is_set():
+            start: float = loop.time()
+            await asyncio.sleep(interval)
+            worst = max(worst, loop.time() - start - interval)
+
+    ticking = asyncio.ensure_future(ticker())
+    try:
+        images: list = await generator.generate_many(messages)
+    finally:
+        done.set()
+        await ticking
+    return worst, len(images)
+
+
+def run_with_lag(cache: SymbolCache | None = None) -> tuple[float, int]:
+    async def main() -> tuple[float, int]:
+        async with AsyncGenerator(max_concurrency=2, cache=cache) as generator:
+            await generator.generate('warm up')
+            return await measure_loop_lag(MESSAGES, generator)
+
+    return asyncio.run(main())
+
+
+def test_loop_lag_stays_under_limit():
+    lag, count = run_with_lag()
+    assert count == len(MESSAGES)
+    assert lag < MAX_LOOP_LAG, f'event loop was {lag * 1000:.0f}ms late'
+
+
+def test_loop_lag_with_disk_cache_stays_under_limit():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SymbolCache(directory=directory)
+        run_with_lag(cache)  # fills the disk tier
+        cache = SymbolCache(directory=directory)  # empty memory tier, every get reads the disk
+        lag, count = run_with_lag(cache)
+    assert count == len(MESSAGES)
+    assert lag < MAX_LOOP_LAG, f'event loop was {lag * 1000:.0f}ms late'
+
+
+class BlockedBuilds:
+    """stands in for build_and_render on a thread pool, the build of a message waits until the message is released"""
+
+    def __init__(self) -> None:
+        self._gates: dict[str, threading.Event] = {}
+
+    def _gate(self, message: str) -> threading.Event:
+        return self._gates.setdefault(message, threading.Event())
+
+    def __call__(self, message: str, *args) -> tuple[None, bytes]:
+        self._gate(message).wait(10)
+        return None, message.encode()
+
+    def release(self, *messages: str) -> None:
+        for message in messages:
+            self._gate(message).set()
+
+
+@pytest.fixture
+def blocked_builds(monkeypatch) -> BlockedBuilds:
+    builds = BlockedBuilds()
+    monkeypatch.setattr(Async_Builder, 'build_and_render', builds)
+    return builds
+
+
+async def wait_until(condition: Callable[[], bool]) -> None:
+    for _ in range(1000):
+        if condition():
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError('condition never became true')
+
+
+def run_on_threads(test: Callable[[AsyncGenerator], object], max_concurrency: int = 1, max_queued: int = 2) -> None:
+    executor = ThreadPoolExecutor(max_concurrency)
+    try:
+        asyncio.run(test(AsyncGenerator(executor, max_concurrency, max_queued)))
+    finally:
+        executor.shutdown()
+
+
+def test_full_queue_is_refused(blocked_builds):
+    async def test(generator: AsyncGenerator) -> None:
+        tasks: list[asyncio.Task] = [asyncio.ensure_future(generator.generate(message)) for message in 'abc']
+        await wait_until(lambda: generator.queued == 2)  # a runs, b and c wait for its slot
+        with pytest.raises(QueueFullError):
+            await generator.generate('d')
+        blocked_builds.release('a', 'b', 'c')
+        assert await asyncio.gather(*tasks) == [b'a', b'b', b'c']
+        blocked_builds.release('d')
+        assert await generator.generate('d') == b'd'  # room again once the queue drained
+
+    run_on_threads(test)
+
+
+def test_timeout(blocked_builds):
+    async def test(generator: AsyncGenerator) -> None:
+        with pytest.raises(TimeoutError):
+            await generator.generate('running', timeout=0.05)
+        with pytest.raises(TimeoutError):  # the build that timed out still holds the only slot
+            await generator.generate('waiting', timeout=0.05)
+        assert generator.queued == 0
+        blocked_builds.release('running', 'waiting')
+        assert await generator.generate('waiting', timeout=5) == b'waiting'
+
+    run_on_threads(test)
+
+
+def test_cancelled_requests_give_their_slot_back(blocked_builds):
+    async def test(generator: AsyncGenerator) -> None:
+        running = asyncio.ensure_future(generator.generate('running'))
+        waiting = asyncio.ensure_future(generator.generate('waiting'))
+        await wait_until(lambda: generator.queued == 1)
+        waiting.cancel()
+        running.cancel()
+        await asyncio.gather(running, waiting, return_exceptions=True)
+        assert generator.queued == 0
+        blocked_builds.release('running', 'next')  # the cancelled build finishes on the executor and frees the slot
+        assert await generator.generate('next', timeout=5) == b'next'
+        assert await generator.generate_many(['next', 'next'], timeout=5) == [b'next', b'next']
+
+    run_on_threads(test)
+
+
+@pytest.mark.parametrize('max_concurrency', [0, -1])
+def test_no_slots_is_refused(max_concurrency):
+    with pytest.raises(ValueError, match='max_concurrency'):
+        AsyncGenerator(max_concurrency=max_concurrency)
@@ -0,0 +1,32 @@
+"""BatchBuilder keeps working after its pool lost a worker"""
+from __future__ import annotations
+import os
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from QR_Code.builder.Batch import BatchBuilder, build_one
+from QR_Code.utils.Classes import ECCode
+
+MESSAGES = ['HELLO WORLD', 'https://www.qrcode.com/', 'x' * 5000, 'HELLO WORLD']
+
+
+def kill_worker(builder: BatchBuilder) -> None:
+    with pytest.raises(BrokenProcessPool):
+        builder._executor.submit(os._exit, 1).result()
+
+
+def test_build_many_matches_build_one():
+    with BatchBuilder(2) as builder:
+        results = builder.build_many(MESSAGES, ECCode.M)
+    assert [result.matrix for result in results] == [build_one(message, ECCode.M).matrix for message in MESSAGES]
+    assert [result.ok for result in results] == [True, True, False, True]
+
+
+def test_pool_is_replaced_after_a_worker_died():
+    with BatchBuilder(2) as builder:
+        expected = builder.build_many(MESSAGES, ECCode.M)
+        broken_pool = builder._executor
+        kill_worker(builder)
+        assert [result.matrix for result in builder.build_many(MESSAGES, ECCode.M)] == [r.matrix for r in expected]
+        assert builder._executor is not broken_pool
+        kill_worker(builder)
+        assert [result.matrix for result in builder.build_many(MESSAGES, ECCode.M)] == [r.matrix for r in expected]
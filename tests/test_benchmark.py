@@ -0,0 +1,44 @@
+"""compare_with_baseline only compares runs that measured the same work, and the corpus covers every mode"""
+from __future__ import annotations
+from typing import Any
+import pytest
+from QR_Code.processing.Segmentation import plan_symbol
+from QR_Code.utils.Benchmark import PAYLOAD_CORPUS, STAGES, compare_with_baseline, make_payload
+from QR_Code.utils.Classes import ECCode, EncodingMode
+
+
+def make_run(engine: str = 'list', versions: range = range(1, 3), stage_us: float = 100.0) -> dict[str, Any]:
+    return {'meta': {'engine': engine}, 'results': [
+        {'version': version, 'ec_level': 'L', 'payload': 'numeric', 'stage_us': dict.fromkeys(STAGES, stage_us)}
+        for version in versions
+    ]}
+
+
+def test_regression_is_reported():
+    assert compare_with_baseline(make_run(), make_run()) == []
+    assert len(compare_with_baseline(make_run(stage_us=10_000.0), make_run())) == len(STAGES)
+
+
+def test_different_engine_is_refused():
+    with pytest.raises(ValueError, match='engine'):
+        compare_with_baseline(make_run(engine='array'), make_run())
+
+
+def test_different_grid_is_refused():
+    with pytest.raises(ValueError, match='grid'):
+        compare_with_baseline(make_run(versions=range(1, 4)), make_run())
+
+
+def test_stage_missing_from_baseline_is_skipped():
+    baseline: dict[str, Any] = make_run()
+    for record in baseline['results']:
+        del record['stage_us']['mode_detection']  # saved before the stage was timed on its own
+    regressions: list[str] = compare_with_baseline(make_run(stage_us=10_000.0), baseline)
+    assert len(regressions) == len(STAGES) - 1 and not any(line.startswith('mode_detection') for line in regressions)
+
+
+def test_corpus_covers_every_mode():
+    modes: set[str] = set()
+    for name in PAYLOAD_CORPUS:
+        modes.update(segment.mode.name for segment in plan_symbol(make_payload(name, 10, ECCode.M), ECCode.M).segments)
+    assert modes == {mode.name for mode in EncodingMode}
@@ -0,0 +1,119 @@
+"""BitWriter and BitReader against a bit string model, for odd field widths and the byte aligned fast paths"""
+from __future__ import annotations
+import random
+import pytest
+from QR_Code.processing.Bit_Writer import FLUSH_FIELDS, BitReader, BitWriter
+from QR_Code.utils.Exceptions import DataLimitExceededError, DecodingError
+
+
+def to_bytes(bits: str) -> bytes:
+    return int(bits, 2).to_bytes(len(bits) // 8, 'big') if bits else b''
+
+
+def random_operations(rng: random.Random, capacity: int) -> list[tuple]:
+    """('fields', values, length) and ('bytes', data) operations that fill at most capacity bytes"""
+    operations: list[tuple] = []
+    bits: int = 0
+    while True:
+        if rng.random() < 0.3:
+            data: bytes = bytes(rng.randrange(256) for _ in range(rng.choice((1, 3, 17, 200))))
+            operation: tuple = ('bytes', data)
+            size: int = len(data) * 8
+        else:
+            length: int = rng.choice((1, 3, 4, 7, 8, 10, 11, 13, 16, 23))
+            values: list[int] = [rng.randrange(1 << length) for _ in range(rng.choice((1, 2, 5, FLUSH_FIELDS + 3, 150)))]
+            operation = ('fields', values, length)
+            size = len(values) * length
+        if bits + size > capacity * 8:
+            return operations
+        operations.append(operation)
+        bits += size
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_round_trip(seed):
+    rng = random.Random(seed)
+    capacity: int = rng.choice((16, 300, 3000))
+    operations: list[tuple] = random_operations(rng, capacity)
+    writer = BitWriter(capacity)
+    model: list[str] = []
+    for operation in operations:
+        if operation[0] == 'bytes':
+            writer.write_bytes(operation[1])
+            model.extend(format(byte, '08b') for byte in operation[1])
+        elif len(operation[1]) == 1 and rng.random() < 0.5:
+            writer.write(operation[1][0], operation[2])
+            model.append(format(operation[1][0], f'0{operation[2]}b'))
+        else:
+            writer.write_fields(operation[1], operation[2])
+            model.extend(format(value, f'0{operation[2]}b') for value in operation[1])
+        assert writer.bit_length == sum(map(len, model))
+    bits: str = ''.join(model)
+    writer.align()
+    bits += '0' * (-len(bits) % 8)
+    assert writer.getvalue() == to_bytes(bits)
+
+    reader = BitReader(writer.getvalue())
+    for operation in operations:
+        if operation[0] == 'bytes':
+            assert reader.read_bytes(len(operation[1])) == operation[1]
+        elif len(operation[1]) == 1:
+            assert reader.read(operation[2]) == operation[1][0]
+        else:
+            assert reader.read_fields(len(operation[1]), operation[2]) == operation[1]
+    assert reader.remaining_bits == -len(''.join(model)) % 8
+
+
+@pytest.mark.parametrize('offset', range(8))
+def test_write_bytes_at_every_bit_offset(offset):
+    data: bytes = bytes(range(1, 40))
+    writer = BitWriter(48)
+    writer.write(0b1010101 >> (7 - offset) if offset else 0, offset)
+    writer.write_bytes(data)
+    writer.write_bytes(b'\xff')
+    bits: str = format(0b1010101 >> (7 - offset), f'0{offset}b') if offset else ''
+    bits += ''.join(format(byte, '08b') for byte in data + b'\xff')
+    writer.align()
+    assert writer.getvalue() == to_bytes(bits + '0' * (-len(bits) % 8))
+    reader = BitReader(writer.getvalue())
+    reader.read(offset)
+    assert reader.read_bytes(len(data)) == data  # the unaligned path unless offset is 0
+    assert reader.read_bytes(1) == b'\xff'
+
+
+def test_fill_pads_with_the_pattern():
+    writer = BitWriter(8)
+    writer.write(0b101, 3)
+    writer.fill(b'\xec\x11')
+    assert writer.getvalue() == b'\xa0\xec\x11\xec\x11\xec\x11\xec'
+    assert writer.bit_length == writer.capacity_bits
+
+
+def test_bits_above_length_are_dropped():
+    writer = BitWriter(3)
+    writer.write(1, 1)
+    writer.write(0x1FF, 8)
+    writer.write_fields([0x12, 0x3F], 5)
+    writer.align()
+    assert writer.getvalue() == to_bytes('1' + '11111111' + '10010' + '11111' + '00000')
+
+
+def test_capacity_is_enforced():
+    writer = BitWriter(2)
+    writer.write_fields([1] * 5, 3)
+    with pytest.raises(DataLimitExceededError):
+        writer.write(0, 2)
+    with pytest.raises(DataLimitExceededError):
+        writer.write_bytes(b'\x00')
+    writer.write(1, 1)
+    assert writer.getvalue() == to_bytes('001' * 5 + '1')
+
+
+def test_reading_past_the_end():
+    reader = BitReader(b'\xab\xcd')
+    assert reader.read(4) == 0xa
+    with pytest.raises(DecodingError):
+        reader.read_bytes(2)
+    assert reader.read_fields(3, 4) == [0xb, 0xc, 0xd]
+    with pytest.raises(DecodingError):
+        reader.read(1)
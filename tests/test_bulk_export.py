@@ -0,0 +1,202 @@
+"""a bulk export that is killed and resumed writes the same output as one that ran through"""
+from __future__ import annotations
+import csv
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import zipfile
+import pytest
+from QR_Code.utils.Bulk_Export import ExportOptions, export, get_checkpoint_path
+from QR_Code.utils.Classes import ECCode
+
+ROWS = 250
+SHARD_SIZE = 100
+CHUNK_SIZE = 16  # shard 0 takes 7 writes, the 8th is the first of shard 1
+PROJECT_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs an export in another process and kills that process right after its kill_at-th shard write
+KILLED_EXPORT = '''
+import json, os
+from QR_Code.utils import Bulk_Export
+from QR_Code.utils.Classes import ECCode
+options = Bulk_Export.ExportOptions(**json.loads({options!r}))
+options = options._replace(ec_level=ECCode[options.ec_level])
+writer = Bulk_Export.SHARD_WRITERS[options.output_kind]
+original_write = writer.write
+calls = 0
+
+def write(self, members):
+    global calls
+    failed = original_write(self, members)
+    calls += 1
+    if calls == {kill_at}:  # what was written since the checkpoint reached the disk, the next checkpoint did not
+        stream = self._zip.fp if hasattr(self, '_zip') else getattr(self, '_file', None)
+        if stream is not None:
+            stream.flush()
+        os._exit(9)
+    return failed
+
+writer.write = write
+Bulk_Export.export(options, workers=1, chunk_size={chunk_size}, checkpoint_seconds=0, progress=False)
+'''
+
+
+def get_name(i: int) -> str:
+    if i == 30:
+        return '../escape'
+    if i == 140:
+        return 'SN000139'  # the name of the row before it
+    if i == 180:
+        return 'SN000150'  # from before the checkpoint a run killed at the 12th write resumes at
+    if i == 230:
+        return 'n' * 300
+    return f'SN{i:06d}'
+
+
+def write_input(directory: str) -> str:
+    path: str = os.path.join(directory, 'labels.csv')
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['serial', 'message'])
+        writer.writerows((get_name(i), f'https://example.com/p/{i}' if i % 97 != 5 else 'x' * 3000) for i in range(ROWS))
+    return path
+
+
+def get_options(directory: str, kind: str, scale: int = 2) -> ExportOptions:
+    output: str = os.path.join(directory, {'tar': 'labels.tar', 'zip': 'labels.zip', 'dir': 'labels'}[kind])
+    return ExportOptions(write_input(directory), output, kind, None, 'serial', ECCode.M, 'pbm', scale, 4, SHARD_SIZE)
+
+
+def run_killed(options: ExportOptions, kill_at: int) -> None:
+    script: str = KILLED_EXPORT.format(options=json.dumps(options.to_json()), kill_at=kill_at, chunk_size=CHUNK_SIZE)
+    result = subprocess.run([sys.executable, '-c', script], env=dict(os.environ, PYTHONPATH=PROJECT_ROOT), timeout=300)
+    assert result.returncode == 9
+
+
+def read_output(options: ExportOptions) -> list[tuple[str, bytes]]:
+    """every image as (shard/name, data) in the order they were written, then the errors file. archives are read back
+    rather than compared as bytes, the timestamps in them differ from run to run"""
+    directory: str = os.path.dirname(options.output_path)
+    files: list[tuple[str, bytes]] = []
+    for name in sorted(os.listdir(directory)):
+        path: str = os.path.join(directory, name)
+        assert not name.endswith(('.partial', '.tmp')), name
+        if options.output_kind == 'tar' and name.endswith('.tar'):
+            with tarfile.open(path) as tar:
+                files.extend((f'{name}/{member.name}', tar.extractfile(member).read()) for member in tar.getmembers())
+        elif options.output_kind == 'zip' and name.endswith('.zip'):
+            with zipfile.ZipFile(path) as archive:
+                files.extend((f'{name}/{member}', archive.read(member)) for member in archive.namelist())
+        elif options.output_kind == 'dir' and name == 'labels':
+            for root, _, names in sorted(os.walk(path)):
+                for file_name in sorted(names):
+                    with open(os.path.join(root, file_name), 'rb') as f:
+                        files.append((os.path.relpath(os.path.join(root, file_name), directory), f.read()))
+    with open(options.output_path + '.errors.jsonl', 'rb') as f:
+        files.append(('errors', f.read()))
+    return files
+
+
+@pytest.fixture(scope='module')
+def uninterrupted(tmp_path_factory) -> dict[str, list[tuple[str, bytes]]]:
+    outputs: dict[str, list[tuple[str, bytes]]] = {}
+    for kind in ('tar', 'zip', 'dir'):
+        options: ExportOptions = get_options(str(tmp_path_factory.mktemp(kind)), kind)
+        summary = export(options, workers=1, chunk_size=CHUNK_SIZE, progress=False)
+        assert summary.rows == ROWS and summary.resumed_at == 0
+        outputs[kind] = read_output(options)
+    return outputs
+
+
+def test_uninterrupted_output(uninterrupted):
+    tar_files: dict[str, bytes] = dict(uninterrupted['tar'])
+    assert len(tar_files) == len(uninterrupted['tar'])  # no name twice
+    errors: list[dict] = [json.loads(line) for line in tar_files['errors'].splitlines()]
+    assert [error['row'] for error in errors] == [5, 30, 102, 140, 180, 199, 230]
+    assert len(tar_files) == ROWS - len(errors) + 1
+    assert sorted({name.split('/')[0] for name in tar_files} - {'errors'}) == [f'labels-0000{i}.tar' for i in range(3)]
+    assert 'labels-00001.tar/SN000139.pbm' in tar_files and 'labels-00002.tar/SN000200.pbm' in tar_files
+    for kind in ('zip', 'dir'):
+        assert sorted(os.path.basename(name) for name, _ in uninterrupted[kind]) == sorted(map(os.path.basename, tar_files))
+
+
+@pytest.mark.parametrize('kind', ['tar', 'zip', 'dir'])
+@pytest.mark.parametrize('kill_at', [8, 12])
+def test_killed_export_resumes(tmp_path, uninterrupted, kind, kill_at):
+    options: ExportOptions = get_options(str(tmp_path), kind)
+    run_killed(options, kill_at)
+    assert os.path.exists(get_checkpoint_path(options.output_path))
+    summary = export(options, workers=1, chunk_size=CHUNK_SIZE, progress=False)
+    assert summary.rows == ROWS and 0 < summary.resumed_at < ROWS
+    assert read_output(options) == uninterrupted[kind]
+
+
+@pytest.mark.parametrize('kind', ['tar', 'zip', 'dir'])
+def test_interrupted_export_resumes(tmp_path, uninterrupted, monkeypatch, kind):
+    from QR_Code.utils import Bulk_Export
+    options: ExportOptions = get_options(str(tmp_path), kind)
+    writer: type = Bulk_Export.SHARD_WRITERS[kind]
+    original_write = writer.write
+    calls: list[int] = []
+
+    def write(self, members):
+        calls.append(len(members))
+        if len(calls) == 10:
+            raise KeyboardInterrupt
+        return original_write(self, members)
+
+    monkeypatch.setattr(writer, 'write', write)
+    with pytest.raises(KeyboardInterrupt):
+        export(options, workers=1, chunk_size=CHUNK_SIZE, progress=False)
+    monkeypatch.setattr(writer, 'write', original_write)
+    assert export(options, workers=1, chunk_size=CHUNK_SIZE, progress=False).rows == ROWS
+    assert read_output(options) == uninterrupted[kind]
+
+
+def test_resume_with_other_options_is_refused(tmp_path):
+    options: ExportOptions = get_options(str(tmp_path), 'tar')
+    run_killed(options, 3)
+    with pytest.raises(ValueError, match='other options'):
+        export(options._replace(scale=3), workers=1, progress=False)
+    assert export(options._replace(scale=3), workers=1, restart=True, progress=False).rows == ROWS
+
+
+def test_finished_export_is_not_run_again(tmp_path):
+    options: ExportOptions = get_options(str(tmp_path), 'dir')
+    export(options, workers=1, chunk_size=CHUNK_SIZE, progress=False)
+    assert export(options, workers=1, progress=False).seconds == 0.0
+
+
+def read_errors(options: ExportOptions) -> dict[int, str]:
+    with open(options.output_path + '.errors.jsonl') as f:
+        return {error['row']: error['error'] for error in map(json.loads, f)}
+
+
+def test_short_csv_row_is_a_failed_row(tmp_path):
+    source: str = os.path.join(str(tmp_path), 'labels.csv')
+    with open(source, 'w', newline='') as f:
+        f.write('serial,message\nSN1,first\nSN2\nSN3,third\n')
+    options = ExportOptions(source, os.path.join(str(tmp_path), 'labels'), 'dir', None, 'serial', ECCode.M, 'pbm', 1, 4,
+                            SHARD_SIZE)
+    summary = export(options, workers=1, progress=False)
+    assert summary.rows == 3 and summary.errors == 1
+    assert read_errors(options) == {1: "row has no 'message' field"}
+    assert sorted(os.listdir(os.path.join(options.output_path, '00000'))) == ['SN1.pbm', 'SN3.pbm']
+
+
+def test_bad_jsonl_lines_are_failed_rows(tmp_path):
+    source: str = os.path.join(str(tmp_path), 'labels.jsonl')
+    with open(source, 'w') as f:
+        f.write('"first"\n{"message": null}\n{"message": "third"\n[1, 2]\n{"text": "fifth"}\n{"message": "sixth"}\n')
+    options = ExportOptions(source, os.path.join(str(tmp_path), 'labels'), 'dir', None, None, ECCode.M, 'pbm', 1, 4,
+                            SHARD_SIZE)
+    summary = export(options, workers=1, progress=False)
+    assert summary.rows == 6 and summary.errors == 4
+    errors: dict[int, str] = read_errors(options)
+    assert sorted(errors) == [1, 2, 3, 4]
+    assert errors[1] == errors[4] == "row has no 'message' field"
+    assert errors[2].startswith('JSONDecodeError: ') and errors[3] == 'row is a JSON list, not a string or an object'
+    assert sorted(os.listdir(os.path.join(options.output_path, '00000'))) == ['000000000.pbm', '000000005.pbm']
+    assert export(options, workers=1, progress=False).rows == 6  # a rerun finds the finished checkpoint
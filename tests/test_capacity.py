@@ -0,0 +1,64 @@
+"""version selection at the exact edges of the data capacities"""
+from __future__ import annotations
+import pytest
+from QR_Code.processing.Capacity import DATA_BITS, EC_LEVELS_BY_REDUNDANCY, VERSION_RANGES, find_version, get_data_bits
+from QR_Code.processing.Segmentation import plan_symbol
+from QR_Code.processing.Sequencing import get_length_bits
+from QR_Code.utils.Classes import ECCode, EncodingMode
+from QR_Code.utils.Exceptions import DataLimitExceededError
+
+
+def max_digits(version: int, ec_level: ECCode) -> int:
+    """the most digits one numeric segment holds at version"""
+    bits: int = get_data_bits(version, ec_level) - 4 - get_length_bits(EncodingMode.NUMERIC, version)
+    return bits // 10 * 3 + (0, 0, 0, 0, 1, 1, 1, 2, 2, 2)[bits % 10]
+
+
+def test_data_bits_of_known_versions():
+    assert get_data_bits(1, ECCode.L) == 19 * 8 and get_data_bits(1, ECCode.H) == 9 * 8
+    assert get_data_bits(40, ECCode.L) == 2956 * 8 and get_data_bits(40, ECCode.H) == 1276 * 8
+
+
+@pytest.mark.parametrize('ec_level', list(ECCode))
+@pytest.mark.parametrize('first_version, last_version', VERSION_RANGES)
+def test_range_edges(ec_level, first_version, last_version):
+    for version in (first_version, last_version):
+        capacity: int = DATA_BITS[ec_level][version - 1]
+        assert find_version(capacity, ec_level, first_version, last_version) == (version, ec_level)
+        expected: tuple[int, ECCode] | None = (version + 1, ec_level) if version < last_version else None
+        assert find_version(capacity + 1, ec_level, first_version, last_version) == expected
+    assert find_version(1, ec_level, first_version, last_version) == (first_version, ec_level)
+
+
+@pytest.mark.parametrize('ec_level', list(ECCode))
+@pytest.mark.parametrize('version', [last_version for _, last_version in VERSION_RANGES])
+def test_plan_crosses_the_range_edges(ec_level, version):
+    digits: int = max_digits(version, ec_level)
+    assert plan_symbol('7' * digits, ec_level).version == version
+    if version < 40:
+        assert plan_symbol('7' * (digits + 1), ec_level).version == version + 1
+    else:
+        with pytest.raises(DataLimitExceededError):
+            plan_symbol('7' * (digits + 1), ec_level)
+
+
+def test_above_version_40():
+    assert find_version(DATA_BITS[ECCode.L][39] + 1) is None
+    assert plan_symbol('7' * 7089).version == 40
+    with pytest.raises(DataLimitExceededError):
+        plan_symbol('7' * 7090)
+    with pytest.raises(DataLimitExceededError):
+        plan_symbol('x' * 1274, ECCode.H)
+
+
+def test_most_redundant_level_that_fits():
+    assert plan_symbol('HELLO WORLD')[:2] == (1, ECCode.Q)
+    assert plan_symbol('1' * 17)[:2] == (1, ECCode.H)
+    assert plan_symbol('1' * 18)[:2] == (1, ECCode.Q)
+    for version in (1, 9, 10, 26, 27, 40):
+        for ec_level in EC_LEVELS_BY_REDUNDANCY:
+            capacity: int = DATA_BITS[ec_level][version - 1]
+            if version > 1 and capacity <= DATA_BITS[ECCode.L][version - 2]:
+                continue  # a smaller version holds it at level L
+            # every level more redundant than ec_level holds less at this version, so ec_level is the one picked
+            assert find_version(capacity) == (version, ec_level)
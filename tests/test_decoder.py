@@ -0,0 +1,104 @@
+"""built symbols decode back to their message, through damage up to what the EC codewords can correct"""
+from __future__ import annotations
+import importlib.util
+import random
+import pytest
+from QR_Code.builder.Decoder import MAX_FORMAT_ERRORS, check_round_trip, decode, decode_symbol
+from QR_Code.builder.Format_Info import FORMAT_WORDS, get_format_positions
+from QR_Code.builder.Placement import get_placement_index
+from QR_Code.builder.QRCodeBuilder import ENGINE_ARRAY, ENGINE_LIST, QRCodeBuilder
+from QR_Code.error_correction.Reed_Solomon import correct_block, rs_encode
+from QR_Code.processing.Sequencing import ALPHANUMERIC_CHARS, get_block_info
+from QR_Code.utils.Classes import ECCode
+from QR_Code.utils.Exceptions import DecodingError
+
+NUMPY_MISSING: bool = importlib.util.find_spec('numpy') is None
+ARRAY_ENGINE = pytest.param(ENGINE_ARRAY, marks=pytest.mark.skipif(NUMPY_MISSING, reason='the array engine needs numpy'),
+                            id=ENGINE_ARRAY)
+ALPHABETS = ['0123456789', ALPHANUMERIC_CHARS, ''.join(map(chr, range(32, 256))), 'カタログ番号漢字テスト 0123 ABC',
+             'ÄÖÜ€😀 abc', '0123456789ABCDEF hello, world']
+
+
+def random_messages(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    # at most 300 characters, which fit even as 4 byte UTF-8 at level H
+    return [''.join(rng.choices(rng.choice(ALPHABETS), k=rng.choice((1, 5, rng.randint(1, 120), rng.randint(100, 300)))))
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize('engine', [ENGINE_LIST, ARRAY_ENGINE])
+@pytest.mark.parametrize('seed, ec_level', list(enumerate([None, *ECCode])))
+def test_round_trip(engine, seed, ec_level):
+    assert check_round_trip(random_messages(30, seed), ec_level, engine) == []
+
+
+def damage_codewords(qr: QRCodeBuilder, codewords: list[int]) -> list[list[bool]]:
+    """a copy of the matrix with every bit of the given codewords (positions in the non-interleaved codewords) flipped"""
+    damaged: list[list[bool]] = [column[:] for column in qr.matrix]
+    placement = get_placement_index(qr.version, qr.ec_level, qr.size, qr._module_sequence)
+    for codeword in codewords:
+        for offset in placement[codeword * 8: codeword * 8 + 8]:
+            damaged[offset // qr.size][offset % qr.size] ^= True
+    return damaged
+
+
+def get_block_positions(qr: QRCodeBuilder, block: int) -> list[int]:
+    """the positions of the data and EC codewords of a block in the non-interleaved codewords"""
+    ec_per_block, block_sizes = get_block_info(qr.version, qr.ec_level)
+    data_start: int = sum(block_sizes[:block])
+    ec_start: int = sum(block_sizes) + block * ec_per_block
+    return list(range(data_start, data_start + block_sizes[block])) + list(range(ec_start, ec_start + ec_per_block))
+
+
+@pytest.mark.parametrize('message, ec_level', [('https://www.qrcode.com/' * 20, ECCode.M), ('HELLO WORLD', ECCode.H),
+                                               ('0' * 2000, ECCode.L)])
+def test_damaged_symbol_is_corrected(message, ec_level):
+    qr = QRCodeBuilder(message, ec_level)
+    rng = random.Random(len(message))
+    ec_per_block, block_sizes = get_block_info(qr.version, qr.ec_level)
+    wrong: list[int] = []
+    for block in range(len(block_sizes)):
+        wrong += rng.sample(get_block_positions(qr, block), ec_per_block // 2)
+    symbol = decode_symbol(damage_codewords(qr, wrong))
+    assert symbol.message == message and symbol.corrected_codewords == len(wrong)
+    assert (symbol.version, symbol.ec_level) == (qr.version, qr.ec_level)
+
+
+def test_too_many_wrong_codewords():
+    qr = QRCodeBuilder('https://www.qrcode.com/' * 20, ECCode.M)
+    ec_per_block: int = get_block_info(qr.version, qr.ec_level)[0]
+    with pytest.raises(DecodingError):
+        decode(damage_codewords(qr, get_block_positions(qr, 1)[:ec_per_block // 2 + 1]))
+
+
+def test_correct_block():
+    rng = random.Random(24)
+    for ec_count in (7, 10, 16, 22, 30):
+        data: bytes = bytes(rng.randrange(256) for _ in range(rng.randint(1, 120)))
+        block: bytes = data + rs_encode(data, ec_count)
+        for errors in range(ec_count // 2 + 1):
+            damaged = bytearray(block)
+            for position in rng.sample(range(len(block)), errors):
+                damaged[position] ^= rng.randrange(1, 256)
+            assert correct_block(damaged, ec_count) == errors
+            assert damaged == block
+
+
+def test_damaged_format_info():
+    qr = QRCodeBuilder('HELLO WORLD', ECCode.Q)
+    damaged: list[list[bool]] = [column[:] for column in qr.matrix]
+    positions: list[tuple[int, int]] = get_format_positions(qr.size)
+    for x, y in positions[0:3] + positions[20:23]:  # 3 wrong bits in each copy still leave the closest word right
+        damaged[x][y] ^= True
+    assert decode(damaged) == 'HELLO WORLD'
+    unreadable: int = next(word for word in range(1 << 15)
+                           if min((word ^ format_word).bit_count() for format_word in FORMAT_WORDS) > MAX_FORMAT_ERRORS)
+    for i, (x, y) in enumerate(positions):
+        damaged[x][y] = bool(unreadable >> (14 - i % 15) & 1)
+    with pytest.raises(DecodingError, match='format info'):
+        decode(damaged)
+
+
+def test_not_a_symbol():
+    with pytest.raises(DecodingError, match='size'):
+        decode([[False] * 22 for _ in range(22)])
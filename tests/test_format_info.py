@@ -0,0 +1,58 @@
+"""the format and version information tables against the values listed in ISO/IEC 18004 annex C and D"""
+from __future__ import annotations
+import pytest
+from QR_Code.builder.Format_Info import (FORMAT_WORDS,
+                                         VERSION_WORDS,
+                                         get_format_bits,
+                                         get_format_word,
+                                         get_version_bits,
+                                         get_version_positions)
+from QR_Code.builder.QRCodeBuilder import QRCodeBuilder
+from QR_Code.utils.Classes import ECCode
+
+# masked format words for mask 0 to 7
+KNOWN_FORMAT_WORDS: dict[ECCode, list[int]] = {
+    ECCode.L: [0b111011111000100, 0b111001011110011, 0b111110110101010, 0b111100010011101,
+               0b110011000101111, 0b110001100011000, 0b110110001000001, 0b110100101110110],
+    ECCode.M: [0b101010000010010, 0b101000100100101, 0b101111001111100, 0b101101101001011,
+               0b100010111111001, 0b100000011001110, 0b100111110010111, 0b100101010100000],
+    ECCode.Q: [0b011010101011111, 0b011000001101000, 0b011111100110001, 0b011101000000110,
+               0b010010010110100, 0b010000110000011, 0b010111011011010, 0b010101111101101],
+    ECCode.H: [0b001011010001001, 0b001001110111110, 0b001110011100111, 0b001100111010000,
+               0b000011101100010, 0b000001001010101, 0b000110100001100, 0b000100000111011],
+}
+
+KNOWN_VERSION_WORDS: dict[int, int] = {
+    7: 0x07C94, 8: 0x085BC, 9: 0x09A99, 10: 0x0A4D3, 11: 0x0BBF6, 12: 0x0C762, 13: 0x0D847, 14: 0x0E60D, 15: 0x0F928,
+    16: 0x10B78, 17: 0x1145D, 18: 0x12A17, 19: 0x13532, 20: 0x149A6, 21: 0x15683, 22: 0x168C9, 23: 0x177EC,
+    24: 0x18EC4, 25: 0x191E1, 26: 0x1AFAB, 27: 0x1B08E, 28: 0x1CC1A, 29: 0x1D33F, 30: 0x1ED75, 31: 0x1F250,
+    32: 0x209D5, 33: 0x216F0, 34: 0x228BA, 35: 0x2379F, 36: 0x24B0B, 37: 0x2542E, 38: 0x26A64, 39: 0x27541,
+    40: 0x28C69,
+}
+
+
+def test_format_words():
+    assert len(FORMAT_WORDS) == 32
+    for ec_level, words in KNOWN_FORMAT_WORDS.items():
+        assert [get_format_word(ec_level, mask_id) for mask_id in range(8)] == words, ec_level
+    assert get_format_word(ECCode.L, 0) == 0x77C4
+    assert get_format_bits(ECCode.L, 0) == [bit == '1' for bit in '111011111000100']
+
+
+def test_version_words():
+    assert VERSION_WORDS == KNOWN_VERSION_WORDS
+    assert get_version_bits(7) == [bit == '1' for bit in f'{0x07C94:018b}']
+
+
+@pytest.mark.parametrize('length, version', [(350, 7), (2100, 21), (7000, 40)])
+def test_version_blocks_of_a_built_symbol(length, version):
+    qr = QRCodeBuilder('7' * length, ECCode.L)
+    size: int = qr.size
+    assert qr.version == version
+    # bit i of the word at (size - 11 + i % 3, i // 3) left of the top right finder pattern, transposed above the bottom
+    # left one
+    for i in range(18):
+        bit: bool = bool(KNOWN_VERSION_WORDS[version] >> i & 1)
+        assert qr.matrix[size - 11 + i % 3][i // 3] == bit
+        assert qr.matrix[i // 3][size - 11 + i % 3] == bit
+    assert [qr.matrix[x][y] for x, y in get_version_positions(size)] == get_version_bits(version) * 2
@@ -0,0 +1,8 @@
+"""importing the package stays within its time budget and loads no optional dependency"""
+from __future__ import annotations
+from QR_Code.utils.Import_Budget import check_import_budget
+
+
+def test_import_budget():
+    problems: list[str] = check_import_budget()
+    assert problems == [], '\n'.join(problems)
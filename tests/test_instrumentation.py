@@ -0,0 +1,58 @@
+"""build stats: every stage once per build, nothing at all when no stats object is given or active"""
+from __future__ import annotations
+import importlib.util
+import pytest
+from QR_Code.builder.QRCodeBuilder import ENGINE_ARRAY, ENGINE_LIST, QRCodeBuilder
+from QR_Code.utils.Classes import ECCode
+from QR_Code.utils.Instrumentation import (BuildStats, STAGE_ENCODE, STAGE_ERROR_CORRECTION, STAGE_FORMAT_INFO,
+                                           STAGE_MASK_CANDIDATE, STAGE_MASK_SEARCH, STAGE_PLACEMENT, STAGE_PLAN,
+                                           STAGE_TEMPLATE, STAGE_VERIFY, disable_stats, enable_stats)
+
+NUMPY_MISSING: bool = importlib.util.find_spec('numpy') is None
+ARRAY_ENGINE = pytest.param(ENGINE_ARRAY, marks=pytest.mark.skipif(NUMPY_MISSING, reason='the array engine needs numpy'),
+                            id=ENGINE_ARRAY)
+ONCE_PER_BUILD = (STAGE_PLAN, STAGE_TEMPLATE, STAGE_ENCODE, STAGE_ERROR_CORRECTION, STAGE_PLACEMENT, STAGE_MASK_SEARCH)
+MESSAGES = ('HELLO WORLD', 'https://www.qrcode.com/', '0123456789' * 40)
+
+
+@pytest.mark.parametrize('engine', [ENGINE_LIST, ARRAY_ENGINE])
+def test_every_stage_once_per_build(engine):
+    stats = BuildStats()
+    for message in MESSAGES:
+        QRCodeBuilder(message, ECCode.M, engine, stats=stats)
+    totals = stats.get_totals()
+    assert stats.builds == len(MESSAGES)
+    assert {name: totals[name].calls for name in ONCE_PER_BUILD} == dict.fromkeys(ONCE_PER_BUILD, len(MESSAGES))
+    assert STAGE_VERIFY not in totals
+    if engine == ENGINE_LIST:  # the reference search masks and scores the candidates one by one
+        assert totals[STAGE_MASK_CANDIDATE].calls == totals[STAGE_FORMAT_INFO].calls == 8 * len(MESSAGES)
+    else:
+        assert totals[STAGE_MASK_CANDIDATE].calls == len(MESSAGES)
+    assert len(list(stats.iter_events('mask_candidate'))) == 8 * len(MESSAGES)
+
+
+def test_verify_stage_only_when_verifying():
+    stats = BuildStats()
+    QRCodeBuilder('HELLO WORLD', ECCode.Q, stats=stats, verify=True)
+    QRCodeBuilder('HELLO WORLD', ECCode.Q, stats=stats, verify=False)
+    assert stats.get_totals()[STAGE_VERIFY].calls == 1
+
+
+def test_active_stats_record_builds_without_their_own():
+    stats: BuildStats = enable_stats()
+    try:
+        QRCodeBuilder('HELLO WORLD', ECCode.Q)
+        own = BuildStats()
+        QRCodeBuilder('HELLO WORLD', ECCode.Q, stats=own)
+    finally:
+        disable_stats()
+    assert stats.builds == own.builds == 1
+    assert stats.get_totals()[STAGE_PLAN].calls == own.get_totals()[STAGE_PLAN].calls == 1
+
+
+def test_nothing_recorded_when_disabled():
+    stats: BuildStats = enable_stats()
+    disable_stats()
+    qr = QRCodeBuilder('HELLO WORLD', ECCode.Q)
+    assert qr.stats is None
+    assert stats.builds == 0 and stats.get_totals() == {} and not stats.events
@@ -0,0 +1,81 @@
+"""the branch and bound mask search picks the mask an exhaustive search picks"""
+from __future__ import annotations
+import importlib.util
+import random
+from typing import Any
+import pytest
+from QR_Code.builder.Masking import Masker, RULE_ORDER, SCORING_REFERENCE, SCORING_VECTORIZED
+from QR_Code.builder.Placement import get_placement_index, place_codewords
+from QR_Code.builder.QRCodeBuilder import ENGINE_ARRAY, ENGINE_LIST
+from QR_Code.builder.Templates import get_template
+from QR_Code.error_correction.Reed_Solomon import get_block_error_correction_words
+from QR_Code.processing.Segmentation import plan_symbol
+from QR_Code.processing.Sequencing import Encoder, get_size_info
+from QR_Code.utils.Classes import ECCode
+
+NUMPY_MISSING: bool = importlib.util.find_spec('numpy') is None
+ARRAY_ENGINE = pytest.param(ENGINE_ARRAY, marks=pytest.mark.skipif(NUMPY_MISSING, reason='the array engine needs numpy'),
+                            id=ENGINE_ARRAY)
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:abcdefghijklmnopqrstuvwxyz'
+
+
+def get_placed_matrix(message: str, ec_level: ECCode, engine: str) -> tuple[Any, Masker, list[tuple[int, int]]]:
+    """the matrix of message before masking, with a masker for it and the module order of its version"""
+    plan = plan_symbol(message, ec_level)
+    version, ec = plan.version, plan.ec_level
+    size: int = get_size_info(version)
+    template = get_template(version)
+    data: bytes = Encoder(version, ec).encode_segments(plan.segments)
+    codewords: bytes = data + get_block_error_correction_words(data, version, ec)
+    index = get_placement_index(version, ec, size, template.module_sequence)
+    if engine == ENGINE_ARRAY:
+        module_array = template.copy_module_array()
+        module_array.place_codewords(codewords, index)
+        matrix: Any = module_array.modules
+    else:
+        matrix = template.copy_matrix()
+        place_codewords(matrix, codewords, index)
+    return matrix, Masker(size, version, ec), template.module_sequence
+
+
+def exhaustive_best_mask(matrix: Any, masker: Masker, module_order: list[tuple[int, int]]) -> tuple[int, list[list[bool]]]:
+    """scores every rule of all 8 candidates, returns the first mask with the lowest cost and its matrix"""
+    costs: list[int] = []
+    for mask_id in range(8):
+        masker.apply_mask(matrix, module_order, mask_id)
+        costs.append(masker._calculate_cost()[0])
+    best: int = costs.index(min(costs))
+    masked: Any = masker.apply_mask(matrix, module_order, best)
+    return best, [list(map(bool, column)) for column in masked]
+
+
+def random_messages(count: int) -> list[str]:
+    rng = random.Random(21)
+    return [''.join(rng.choice(ALPHABET) for _ in range(rng.choice((5, 40, 150, 400)))) for _ in range(count)]
+
+
+@pytest.mark.parametrize('engine', [ENGINE_LIST, ARRAY_ENGINE])
+def test_branch_and_bound_matches_exhaustive_search(engine):
+    candidates_pruned: int = 0
+    for i, message in enumerate(random_messages(24)):
+        ec_level: ECCode = list(ECCode)[i % 4]
+        matrix, masker, module_order = get_placed_matrix(message, ec_level, engine)
+        _, expected = exhaustive_best_mask(matrix, masker, module_order)
+        masker = Masker(masker.size, masker.version, masker.ec_level, SCORING_REFERENCE)
+        chosen: Any = masker.apply_best_mask(matrix, module_order)
+        assert [list(map(bool, column)) for column in chosen] == expected, message
+        stats = masker.search_stats
+        assert stats.rules_evaluated + stats.rules_pruned == 8 * len(RULE_ORDER)
+        assert len(RULE_ORDER) <= stats.rules_evaluated <= 8 * len(RULE_ORDER)
+        assert stats.candidates_pruned <= 7 and stats.rules_pruned <= stats.candidates_pruned * (len(RULE_ORDER) - 1)
+        candidates_pruned += stats.candidates_pruned
+    assert candidates_pruned > 0  # the bound was used, not just the full scores
+
+
+@pytest.mark.skipif(NUMPY_MISSING, reason='the vectorized scoring engine needs numpy')
+def test_vectorized_scoring_matches_exhaustive_search():
+    for i, message in enumerate(random_messages(24)):
+        matrix, masker, module_order = get_placed_matrix(message, list(ECCode)[i % 4], ENGINE_ARRAY)
+        _, expected = exhaustive_best_mask(matrix, masker, module_order)
+        masker = Masker(masker.size, masker.version, masker.ec_level, SCORING_VECTORIZED)
+        assert masker.apply_best_mask(matrix, module_order).astype(bool).tolist() == expected, message
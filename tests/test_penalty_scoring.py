@@ -0,0 +1,50 @@
+"""the vectorized penalty rules agree with the Masker._rule_* reference"""
+from __future__ import annotations
+import pytest
+
+np = pytest.importorskip('numpy')  # the array engine is optional, as is numpy
+
+from QR_Code.builder.Masking import Masker
+from QR_Code.builder.Penalty_Scoring import score_penalties
+from QR_Code.builder.Templates import get_template
+from QR_Code.utils.Classes import ECCode
+
+VERSIONS = (1, 2, 7, 14, 25, 40)
+
+
+def reference_penalties(matrix: np.ndarray, version: int) -> list[int]:
+    masker = Masker(len(matrix), version, ECCode.L)
+    masker.matrix = matrix.astype(bool).tolist()
+    return [masker._rule_1(), masker._rule_2(), masker._rule_3(), masker._rule_4()]
+
+
+@pytest.mark.parametrize('version', VERSIONS)
+def test_random_matrices(version):
+    rng = np.random.default_rng(version)
+    size: int = 4 * version + 17
+    candidates: np.ndarray = rng.random((4, size, size)) < rng.uniform(0.2, 0.8, (4, 1, 1))
+    candidates[0, :, : size // 2] = False  # long runs and light areas
+    for candidate, penalties in zip(candidates, score_penalties(candidates).tolist()):
+        assert penalties == reference_penalties(candidate, version)
+
+
+@pytest.mark.parametrize('version', VERSIONS)
+def test_baseline_of_version(version):
+    rng = np.random.default_rng(100 + version)
+    template = get_template(version)
+    base = template.copy_module_array()
+    fixed: np.ndarray = base.get_fixed_mask()
+    candidates: np.ndarray = np.where(fixed, base.modules.astype(bool), rng.random((4,) + fixed.shape) < 0.5)
+    for candidate, penalties in zip(candidates, score_penalties(candidates, template.get_penalty_baseline()).tolist()):
+        assert penalties == reference_penalties(candidate, version)
+
+
+def test_rule_3_window_offsets():
+    # the reference once indexed its windows with the line number instead of the offset and skipped the last window
+    size: int = 21
+    matrix: np.ndarray = np.zeros((size, size), dtype=bool)
+    pattern: list[bool] = [True, False, True, True, True, False, True, False, False, False, False]
+    matrix[3, size - 11:] = pattern  # the last window of column 3, with the light modules before it the reverse too
+    matrix[size - 1, :11] = pattern[::-1]  # the first window of the last column, and the pattern 4 modules later
+    assert reference_penalties(matrix, 1)[2] == 4 * 40  # the old reference scored 0
+    assert score_penalties(matrix).tolist()[0][2] == 4 * 40
@@ -0,0 +1,35 @@
+"""reed-solomon encoding, syndromes and generator polynomials"""
+from __future__ import annotations
+import random
+import pytest
+from QR_Code.error_correction.Galois_Field import G256_EXP
+from QR_Code.error_correction.Polynomial import GF256Polynomial
+from QR_Code.error_correction.Reed_Solomon import (EC_CODEWORDS_PER_BLOCK,
+                                                   get_error_correction_words_reference,
+                                                   get_generator_coefficients,
+                                                   get_generator_logs,
+                                                   rs_encode)
+
+
+def test_generator_logs_match_coefficients():
+    for degree in EC_CODEWORDS_PER_BLOCK:
+        logs: bytes = get_generator_logs(degree)
+        assert len(logs) == degree + 1 and logs[0] == 0  # monic
+        assert bytes(G256_EXP[log] for log in logs) == get_generator_coefficients(degree)
+
+
+def test_rs_encode_matches_reference():
+    rng = random.Random(2)
+    for degree in EC_CODEWORDS_PER_BLOCK:
+        for length in (1, 2, rng.randrange(3, 123), 122):
+            data: list[int] = [rng.randrange(256) for _ in range(length)]
+            reference: list[int] = get_error_correction_words_reference(GF256Polynomial(data), length + degree)
+            assert list(rs_encode(data, degree)) == [0] * (degree - len(reference)) + reference, (degree, length)
+
+
+def test_rs_encode_edge_cases():
+    assert rs_encode(b'\x01\x02', 0) == bytearray()
+    assert rs_encode(b'', 10) == bytearray(10)
+    assert rs_encode(bytes(20), 7) == bytearray(7)
+    with pytest.raises(ValueError, match='negative'):
+        rs_encode(b'\x01', -1)
@@ -0,0 +1,70 @@
+"""the mixed mode segmentation: mode switches where they pay off, per version range, never worse than a single mode"""
+from __future__ import annotations
+import random
+import pytest
+from QR_Code.processing.Segmentation import Segment, get_segments_bit_length, segment_message
+from QR_Code.processing.Sequencing import ALPHANUMERIC_CHARS
+from QR_Code.utils.Classes import EncodingMode
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:abcdefghijklmnopqrstuvwxyzé'
+
+
+def get_modes(text: str) -> list[EncodingMode]:
+    """the modes a segment of text can be in, ISO 8859-1 byte segments only"""
+    modes: list[EncodingMode] = [EncodingMode.BYTE]
+    if all(char in ALPHANUMERIC_CHARS for char in text):
+        modes.append(EncodingMode.ALPHA_NUMERIC)
+    if text.isascii() and text.isdigit():
+        modes.append(EncodingMode.NUMERIC)
+    return modes
+
+
+def exhaustive_bit_length(message: str, version: int) -> int:
+    """the cheapest of every split of message into segments, each in every mode it fits"""
+    cheapest_from: list[int] = [0] * (len(message) + 1)  # bit length of the cheapest split of message[start:]
+    for start in range(len(message) - 1, -1, -1):
+        cheapest_from[start] = min(
+            get_segments_bit_length([Segment(mode, message[start: end])], version) + cheapest_from[end]
+            for end in range(start + 1, len(message) + 1) for mode in get_modes(message[start: end]))
+    return cheapest_from[0]
+
+
+def random_messages(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    # runs of one kind of character, so switching modes has a chance to pay off
+    return [''.join(''.join(rng.choices(rng.choice(('0123456789', ALPHANUMERIC_CHARS, ALPHABET)), k=rng.randint(1, 12)))
+                    for _ in range(rng.randint(1, 5))) for _ in range(count)]
+
+
+@pytest.mark.parametrize('version, longest_byte_run', [(1, 5), (10, 7), (27, 8)])
+def test_digits_inside_byte_text(version, longest_byte_run):
+    # a run of digits is split out once its numeric segment and the byte header after it cost less than 8 bits a digit,
+    # which takes more digits as the character count fields get wider
+    for digits in range(1, longest_byte_run + 1):
+        assert segment_message('a' + '1' * digits + 'a', version) == [Segment(EncodingMode.BYTE, 'a' + '1' * digits + 'a')]
+    digits = longest_byte_run + 1
+    assert segment_message('a' + '1' * digits + 'a', version) == [
+        Segment(EncodingMode.BYTE, 'a'), Segment(EncodingMode.NUMERIC, '1' * digits), Segment(EncodingMode.BYTE, 'a')]
+
+
+def test_split_depends_on_the_version_range():
+    message: str = 'a' + '1' * 6 + 'a'
+    assert [len(segment_message(message, version)) for version in (1, 9, 10, 26, 27, 40)] == [3, 3, 1, 1, 1, 1]
+
+
+def test_alphanumeric_and_numeric_runs():
+    assert segment_message('HELLO WORLD', 1) == [Segment(EncodingMode.ALPHA_NUMERIC, 'HELLO WORLD')]
+    assert segment_message('0123456789' * 3 + 'ABC', 1) == [Segment(EncodingMode.NUMERIC, '0123456789' * 3),
+                                                             Segment(EncodingMode.ALPHA_NUMERIC, 'ABC')]
+    assert segment_message('', 1) == [Segment(EncodingMode.NUMERIC, '')]
+
+
+@pytest.mark.parametrize('version', [1, 10, 27])
+def test_as_short_as_every_split(version):
+    for message in random_messages(40, version):
+        segments: list[Segment] = segment_message(message, version)
+        assert ''.join(segment.text for segment in segments) == message
+        bit_length: int = get_segments_bit_length(segments, version)
+        assert bit_length == exhaustive_bit_length(message, version), message
+        for mode in get_modes(message):  # so no worse than a single segment in any mode
+            assert bit_length <= get_segments_bit_length([Segment(mode, message)], version)
@@ -0,0 +1,188 @@
+"""the HTTP service end to end, over real connections to a server on a free localhost port"""
+from __future__ import annotations
+import asyncio
+import contextlib
+import http.client
+import io
+import json
+import socket
+import tarfile
+import threading
+import time
+from typing import Any, Iterator
+import pytest
+from QR_Code.__main__ import main
+from QR_Code.builder.Async_Builder import AsyncGenerator
+from QR_Code.builder.Symbol_Cache import SymbolCache
+from QR_Code.utils.Server import MAX_BODY_BYTES, MAX_HEADER_BYTES, MULTIPART_BOUNDARY, QRCodeServer
+
+READ_TIMEOUT = 0.5
+
+
+@contextlib.contextmanager
+def running_server(**kwargs: Any) -> Iterator[tuple[QRCodeServer, int]]:
+    """a new server running on an event loop of its own thread, so the tests can talk to it with blocking clients"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    qr_server = QRCodeServer(AsyncGenerator(max_concurrency=2, cache=SymbolCache()), **kwargs)
+    _, port = asyncio.run_coroutine_threadsafe(qr_server.start('127.0.0.1', 0), loop).result()
+    try:
+        yield qr_server, port
+    finally:
+        asyncio.run_coroutine_threadsafe(qr_server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+@pytest.fixture(scope='module')
+def server() -> Iterator[tuple[QRCodeServer, int]]:
+    with running_server(read_timeout=READ_TIMEOUT, keep_alive_timeout=5.0) as running:
+        yield running
+
+
+def get_metrics(port: int) -> dict[str, Any]:
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request('GET', '/metrics', headers={'Connection': 'close'})
+    metrics: dict[str, Any] = json.loads(connection.getresponse().read())
+    connection.close()
+    return metrics
+
+
+def exchange(port: int, chunks: list[bytes], pause: float = 0.0) -> tuple[bytes, float]:
+    """sends chunks pause seconds apart and returns everything the server sent until it closed, and how long that took"""
+    start: float = time.perf_counter()
+    with socket.create_connection(('127.0.0.1', port), timeout=10) as connection:
+        try:
+            for chunk in chunks:
+                connection.sendall(chunk)
+                time.sleep(pause)
+        except OSError:  # the server answered and closed the connection before everything was sent
+            pass
+        response: list[bytes] = []
+        while data := connection.recv(65536):
+            response.append(data)
+    return b''.join(response), time.perf_counter() - start
+
+
+def get_status(response: bytes) -> int:
+    return int(response.split(b' ', 2)[1])
+
+
+def test_endpoints_on_one_kept_alive_connection(server):
+    _, port = server
+    before: dict[str, Any] = get_metrics(port)
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request('GET', '/symbol?data=https%3A%2F%2Fwww.qrcode.com%2F&ec=M&format=pbm')
+    response = connection.getresponse()
+    assert response.status == 200 and response.getheader('Content-Type') == 'image/x-portable-bitmap'
+    assert response.read().startswith(b'P4')
+    connection.request('GET', '/symbol?data=' + 'x' * 3000)
+    response = connection.getresponse()
+    assert response.status == 422 and b'too long' in response.read()
+    connection.request('POST', '/batch?archive=tar&format=pgm', json.dumps(['LOT 1', 'x' * 3000, 'https://www.qrcode.com/']))
+    response = connection.getresponse()
+    assert response.status == 200
+    with tarfile.open(fileobj=io.BytesIO(response.read())) as tar:
+        assert tar.getnames() == ['00000.pgm', '00001.error.txt', '00002.pgm']
+    connection.request('POST', '/batch?format=pgm', json.dumps({'messages': ['LOT 1', 'x' * 3000, 'LOT 2']}))
+    response = connection.getresponse()
+    body: bytes = response.read()
+    assert response.status == 200 and body.count(b'X-Status: 422') == 1
+    assert body.endswith(f'--{MULTIPART_BOUNDARY}--\r\n'.encode())
+    connection.close()
+    after: dict[str, Any] = get_metrics(port)
+    assert after['connections'] - before['connections'] == 2  # this one and get_metrics'
+    assert after['reused_connections'] - before['reused_connections'] == 3
+    assert after['symbols'] - before['symbols'] >= 5 and after['symbol_errors'] - before['symbol_errors'] == 3
+
+
+@pytest.mark.parametrize('request_line, status', [
+    (b'GET /symbol HTTP/1.1', 400),  # no data
+    (b'GET /symbol?data=x&scale=0 HTTP/1.1', 400),
+    (b'GET /symbol?data=x&format=gif HTTP/1.1', 400),
+    (b'POST /symbol?data=x HTTP/1.1', 405),
+    (b'GET /batch HTTP/1.1', 405),
+    (b'GET /nowhere HTTP/1.1', 404),
+    (b'GARBAGE', 400),
+])
+def test_bad_requests(server, request_line, status):
+    response, _ = exchange(server[1], [request_line + b'\r\nConnection: close\r\n\r\n'])
+    assert get_status(response) == status
+
+
+def test_silent_client_is_disconnected(server):
+    response, seconds = exchange(server[1], [])
+    assert response == b'' and READ_TIMEOUT <= seconds < READ_TIMEOUT + 2
+
+
+def test_slow_headers_time_out(server):
+    # one header line every 0.2s, each in time on its own, but the whole request is not
+    lines: list[bytes] = [b'GET /symbol?data=x HTTP/1.1\r\n'] + [b'X-Slow: %d\r\n' % i for i in range(15)] + [b'\r\n']
+    response, seconds = exchange(server[1], lines, pause=0.2)
+    assert get_status(response) == 408 and b'headers took too long' in response
+    assert seconds < 15 * 0.2
+
+
+def test_slow_body_times_out(server):
+    head: bytes = b'POST /batch HTTP/1.1\r\nContent-Length: 100\r\n\r\n'
+    response, _ = exchange(server[1], [head, b'["LOT 1"'], pause=READ_TIMEOUT * 2)
+    assert get_status(response) == 408 and b'body took too long' in response
+
+
+def test_oversized_headers(server):
+    many_lines: bytes = b''.join(b'X-Filler-%d: %s\r\n' % (i, b'y' * 1000) for i in range(MAX_HEADER_BYTES // 1000 + 1))
+    response, _ = exchange(server[1], [b'GET /symbol?data=x HTTP/1.1\r\n' + many_lines + b'\r\n'])
+    assert get_status(response) == 431
+    response, _ = exchange(server[1], [b'GET /symbol?data=x HTTP/1.1\r\nX-Long: ' + b'y' * (MAX_HEADER_BYTES + 1) + b'\r\n\r\n'])
+    assert get_status(response) == 431
+    response, _ = exchange(server[1], [b'GET /symbol?data=' + b'x' * (MAX_HEADER_BYTES + 1) + b' HTTP/1.1\r\n\r\n'])
+    assert get_status(response) == 431
+
+
+def test_oversized_body(server):
+    response, _ = exchange(server[1], [b'POST /batch HTTP/1.1\r\nContent-Length: %d\r\n\r\n' % (MAX_BODY_BYTES + 1)])
+    assert get_status(response) == 413
+
+
+def test_transfer_encoding_is_refused(server):
+    response, _ = exchange(server[1], [b'POST /batch HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n7\r\n["LOT"]\r\n0\r\n\r\n'])
+    assert get_status(response) == 501 and b'Content-Length' in response
+
+
+def test_keep_alive_and_close(server):
+    request: bytes = b'GET /symbol?data=LOT%201&format=pbm HTTP/1.1\r\n\r\n'
+    response, _ = exchange(server[1], [request, request, request.replace(b'\r\n\r\n', b'\r\nConnection: close\r\n\r\n')])
+    assert response.count(b'HTTP/1.1 200 OK') == 3
+    response, _ = exchange(server[1], [b'GET /symbol?data=LOT%201 HTTP/1.0\r\n\r\n', request])
+    assert response.count(b'HTTP/1.1 200 OK') == 1  # HTTP/1.0 closes unless asked to keep alive
+
+
+@pytest.mark.parametrize('connection', [b'', b'Connection: keep-alive\r\n'])
+def test_http_1_0_batch_is_not_chunked(server, connection):
+    body: bytes = json.dumps(['LOT 1', 'x' * 3000]).encode()
+    request: bytes = (b'POST /batch?archive=tar&format=pbm HTTP/1.0\r\nContent-Length: %d\r\n' % len(body) + connection +
+                      b'\r\n' + body)
+    response, _ = exchange(server[1], [request])  # the body ends where the server closes the connection
+    head, _, tar_bytes = response.partition(b'\r\n\r\n')
+    assert get_status(response) == 200
+    assert b'transfer-encoding' not in head.lower() and b'Connection: close' in head
+    with tarfile.open(fileobj=io.BytesIO(tar_bytes)) as tar:
+        assert tar.getnames() == ['00000.pbm', '00001.error.txt']
+        assert tar.extractfile('00000.pbm').read().startswith(b'P4')
+
+
+def test_first_request_closes_its_connection():
+    # the workers must not be forked while the first connection is open, a copy of its socket would keep it from closing
+    with running_server() as (_, port):
+        response, seconds = exchange(port, [b'GET /symbol?data=hi HTTP/1.1\r\nConnection: close\r\n\r\n'])
+    assert get_status(response) == 200 and response.endswith(b'IEND\xaeB`\x82')  # all of the PNG, then the close
+    assert seconds < 5
+
+
+@pytest.mark.parametrize('argv', [['--workers', '0'], ['--workers', '-1'], ['--max-queued', '-1']])
+def test_serve_refuses_bad_limits(capsys, argv):
+    with pytest.raises(SystemExit) as exit_info:
+        main(['serve', *argv])  # refused while the arguments are parsed, before anything is started
+    assert exit_info.value.code == 2 and 'must be at least' in capsys.readouterr().err
@@ -0,0 +1,57 @@
+"""the disk tier of SymbolCache: corrupt entries, failed writes and threads"""
+from __future__ import annotations
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from QR_Code.builder.Symbol_Cache import SymbolCache, get_symbol_key
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda data: data[:2],  # shorter than the header
+    lambda data: data[:-1],  # truncated matrix
+    lambda data: data[:1] + b'\x07' + data[2:],  # no such EC level
+    lambda data: b'\x00' + data[1:],  # no such version
+])
+def test_corrupt_disk_entry_is_a_miss(corrupt):
+    with tempfile.TemporaryDirectory() as directory:
+        key: str = get_symbol_key('https://www.qrcode.com/')
+        SymbolCache(directory=directory).get_or_build('https://www.qrcode.com/')
+        path: str = os.path.join(directory, os.listdir(directory)[0])
+        with open(path, 'rb') as f:
+            data: bytes = f.read()
+        with open(path, 'wb') as f:
+            f.write(corrupt(data))
+        cache = SymbolCache(directory=directory)
+        assert key in cache
+        assert cache.get(key) is None
+        assert key not in cache
+        assert not os.path.exists(path)
+        assert cache.stats()['misses'] == 1 and cache.stats()['disk_bytes'] == 0
+        assert cache.get_or_build('https://www.qrcode.com/').matrix  # built and written again
+        assert os.path.exists(path)
+
+
+def test_failed_disk_write_keeps_the_symbol_in_memory():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SymbolCache(directory=os.path.join(directory, 'cache'))
+        os.rmdir(cache.directory)  # every write fails from now on
+        symbol = cache.get_or_build('https://www.qrcode.com/')
+        assert cache.get(get_symbol_key('https://www.qrcode.com/')) == symbol
+        assert cache.stats()['disk_write_errors'] == 1 and cache.stats()['disk_size'] == 0
+        assert os.listdir(directory) == []  # no temporary file left behind
+        os.mkdir(cache.directory)
+        cache.put('0' * 64, symbol)  # writes work again once the directory is back
+        assert cache.stats()['disk_size'] == 1 and os.listdir(cache.directory) == ['0' * 64 + '.qrs']
+
+
+def test_threads_share_a_disk_cache():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SymbolCache(max_bytes=2000, directory=directory, disk_max_bytes=3000)
+        messages: list[str] = [f'https://www.qrcode.com/{i}' for i in range(12)]
+        with ThreadPoolExecutor(4) as pool:
+            symbols = list(pool.map(lambda i: cache.get_or_build(messages[i % 12]), range(96)))
+        assert [symbol.matrix for symbol in symbols[:12]] == [cache.get_or_build(m).matrix for m in messages]
+        stats = cache.stats()
+        assert stats['disk_bytes'] == sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        assert stats['disk_bytes'] <= 3000 and stats['disk_write_errors'] == 0
@@ -0,0 +1,95 @@
+"""the syndrome self-check: clean builds pass it, a single wrong codeword is caught and its block named"""
+from __future__ import annotations
+import importlib.util
+import os
+import subprocess
+import sys
+import pytest
+from QR_Code.builder import QRCodeBuilder as builder_module
+from QR_Code.builder.QRCodeBuilder import ENGINE_ARRAY, ENGINE_LIST, QRCodeBuilder, VERIFY_ENVIRONMENT_VARIABLE
+from QR_Code.error_correction.Reed_Solomon import (find_corrupt_blocks,
+                                                   get_block_error_correction_words,
+                                                   get_syndromes,
+                                                   rs_encode,
+                                                   verify_codewords)
+from QR_Code.processing.Sequencing import get_block_info
+from QR_Code.utils.Classes import ECCode
+from QR_Code.utils.Exceptions import CodewordVerificationError
+
+NUMPY_MISSING: bool = importlib.util.find_spec('numpy') is None
+ARRAY_ENGINE = pytest.param(ENGINE_ARRAY, marks=pytest.mark.skipif(NUMPY_MISSING, reason='the array engine needs numpy'),
+                            id=ENGINE_ARRAY)
+PROJECT_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_codewords(version: int, ec_level: ECCode) -> bytes:
+    data: bytes = bytes(i * 7 % 256 for i in range(sum(get_block_info(version, ec_level)[1])))
+    return data + get_block_error_correction_words(data, version, ec_level)
+
+
+def flip(codewords: bytes, position: int) -> bytes:
+    return codewords[:position] + bytes([codewords[position] ^ 0x5a]) + codewords[position + 1:]
+
+
+def test_syndromes_of_encoded_block():
+    data: bytes = bytes(range(100, 140))
+    block: bytes = data + rs_encode(data, 18)
+    assert get_syndromes(block, 18) == bytes(18)
+    for position in (0, 20, len(block) - 1):
+        assert any(get_syndromes(flip(block, position), 18))
+
+
+@pytest.mark.parametrize('version, ec_level', [(1, ECCode.L), (5, ECCode.Q), (17, ECCode.M), (40, ECCode.H)])
+def test_one_wrong_codeword_names_its_block(version, ec_level):
+    codewords: bytes = get_codewords(version, ec_level)
+    verify_codewords(codewords, version, ec_level)
+    ec_per_block, block_sizes = get_block_info(version, ec_level)
+    data_length: int = sum(block_sizes)
+    for block in {0, len(block_sizes) // 2, len(block_sizes) - 1}:
+        data_position: int = sum(block_sizes[:block]) + block_sizes[block] - 1
+        ec_position: int = data_length + block * ec_per_block
+        for position in (data_position, ec_position):
+            corrupt: bytes = flip(codewords, position)
+            assert find_corrupt_blocks(corrupt, version, ec_level) == [block]
+            with pytest.raises(CodewordVerificationError, match=f'block\\(s\\) {block} of version {version} '):
+                verify_codewords(corrupt, version, ec_level)
+
+
+@pytest.mark.parametrize('engine', [ENGINE_LIST, ARRAY_ENGINE])
+def test_clean_builds_pass(engine):
+    for message, ec_level in (('HELLO WORLD', ECCode.Q), ('https://www.qrcode.com/' * 20, ECCode.M), ('7' * 3000, ECCode.L)):
+        qr = QRCodeBuilder(message, ec_level, engine, verify=True)
+        assert qr.verified
+    assert not QRCodeBuilder('HELLO WORLD', ECCode.Q, engine, verify=False).verified
+
+
+@pytest.mark.parametrize('engine', [ENGINE_LIST, ARRAY_ENGINE])
+def test_build_with_a_wrong_codeword_raises(monkeypatch, engine):
+    def corrupted_error_correction_words(data, version, ec_level):
+        ec_words: bytearray = get_block_error_correction_words(data, version, ec_level)
+        ec_per_block: int = get_block_info(version, ec_level)[0]
+        ec_words[2 * ec_per_block + 3] ^= 1  # block 2
+        return ec_words
+
+    monkeypatch.setattr(builder_module, 'get_block_error_correction_words', corrupted_error_correction_words)
+    with pytest.raises(CodewordVerificationError, match=r'block\(s\) 2 of'):
+        QRCodeBuilder('https://www.qrcode.com/' * 20, ECCode.M, engine, verify=True)
+    assert QRCodeBuilder('https://www.qrcode.com/' * 20, ECCode.M, engine, verify=False).matrix  # not checked, not caught
+
+
+def test_enable_verification(monkeypatch):
+    monkeypatch.setenv(VERIFY_ENVIRONMENT_VARIABLE, '0')
+    monkeypatch.setattr(builder_module, '_verify_by_default', False)
+    assert not QRCodeBuilder('HELLO WORLD').verified
+    builder_module.enable_verification()
+    assert QRCodeBuilder('HELLO WORLD').verified and os.environ[VERIFY_ENVIRONMENT_VARIABLE] == '1'
+    assert not QRCodeBuilder('HELLO WORLD', verify=False).verified
+
+
+@pytest.mark.parametrize('value, verified', [('1', 'True'), ('0', 'False')])
+def test_environment_variable(value, verified):
+    result = subprocess.run([sys.executable, '-c', 'from QR_Code.builder.QRCodeBuilder import QRCodeBuilder\n'
+                                                   'print(QRCodeBuilder("HELLO WORLD").verified)'],
+                            env=dict(os.environ, PYTHONPATH=PROJECT_ROOT, **{VERIFY_ENVIRONMENT_VARIABLE: value}),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == verified
@@ -0,0 +1,125 @@
+"""
+the PNG, PBM and PGM writers, checked pixel by pixel against images parsed here with struct and zlib, and against the
+images PIL decodes from them when PIL is installed
+"""
+from __future__ import annotations
+import io
+import struct
+import zlib
+import pytest
+from QR_Code.builder.QRCodeBuilder import QRCodeBuilder
+from QR_Code.display.Writers import PNG_SIGNATURE, WRITERS, render, write_png
+from QR_Code.utils.Classes import ECCode
+
+
+def expected_pixels(matrix: list[list[bool]], scale: int, quiet_zone: int) -> list[list[bool]]:
+    """[y][x] True for dark pixels, the quiet zone light"""
+    pixels: int = (len(matrix) + 2 * quiet_zone) * scale
+    modules: range = range(len(matrix))
+
+    def dark(x: int, y: int) -> bool:
+        module_x, module_y = x // scale - quiet_zone, y // scale - quiet_zone
+        return module_x in modules and module_y in modules and bool(matrix[module_x][module_y])
+
+    return [[dark(x, y) for x in range(pixels)] for y in range(pixels)]
+
+
+def read_png_chunks(image_bytes: bytes) -> list[tuple[bytes, bytes]]:
+    """(type, data) of every chunk, checking the signature and every CRC"""
+    assert image_bytes.startswith(PNG_SIGNATURE)
+    chunks: list[tuple[bytes, bytes]] = []
+    position: int = len(PNG_SIGNATURE)
+    while position < len(image_bytes):
+        length, chunk_type = struct.unpack_from('>I4s', image_bytes, position)
+        data: bytes = image_bytes[position + 8: position + 8 + length]
+        assert struct.unpack_from('>I', image_bytes, position + 8 + length)[0] == zlib.crc32(chunk_type + data)
+        chunks.append((chunk_type, data))
+        position += 12 + length
+    return chunks
+
+
+def parsed_pixels(image_bytes: bytes) -> list[list[bool]]:
+    """[y][x] True for dark pixels of a 1 bit grayscale PNG, P4 PBM or P5 PGM as the writers make them, without PIL"""
+    if image_bytes.startswith(PNG_SIGNATURE):
+        chunks: list[tuple[bytes, bytes]] = read_png_chunks(image_bytes)
+        assert chunks[0][0] == b'IHDR' and chunks[-1] == (b'IEND', b'')
+        width, height, *header = struct.unpack('>IIBBBBB', chunks[0][1])
+        assert header == [1, 0, 0, 0, 0]  # bit depth 1, grayscale, no interlacing
+        data: bytes = zlib.decompress(b''.join(chunk for chunk_type, chunk in chunks if chunk_type == b'IDAT'))
+        stride: int = (width + 7) // 8 + 1
+        assert len(data) == height * stride
+        rows: list[bytes] = [data[y * stride: (y + 1) * stride] for y in range(height)]
+        assert all(row[0] == 0 for row in rows)  # filter type none
+        return [[not row[1 + x // 8] >> (7 - x % 8) & 1 for x in range(width)] for row in rows]
+    if image_bytes.startswith(b'P4\n'):
+        _, dimensions, body = image_bytes.split(b'\n', 2)
+        width, height = map(int, dimensions.split())
+        row_bytes: int = (width + 7) // 8
+        assert len(body) == height * row_bytes
+        return [[bool(body[y * row_bytes + x // 8] >> (7 - x % 8) & 1) for x in range(width)] for y in range(height)]
+    _, dimensions, max_value, body = image_bytes.split(b'\n', 3)
+    width, height = map(int, dimensions.split())
+    assert image_bytes.startswith(b'P5\n') and max_value == b'255' and len(body) == width * height
+    return [[body[y * width + x] < 128 for x in range(width)] for y in range(height)]
+
+
+def decoded_pixels(image_bytes: bytes) -> list[list[bool]]:
+    Image = pytest.importorskip('PIL.Image')
+    image = Image.open(io.BytesIO(image_bytes))
+    image.load()
+    gray = image.convert('L')
+    return [[gray.getpixel((x, y)) < 128 for x in range(gray.width)] for y in range(gray.height)]
+
+
+@pytest.mark.parametrize('image_format', list(WRITERS))
+@pytest.mark.parametrize('message, scale, quiet_zone', [
+    ('HELLO WORLD', 1, 0),
+    ('https://www.qrcode.com/', 3, 1),  # rows that don't fill their last byte
+    ('0123456789' * 30, 4, 4),
+    ('x', 8, 2),
+])
+def test_pixels_match_the_matrix(image_format, message, scale, quiet_zone):
+    matrix: list[list[bool]] = QRCodeBuilder(message, ECCode.M).matrix
+    image_bytes: bytes = render(matrix, image_format, scale, quiet_zone)
+    assert parsed_pixels(image_bytes) == expected_pixels(matrix, scale, quiet_zone)
+
+
+@pytest.mark.parametrize('image_format', list(WRITERS))
+def test_pil_decodes_the_same_pixels(image_format):
+    matrix: list[list[bool]] = QRCodeBuilder('https://www.qrcode.com/', ECCode.M).matrix
+    image_bytes: bytes = render(matrix, image_format, 3, 1)
+    assert decoded_pixels(image_bytes) == parsed_pixels(image_bytes) == expected_pixels(matrix, 3, 1)
+
+
+def test_image_formats_and_headers():
+    matrix: list[list[bool]] = QRCodeBuilder('HELLO WORLD', ECCode.Q).matrix
+    assert read_png_chunks(render(matrix, 'png', 2, 4))[0] == (b'IHDR', struct.pack('>IIBBBBB', 58, 58, 1, 0, 0, 0, 0))
+    assert render(matrix, 'pbm', 2, 4).startswith(b'P4\n58 58\n')
+    assert render(matrix, 'pgm', 1, 0).startswith(b'P5\n21 21\n255\n')
+    assert len(render(matrix, 'pgm', 1, 0)) == len(b'P5\n21 21\n255\n') + 21 * 21
+
+
+def test_large_png_spans_several_idat_chunks():
+    matrix: list[list[bool]] = QRCodeBuilder('y' * 2000, ECCode.L).matrix
+    stream = io.BytesIO()
+    write_png(matrix, stream, 10, 4, compression=0)  # stored, so well over IDAT_CHUNK_SIZE
+    image_bytes: bytes = stream.getvalue()
+    assert [chunk_type for chunk_type, _ in read_png_chunks(image_bytes)].count(b'IDAT') > 1
+    assert parsed_pixels(image_bytes) == expected_pixels(matrix, 10, 4)
+
+
+def test_symbol_reads_back():
+    Image = pytest.importorskip('PIL.Image')
+    zxingcpp = pytest.importorskip('zxingcpp')
+    message: str = 'https://www.qrcode.com/en/about/'
+    image = Image.open(io.BytesIO(render(QRCodeBuilder(message, ECCode.H).matrix, 'png', 4, 4)))
+    assert [result.text for result in zxingcpp.read_barcodes(image)] == [message]
+
+
+@pytest.mark.parametrize('image_format', list(WRITERS))
+@pytest.mark.parametrize('scale, quiet_zone, error', [(0, 4, 'scale'), (-2, 4, 'scale'), (4, -1, 'quiet_zone')])
+def test_bad_options_are_refused(image_format, scale, quiet_zone, error):
+    stream = io.BytesIO()
+    with pytest.raises(ValueError, match=error):
+        WRITERS[image_format]([[True]], stream, scale=scale, quiet_zone=quiet_zone)
+    assert stream.getvalue() == b''  # refused before anything is written